@@ -7,6 +7,8 @@ class MainLoginConfig(AppConfig):
     verbose_name = 'Main Login'
 
     def ready(self):
-        """Import signals to register them"""
+        """Import signals to register them and build the tenant filter registry"""
         import main_login.signals  # noqa
+        from main_login.tenancy import build_tenant_filter_registry
+        build_tenant_filter_registry()
 
@@ -0,0 +1,102 @@
+"""
+Shared JWT authentication for REST (DRF) and WebSocket (Channels) requests.
+
+Both entry points decode the token once and load the user through a short-TTL
+in-process principal cache (users are fetched with select_related('role'), so
+role checks need no further query). The cache is invalidated from
+main_login.signals whenever a User or Role is saved or deleted, which covers
+deactivation and role changes.
+"""
+import copy
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .utils import TenantCache
+
+
+principal_cache = TenantCache(
+    max_entries=getattr(settings, 'PRINCIPAL_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'PRINCIPAL_CACHE_TTL', 60),
+)
+
+
+def invalidate_principal(user_id=None):
+    """
+    Invalidate the cached principal for a user (by user_id).
+    Pass None to clear the whole cache.
+    """
+    principal_cache.invalidate(str(user_id) if user_id is not None else None)
+
+
+def get_principal(user_id):
+    """
+    Get the User for a user_id, with its role loaded.
+
+    Every caller gets its own copy of the cached instance, so changes made
+    while handling one request never leak into another.
+
+    Returns:
+        User: the user if found, None otherwise
+    """
+    cache_key = str(user_id)
+    user = principal_cache.get(cache_key)
+    if user is TenantCache.MISSING:
+        User = get_user_model()
+        try:
+            user = User.objects.select_related('role').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except (User.DoesNotExist, ValidationError, ValueError):
+            return None
+        principal_cache.set(cache_key, user)
+    return copy.copy(user)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user through the principal cache.
+    """
+
+    def get_user(self, validated_token):
+        """Find the user for a validated token using the principal cache"""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_principal(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+
+        return user
+
+
+def authenticate_raw_token(raw_token):
+    """
+    Validate a raw JWT and load its user (used outside DRF, e.g. WebSockets).
+
+    Returns:
+        tuple: (user, validated_token)
+
+    Raises:
+        InvalidToken / AuthenticationFailed if the token or user is not valid
+    """
+    authenticator = CachedJWTAuthentication()
+    validated_token = authenticator.get_validated_token(raw_token)
+    return authenticator.get_user(validated_token), validated_token
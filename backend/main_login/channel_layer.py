@@ -0,0 +1,488 @@
+"""
+Channel layer backed by PostgreSQL LISTEN/NOTIFY.
+
+Lets several ASGI worker processes (daphne behind a load balancer) share
+groups and channels without another service: every process talks to the
+database it already uses.
+
+- Group membership is kept in the process that owns the channel. A process
+  LISTENs on one notification channel per group it has local members in, so
+  group_send() is a single NOTIFY and PostgreSQL fans it out to exactly the
+  processes with members; each delivers to its own members.
+- Specific channels (new_channel()) carry the process' prefix, and each
+  process LISTENs on one notification channel for them, so send() is also a
+  single NOTIFY.
+- Messages sent concurrently from one event loop are batched: messages for
+  the same notification channel are packed into one payload (up to
+  PostgreSQL's 8000 byte limit) and all payloads are sent with one
+  SELECT pg_notify(...), pg_notify(...) round trip.
+
+The connections use psycopg2's asynchronous mode, driven by the event loop
+(no threads). Delivery is at most once, like any pub/sub: messages sent
+while a listener is reconnecting are lost. Messages must be JSON
+serializable, and one message must fit in a NOTIFY payload (about 7.9 KB).
+
+Configure in settings:
+
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'main_login.channel_layer.PostgresChannelLayer',
+            'CONFIG': {'database': 'default'},
+        },
+    }
+
+`python manage.py benchmark_channel_layer` compares its throughput with the
+in-memory layer.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import random
+import string
+import time
+import uuid
+import psycopg2
+from psycopg2 import extensions
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+# pg_notify() calls sent per statement
+MAX_NOTIFIES_PER_STATEMENT = 100
+
+# Seconds between attempts to reconnect a lost listener
+RECONNECT_DELAY = 1
+
+
+def get_connect_kwargs(alias='default'):
+    """psycopg2.connect() arguments for a database in settings.DATABASES"""
+    database = settings.DATABASES[alias]
+    kwargs = {
+        'dbname': database.get('NAME'),
+        'user': database.get('USER'),
+        'password': database.get('PASSWORD'),
+        'host': database.get('HOST'),
+        'port': database.get('PORT'),
+    }
+    return {name: value for name, value in kwargs.items() if value}
+
+
+class AsyncConnection:
+    """
+    A psycopg2 connection in asynchronous mode, driven by the running event loop.
+    With on_notify, notifications are read whenever the socket is readable
+    and passed on as on_notify(channel, payload).
+    """
+
+    def __init__(self, connect_kwargs, on_notify=None, on_lost=None):
+        self.connect_kwargs = connect_kwargs
+        self.on_notify = on_notify
+        self.on_lost = on_lost
+        self.conn = None
+        self.loop = None
+        self.lock = asyncio.Lock()
+        # Socket registered with the event loop; kept apart from the connection
+        # because a connection the server dropped reports closed before it is unwatched
+        self.watched_fd = None
+
+    @property
+    def closed(self):
+        return self.conn is None or bool(self.conn.closed)
+
+    async def open(self):
+        """Connect (asynchronous connections are always in autocommit mode)"""
+        self.loop = asyncio.get_running_loop()
+        self.conn = psycopg2.connect(async_=True, **self.connect_kwargs)
+        await self.wait()
+        self.watch()
+
+    async def wait(self):
+        """Poll the connection until its current operation is done"""
+        fd = self.conn.fileno()
+        while True:
+            state = self.conn.poll()
+            if state == extensions.POLL_OK:
+                return
+            future = self.loop.create_future()
+
+            def ready():
+                if not future.done():
+                    future.set_result(None)
+
+            if state == extensions.POLL_READ:
+                self.loop.add_reader(fd, ready)
+                try:
+                    await future
+                finally:
+                    self.loop.remove_reader(fd)
+            elif state == extensions.POLL_WRITE:
+                self.loop.add_writer(fd, ready)
+                try:
+                    await future
+                finally:
+                    self.loop.remove_writer(fd)
+            else:
+                raise psycopg2.OperationalError(f'Unexpected poll state {state}')
+
+    async def execute(self, sql, params=None):
+        """Run one statement (one at a time per connection)"""
+        async with self.lock:
+            if self.closed:
+                raise psycopg2.InterfaceError('connection already closed')
+            self.unwatch()
+            try:
+                # The cursor must stay referenced until the statement is done
+                cursor = self.conn.cursor()
+                cursor.execute(sql, params)
+                await self.wait()
+                cursor.close()
+            finally:
+                if not self.closed:
+                    self.read_notifies()
+                    self.watch()
+
+    def watch(self):
+        """Read notifications as they arrive (listener connections only)"""
+        if self.on_notify is not None and not self.closed:
+            self.watched_fd = self.conn.fileno()
+            self.loop.add_reader(self.watched_fd, self.poll_notifies)
+
+    def unwatch(self):
+        if self.watched_fd is not None:
+            self.loop.remove_reader(self.watched_fd)
+            self.watched_fd = None
+
+    def poll_notifies(self):
+        """Socket is readable while idle: read and dispatch notifications"""
+        try:
+            self.conn.poll()
+        except psycopg2.Error:
+            logger.warning('Channel layer listener connection lost', exc_info=True)
+            self.close()
+            if self.on_lost is not None:
+                self.on_lost()
+            return
+        self.read_notifies()
+
+    def read_notifies(self):
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            try:
+                self.on_notify(notify.channel, notify.payload)
+            except Exception:
+                logger.exception('Channel layer could not dispatch a notification')
+
+    def close(self):
+        if self.loop is not None and not self.loop.is_closed():
+            self.unwatch()
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+
+class LoopState:
+    """Connections and the outgoing batch of the layer in one event loop"""
+
+    def __init__(self):
+        self.sender = None
+        self.listener = None
+        self.listening = set()
+        self.pending = []
+        self.flush_task = None
+        self.lock = asyncio.Lock()
+        self.sequence = 0
+
+    def close(self):
+        for connection in (self.sender, self.listener):
+            if connection is not None:
+                connection.close()
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    """
+    Channel layer using PostgreSQL LISTEN/NOTIFY for delivery between processes.
+
+    Options (CHANNEL_LAYERS CONFIG):
+        database: settings.DATABASES alias to connect to (default: 'default')
+        prefix: namespace for the notification channels, for several projects on one database
+        expiry: seconds a delivered message waits to be received before it is dropped
+        capacity / channel_capacity: messages a local channel holds before new ones are dropped
+        batch_delay: seconds to wait for more messages before sending a batch (default: 0,
+                     which batches whatever was sent in the same event loop iteration)
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, database='default', prefix='asgi', expiry=60, capacity=100,
+                 channel_capacity=None, batch_delay=0, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.database = database
+        self.prefix = prefix
+        self.batch_delay = batch_delay
+        self.client_prefix = uuid.uuid4().hex[:12]
+        # Local channel -> queue of (expires at, message)
+        self.channels = {}
+        # Group -> {local channel: joined at}
+        self.groups = {}
+        self._states = {}
+
+    # -------------------------
+    # NAMES
+    # -------------------------
+
+    def notify_channel(self, kind, name):
+        """PostgreSQL notification channel for a group ('g') or channel ('c') name"""
+        digest = hashlib.sha1(f'{self.prefix}:{name}'.encode()).hexdigest()[:40]
+        return f'chl_{kind}_{digest}'
+
+    def channel_target(self, channel):
+        """Notification channel a message for `channel` is sent on"""
+        return self.notify_channel('c', self.non_local_name(channel))
+
+    # -------------------------
+    # CHANNEL LAYER API
+    # -------------------------
+
+    async def send(self, channel, message):
+        """Send a message onto a (general or specific) channel"""
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        assert '__asgi_channel__' not in message
+        await self.publish(self.channel_target(channel), ['c', channel, message])
+
+    async def receive(self, channel):
+        """Receive the first message that arrives on a channel of this process"""
+        assert self.valid_channel_name(channel)
+        await self.listen(self.channel_target(channel))
+
+        queue = self.channels.setdefault(channel, asyncio.Queue())
+        try:
+            while True:
+                expires, message = await queue.get()
+                if expires >= time.time():
+                    return message
+        finally:
+            if queue.empty() and self.channels.get(channel) is queue:
+                del self.channels[channel]
+
+    async def new_channel(self, prefix='specific.'):
+        """A new channel name that this process can receive on"""
+        await self.listen(self.notify_channel('c', f'{prefix}{self.client_prefix}!'))
+        return '%s%s!%s' % (
+            prefix,
+            self.client_prefix,
+            ''.join(random.choice(string.ascii_letters) for _ in range(12)),
+        )
+
+    async def group_add(self, group, channel):
+        """Add a channel of this process to a group"""
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        self.groups.setdefault(group, {})[channel] = time.time()
+        await self.listen(self.notify_channel('g', group))
+
+    async def group_discard(self, group, channel):
+        """Remove a channel from a group; stop listening once no local member is left"""
+        assert self.valid_channel_name(channel), 'Invalid channel name'
+        assert self.valid_group_name(group), 'Invalid group name'
+        members = self.groups.get(group)
+        if members is None:
+            return
+        members.pop(channel, None)
+        if not members:
+            del self.groups[group]
+            await self.unlisten(self.notify_channel('g', group))
+
+    async def group_send(self, group, message):
+        """Send a message to every member of a group, in every process"""
+        assert isinstance(message, dict), 'Message is not a dict'
+        assert self.valid_group_name(group), 'Invalid group name'
+        await self.publish(self.notify_channel('g', group), ['g', group, message])
+
+    async def flush(self):
+        """Forget every local channel and group"""
+        state = self.get_state()
+        self.channels = {}
+        self.groups = {}
+        if state.listener is not None and not state.listener.closed and state.listening:
+            await state.listener.execute('UNLISTEN *')
+        state.listening.clear()
+
+    async def close(self):
+        """Close the connections of the current event loop"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            state.close()
+
+    # -------------------------
+    # SENDING
+    # -------------------------
+
+    def get_state(self):
+        """Connection state for the running event loop"""
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            # Drop the connections of event loops that are gone (e.g. async_to_sync calls)
+            for old_loop in [old_loop for old_loop in self._states if old_loop.is_closed()]:
+                self._states.pop(old_loop).close()
+            state = self._states[loop] = LoopState()
+        return state
+
+    async def publish(self, target, item):
+        """Queue an item for a notification channel and wait until its batch is sent"""
+        payload = json.dumps(item, separators=(',', ':'))
+        if len(payload.encode()) > MAX_PAYLOAD_BYTES - 32:
+            raise ValueError(f'Message too large for the channel layer ({len(payload.encode())} bytes)')
+        state = self.get_state()
+        future = asyncio.get_running_loop().create_future()
+        state.pending.append((target, payload, future))
+        if state.flush_task is None or state.flush_task.done():
+            state.flush_task = asyncio.get_running_loop().create_task(self.flush_pending(state))
+        await future
+
+    def build_batches(self, state, pending):
+        """
+        Pack queued (target, payload, future) items into NOTIFY payloads.
+
+        Returns:
+            list: (target, payload, futures) tuples, items of one target packed
+                  together up to MAX_PAYLOAD_BYTES
+        """
+        by_target = {}
+        for target, payload, future in pending:
+            by_target.setdefault(target, []).append((payload, future))
+
+        batches = []
+        for target, items in by_target.items():
+            parts, futures, size = [], [], 0
+            for payload, future in items:
+                if parts and size + len(payload.encode()) + 1 > MAX_PAYLOAD_BYTES - 32:
+                    batches.append(self.pack(state, target, parts, futures))
+                    parts, futures, size = [], [], 0
+                parts.append(payload)
+                futures.append(future)
+                size += len(payload.encode()) + 1
+            batches.append(self.pack(state, target, parts, futures))
+        return batches
+
+    @staticmethod
+    def pack(state, target, parts, futures):
+        # The sequence number keeps PostgreSQL from folding identical payloads
+        state.sequence += 1
+        return target, '[%d,[%s]]' % (state.sequence, ','.join(parts)), futures
+
+    async def flush_pending(self, state):
+        """Send everything queued in this event loop, one statement per MAX_NOTIFIES_PER_STATEMENT batches"""
+        await asyncio.sleep(self.batch_delay)
+        while state.pending:
+            pending, state.pending = state.pending, []
+            batches = self.build_batches(state, pending)
+            for start in range(0, len(batches), MAX_NOTIFIES_PER_STATEMENT):
+                chunk = batches[start:start + MAX_NOTIFIES_PER_STATEMENT]
+                params = []
+                for target, payload, _ in chunk:
+                    params.extend([target, payload])
+                try:
+                    sender = await self.get_sender(state)
+                    await sender.execute(
+                        'SELECT ' + ', '.join(['pg_notify(%s, %s)'] * len(chunk)),
+                        params
+                    )
+                except Exception as e:
+                    if state.sender is not None and state.sender.closed:
+                        state.sender = None
+                    for _, _, futures in chunk:
+                        for future in futures:
+                            if not future.done():
+                                future.set_exception(e)
+                else:
+                    for _, _, futures in chunk:
+                        for future in futures:
+                            if not future.done():
+                                future.set_result(None)
+
+    async def get_sender(self, state):
+        """Open the sending connection of an event loop on first use"""
+        if state.sender is None or state.sender.closed:
+            sender = AsyncConnection(get_connect_kwargs(self.database))
+            await sender.open()
+            state.sender = sender
+        return state.sender
+
+    # -------------------------
+    # RECEIVING
+    # -------------------------
+
+    async def get_listener(self, state):
+        """Open the listening connection of an event loop on first use"""
+        async with state.lock:
+            if state.listener is None or state.listener.closed:
+                listener = AsyncConnection(
+                    get_connect_kwargs(self.database),
+                    on_notify=self.dispatch,
+                    on_lost=lambda: asyncio.get_running_loop().create_task(self.reconnect(state)),
+                )
+                await listener.open()
+                # After a reconnect, listen again on everything this process listened on
+                for target in state.listening:
+                    await listener.execute(f'LISTEN {target}')
+                state.listener = listener
+            return state.listener
+
+    async def listen(self, target):
+        state = self.get_state()
+        if target in state.listening and state.listener is not None and not state.listener.closed:
+            return
+        listener = await self.get_listener(state)
+        if target not in state.listening:
+            await listener.execute(f'LISTEN {target}')
+            state.listening.add(target)
+
+    async def unlisten(self, target):
+        state = self.get_state()
+        if target not in state.listening:
+            return
+        state.listening.discard(target)
+        if state.listener is not None and not state.listener.closed:
+            await state.listener.execute(f'UNLISTEN {target}')
+
+    async def reconnect(self, state):
+        """Reopen a lost listener, retrying every RECONNECT_DELAY seconds"""
+        while True:
+            try:
+                await self.get_listener(state)
+                return
+            except (psycopg2.Error, OSError):
+                logger.warning('Channel layer could not reconnect its listener', exc_info=True)
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    def dispatch(self, target, payload):
+        """Deliver the items of one notification to the local channels"""
+        _, items = json.loads(payload)
+        for kind, name, message in items:
+            if kind == 'g':
+                members = list(self.groups.get(name, ()))
+                for index, channel in enumerate(members):
+                    # Every member gets its own copy, as with the in-memory layer
+                    self.deliver(channel, message if index == len(members) - 1 else copy.deepcopy(message))
+            else:
+                self.deliver(name, message)
+
+    def deliver(self, channel, message):
+        queue = self.channels.setdefault(channel, asyncio.Queue())
+        if queue.qsize() >= self.get_capacity(channel):
+            # Make room by dropping messages nobody received in time (e.g. a channel that went away)
+            while not queue.empty() and queue._queue[0][0] < time.time():
+                queue.get_nowait()
+        if queue.qsize() >= self.get_capacity(channel):
+            logger.warning('Channel %s is full, message dropped', channel)
+            return
+        queue.put_nowait((time.time() + self.expiry, message))
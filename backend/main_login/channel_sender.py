@@ -0,0 +1,74 @@
+"""
+Channel layer sends from synchronous code.
+
+async_to_sync() called from a thread without an event loop (WSGI requests,
+background jobs, management commands) runs each call in a new event loop,
+and PostgresChannelLayer keeps its sending connection per event loop, so
+every push opened (and dropped) a database connection. send_from_sync()
+runs those sends in one long-lived event loop in a daemon thread instead,
+so the process keeps a single sending connection and concurrent sends are
+still batched together.
+
+A sync view served by the ASGI server runs in a thread whose calls
+async_to_sync() already hands to the server's event loop (where the layer's
+connections live); those sends keep going there.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+from asgiref.sync import SyncToAsync, async_to_sync
+
+
+# Seconds to wait for a send before giving up
+SEND_TIMEOUT = 10
+
+
+class SenderLoop:
+    """Event loop running in a daemon thread, started on first use (one per process)"""
+
+    def __init__(self):
+        self.loop = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def get_loop(self):
+        """The running sender loop, started again in a forked child"""
+        with self.lock:
+            if self.loop is None or self.pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='channel-sender', daemon=True).start()
+                self.loop, self.pid = loop, os.getpid()
+            return self.loop
+
+    def run(self, func, *args, timeout=SEND_TIMEOUT):
+        """Run func(*args) in the sender loop and return its result"""
+        future = asyncio.run_coroutine_threadsafe(func(*args), self.get_loop())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+
+sender_loop = SenderLoop()
+
+
+def in_server_thread():
+    """Whether this thread was started by sync_to_async() from a running event loop"""
+    loop = getattr(SyncToAsync.threadlocal, 'main_event_loop', None)
+    return (
+        loop is not None
+        and getattr(SyncToAsync.threadlocal, 'main_event_loop_pid', None) == os.getpid()
+        and loop.is_running()
+    )
+
+
+def send_from_sync(func, *args):
+    """
+    Call the coroutine function func(*args) (e.g. channel_layer.group_send)
+    from synchronous code and return its result.
+    """
+    if in_server_thread():
+        return async_to_sync(func)(*args)
+    return sender_loop.run(func, *args)
@@ -0,0 +1,152 @@
+"""
+Central allocator for generated identifiers.
+
+Usernames, admission numbers, student IDs and employee numbers are taken from
+counter rows in the identifier_sequences table (see IdentifierSequence) instead
+of probing the target tables with exists() until a free value is found
+(a generated username is still checked once, see next_username).
+
+Allocation is a single UPDATE ... RETURNING once a counter row exists; the first
+allocation for a counter inserts it with INSERT ... ON CONFLICT, so concurrent
+callers always get distinct values. Like database sequences, values are not
+handed back if the surrounding transaction rolls back, so gaps are expected.
+"""
+import datetime
+import re
+from django.db import connection
+from django.utils import timezone
+from .models import IdentifierSequence, User
+
+
+# Sequence names
+USERNAME_SEQUENCE = 'username'
+ADMISSION_NUMBER_SEQUENCE = 'admission_number'
+STUDENT_ID_SEQUENCE = 'student_id'
+EMPLOYEE_NO_SEQUENCE = 'employee_no'
+
+# Generated numbers are zero-padded to a width older generators never produced
+# (they used 3-6 digits), so new values cannot clash with existing records.
+ADMISSION_NUMBER_FORMAT = 'ADM-{year}-{value:07d}'
+STUDENT_ID_FORMAT = 'STUD-{year}-{value:07d}'
+EMPLOYEE_NO_FORMAT = 'EMP{year}{value:04d}'
+
+
+def allocate_sequence(name, scope_key='', year=0, count=1, seed=None):
+    """
+    Reserve `count` consecutive values from a counter in one round trip.
+
+    Args:
+        name: sequence name
+        scope_key: optional scope within the sequence
+        year: year the counter applies to (0 for counters that never reset)
+        count: number of values to reserve
+        seed: optional callable returning the last value already in use,
+              only called when the counter row does not exist yet
+
+    Returns:
+        range: the reserved values
+    """
+    table = connection.ops.quote_name(IdentifierSequence._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET last_value = last_value + %s, updated_at = %s '
+            f'WHERE name = %s AND scope_key = %s AND year = %s '
+            f'RETURNING last_value',
+            [count, now, name, scope_key, year],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            # First use of this counter. If another request creates the row
+            # concurrently the conflict branch increments it instead.
+            start = seed() if seed else 0
+            cursor.execute(
+                f'INSERT INTO {table} (name, scope_key, year, last_value, updated_at) '
+                f'VALUES (%s, %s, %s, %s, %s) '
+                f'ON CONFLICT (name, scope_key, year) DO UPDATE '
+                f'SET last_value = {table}.last_value + %s, updated_at = EXCLUDED.updated_at '
+                f'RETURNING last_value',
+                [name, scope_key, year, start + count, now, count],
+            )
+            row = cursor.fetchone()
+    last_value = row[0]
+    return range(last_value - count + 1, last_value + 1)
+
+
+# -------------------------
+# USERNAMES
+# -------------------------
+
+def _username_seed(base_username):
+    """
+    Count the usernames already taken for a base (base, base1, base2, ...).
+    Only used the first time a base username is allocated.
+    """
+    pattern = rf'^{re.escape(base_username)}[0-9]*$'
+    taken = User.objects.filter(username__regex=pattern).values_list('username', flat=True)
+    seed = 0
+    for username in taken:
+        suffix = username[len(base_username):]
+        seed = max(seed, int(suffix) + 1 if suffix else 1)
+    return seed
+
+
+def next_username(base_username):
+    """
+    Get a unique username for a base username (usually the part of the email before @).
+    Returns base, then base1, base2, ... as the base is reused.
+
+    The counter of one base does not know about names made from another base
+    ("john2" is both john's third name and the base "john2"), so a value that
+    is already taken is skipped and the next one is allocated.
+    """
+    while True:
+        value = allocate_sequence(
+            USERNAME_SEQUENCE,
+            scope_key=base_username,
+            seed=lambda: _username_seed(base_username),
+        )[0]
+        username = base_username if value == 1 else f'{base_username}{value - 1}'
+        if not User.objects.filter(username=username).exists():
+            return username
+
+
+# -------------------------
+# ADMISSION / STUDENT / EMPLOYEE NUMBERS
+# -------------------------
+
+def _allocate_formatted(name, template, count, year=None):
+    """Allocate `count` values from a yearly sequence and format them"""
+    year = year or datetime.date.today().year
+    values = allocate_sequence(name, year=year, count=count)
+    return [template.format(year=year, value=value) for value in values]
+
+
+def allocate_admission_numbers(count=1, year=None):
+    """Allocate admission numbers (e.g. ADM-2025-0000001)"""
+    return _allocate_formatted(ADMISSION_NUMBER_SEQUENCE, ADMISSION_NUMBER_FORMAT, count, year)
+
+
+def allocate_student_ids(count=1, year=None):
+    """Allocate NewAdmission student IDs (e.g. STUD-2025-0000001)"""
+    return _allocate_formatted(STUDENT_ID_SEQUENCE, STUDENT_ID_FORMAT, count, year)
+
+
+def allocate_employee_numbers(count=1, year=None):
+    """Allocate teacher employee numbers (e.g. EMP20250001)"""
+    return _allocate_formatted(EMPLOYEE_NO_SEQUENCE, EMPLOYEE_NO_FORMAT, count, year)
+
+
+def next_admission_number():
+    """Get a single new admission number"""
+    return allocate_admission_numbers()[0]
+
+
+def next_student_id():
+    """Get a single new NewAdmission student ID"""
+    return allocate_student_ids()[0]
+
+
+def next_employee_no():
+    """Get a single new employee number"""
+    return allocate_employee_numbers()[0]
@@ -0,0 +1,105 @@
+"""
+Background jobs run in a thread of the web process.
+
+start_job() records a BackgroundJob row and runs the function in a daemon
+thread once the current transaction commits, so the job sees the data the
+request wrote. The function's return value is stored as the job result and
+can be polled with GET /api/auth/jobs/<job_id>/.
+
+record_job() stores the outcome of work that ran synchronously (scheduled
+sweeps) in the same table, keeping the latest RECORDED_JOB_HISTORY runs of
+each name.
+
+Jobs are not persisted across restarts: a job still running when the process
+exits stays 'running'. Use this for work that is safe to start again, such
+as batch operations that skip rows already done.
+"""
+import logging
+import threading
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from .models import BackgroundJob
+
+
+logger = logging.getLogger(__name__)
+
+# Recorded runs kept per job name (older ones are deleted by record_job)
+RECORDED_JOB_HISTORY = 100
+
+
+def start_job(name, func, kwargs=None, user=None, school_id=None):
+    """
+    Run func(**kwargs) in the background.
+
+    Args:
+        name: job name shown to clients
+        func: callable returning a JSON-serializable result
+        kwargs: keyword arguments for func (plain values, not model instances)
+        user: user who started the job
+        school_id: school the job works on
+
+    Returns:
+        BackgroundJob: the pending job
+    """
+    job = BackgroundJob.objects.create(
+        name=name,
+        created_by=user if user is not None and user.is_authenticated else None,
+        school_id=school_id,
+    )
+    thread = threading.Thread(
+        target=run_job,
+        args=(job.pk, func, kwargs or {}),
+        name=f'job-{name}-{job.pk}',
+        daemon=True,
+    )
+    transaction.on_commit(thread.start)
+    return job
+
+
+def run_job(job_id, func, kwargs):
+    """Run a job and record its outcome (runs in the job's thread)"""
+    close_old_connections()
+    try:
+        BackgroundJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+        try:
+            result = func(**kwargs)
+        except Exception as e:
+            logger.exception('Background job %s failed', job_id)
+            BackgroundJob.objects.filter(pk=job_id).update(
+                status='failed', error=str(e), finished_at=timezone.now()
+            )
+        else:
+            BackgroundJob.objects.filter(pk=job_id).update(
+                status='completed', result=result, finished_at=timezone.now()
+            )
+    finally:
+        # Threads get their own connections; close them when the job ends
+        connections.close_all()
+
+
+def record_job(name, result, started_at, school_id=None):
+    """
+    Record work that already ran in the current thread (e.g. a scheduled
+    sweep) as a completed BackgroundJob, so its outcome can be looked up
+    like any other job. Only the latest RECORDED_JOB_HISTORY recorded runs
+    of `name` are kept.
+
+    Returns:
+        BackgroundJob: the completed job
+    """
+    job = BackgroundJob.objects.create(
+        name=name,
+        status='completed',
+        school_id=school_id,
+        result=result,
+        started_at=started_at,
+        finished_at=timezone.now(),
+    )
+    # Recorded runs have no creator; jobs started from requests are left alone
+    older = BackgroundJob.objects.filter(name=name, status='completed', created_by__isnull=True).order_by(
+        '-finished_at', '-created_at'
+    )
+    stale = list(older.values_list('pk', flat=True)[RECORDED_JOB_HISTORY:])
+    if stale:
+        BackgroundJob.objects.filter(pk__in=stale).delete()
+    return job
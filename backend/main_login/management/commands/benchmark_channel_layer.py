@@ -0,0 +1,134 @@
+"""
+Management command to measure channel layer throughput.
+
+Creates groups of channels, sends group messages to them as fast as possible
+and waits until every member received every message, for the in-memory
+layer and for the PostgreSQL LISTEN/NOTIFY layer (main_login.channel_layer).
+Reports messages sent and delivered per second and delivery latency.
+"""
+import asyncio
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from channels.layers import InMemoryChannelLayer
+
+
+BACKENDS = ['memory', 'postgres']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory and PostgreSQL channel layers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            action='append',
+            choices=BACKENDS,
+            help='Layer to benchmark, may be repeated (default: all)'
+        )
+        parser.add_argument('--groups', type=int, default=10, help='Number of groups (default: 10)')
+        parser.add_argument('--members', type=int, default=20, help='Channels per group (default: 20)')
+        parser.add_argument('--messages', type=int, default=2000, help='Group messages sent in total (default: 2000)')
+        parser.add_argument('--size', type=int, default=200, help='Message text size in bytes (default: 200)')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Group sends in flight at once (default: 100)'
+        )
+        parser.add_argument('--database', default='default', help='Database alias for the PostgreSQL layer')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for delivery (default: 60)')
+
+    def handle(self, *args, **options):
+        if options['groups'] < 1 or options['members'] < 1 or options['messages'] < 1:
+            raise CommandError('--groups, --members and --messages must be at least 1.')
+
+        for backend in options['backend'] or BACKENDS:
+            layer = self.get_layer(backend, options)
+            try:
+                result = asyncio.run(self.run(layer, options))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'{backend}: failed ({e})'))
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{backend}: {result['sent']} sent in {result['send_time']:.2f}s "
+                    f"({result['sent'] / result['send_time']:.0f} msg/s), "
+                    f"{result['delivered']}/{result['expected']} delivered in {result['total_time']:.2f}s "
+                    f"({result['delivered'] / result['total_time']:.0f} msg/s), "
+                    f"latency p50 {result['p50'] * 1000:.1f} ms, p99 {result['p99'] * 1000:.1f} ms"
+                )
+            )
+
+    @staticmethod
+    def get_layer(backend, options):
+        """Layer instance with room for every message of the run"""
+        capacity = options['messages'] + 1
+        if backend == 'postgres':
+            from main_login.channel_layer import PostgresChannelLayer
+            return PostgresChannelLayer(database=options['database'], prefix='benchmark', capacity=capacity)
+        return InMemoryChannelLayer(capacity=capacity)
+
+    async def run(self, layer, options):
+        """Send the group messages and wait for every delivery"""
+        groups = [f'benchmark-{index}' for index in range(options['groups'])]
+        members = {group: [] for group in groups}
+        for group in groups:
+            for _ in range(options['members']):
+                channel = await layer.new_channel()
+                await layer.group_add(group, channel)
+                members[group].append(channel)
+
+        # Messages go to the groups round-robin
+        per_group = {group: 0 for group in groups}
+        for index in range(options['messages']):
+            per_group[groups[index % len(groups)]] += 1
+
+        latencies = []
+
+        async def receive(channel, count):
+            for _ in range(count):
+                message = await layer.receive(channel)
+                latencies.append(time.perf_counter() - message['sent_at'])
+
+        receivers = [
+            asyncio.ensure_future(receive(channel, per_group[group]))
+            for group in groups
+            for channel in members[group]
+        ]
+
+        text = 'x' * options['size']
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def send(index):
+            async with semaphore:
+                await layer.group_send(groups[index % len(groups)], {
+                    'type': 'benchmark.message',
+                    'message': text,
+                    'sent_at': time.perf_counter(),
+                })
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(index) for index in range(options['messages'])))
+        send_time = time.perf_counter() - start
+        await asyncio.wait(receivers, timeout=options['timeout'])
+        total_time = time.perf_counter() - start
+        for receiver in receivers:
+            receiver.cancel()
+
+        for group in groups:
+            for channel in members[group]:
+                await layer.group_discard(group, channel)
+        await layer.flush()
+        await layer.close()
+
+        latencies.sort()
+        return {
+            'sent': options['messages'],
+            'send_time': max(send_time, 1e-9),
+            'expected': options['messages'] * options['members'],
+            'delivered': len(latencies),
+            'total_time': max(total_time, 1e-9),
+            'p50': statistics.median(latencies) if latencies else 0,
+            'p99': latencies[int(len(latencies) * 0.99) - 1] if latencies else 0,
+        }
@@ -8,6 +8,7 @@ import string
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from main_login.models import Role
+from main_login.identifiers import next_username
 
 User = get_user_model()
 
@@ -56,13 +57,7 @@ class Command(BaseCommand):
         
         # Generate username from email if not provided
         if not username:
-            username = email.split('@')[0]
-            # Ensure username is unique
-            base_username = username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f'{base_username}{counter}'
-                counter += 1
+            username = next_username(email.split('@')[0])
         
         # Generate 8-character password if not provided
         if not password:
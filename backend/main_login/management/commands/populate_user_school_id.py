@@ -4,7 +4,7 @@ Usage: python manage.py populate_user_school_id
 """
 from django.core.management.base import BaseCommand
 from main_login.models import User
-from main_login.utils import get_user_school_id
+from main_login.utils import resolve_user_school_id
 
 
 class Command(BaseCommand):
@@ -17,7 +17,7 @@ class Command(BaseCommand):
         
         for user in users:
             # Get school_id from user's relationships
-            school_id = get_user_school_id(user)
+            school_id = resolve_user_school_id(user)
             
             if school_id:
                 # Update user's school_id if it's different or not set
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_login', '0005_add_school_id_to_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="Sequence name (e.g. 'admission_number')", max_length=50)),
+                ('scope_key', models.CharField(blank=True, default='', help_text='Optional scope within the sequence (e.g. base username)', max_length=150)),
+                ('year', models.PositiveIntegerField(default=0, help_text='Year the sequence applies to (0 for sequences that never reset)')),
+                ('last_value', models.BigIntegerField(default=0, help_text='Last value handed out')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Identifier Sequence',
+                'verbose_name_plural': 'Identifier Sequences',
+                'db_table': 'identifier_sequences',
+                'unique_together': {('name', 'scope_key', 'year')},
+            },
+        ),
+    ]
@@ -3,7 +3,8 @@ ViewSet mixins for automatic school-based data filtering
 """
 from rest_framework.response import Response
 from rest_framework import status
-from .utils import get_user_school_id
+from .utils import get_request_school_id, get_request_role
+from .tenancy import get_tenant_filter_path
 
 
 class SchoolFilterMixin:
@@ -28,8 +29,8 @@ class SchoolFilterMixin:
     school_id_field = 'school_id'
     
     def get_school_id(self):
-        """Get the school_id for the current logged-in user"""
-        return get_user_school_id(self.request.user)
+        """Get the school_id for the current logged-in user (resolved once per request)"""
+        return get_request_school_id(self.request)
     
     def get_queryset(self):
         """
@@ -44,9 +45,8 @@ class SchoolFilterMixin:
         queryset = super().get_queryset()
         
         # Check if user is super admin (should see all data)
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                return queryset
+        if get_request_role(self.request) == 'super_admin':
+            return queryset
         
         # Get school_id for current user
         school_id = self.get_school_id()
@@ -56,28 +56,13 @@ class SchoolFilterMixin:
             # This prevents users without school access from seeing any data
             return queryset.none()
         
-        # Filter by school_id
-        # Handle both direct school_id field and ForeignKey to School
-        filter_kwargs = {}
+        # Filter by school_id using the path precomputed for this model
+        # (direct school_id field or ForeignKey to School, see main_login.tenancy)
+        filter_path = get_tenant_filter_path(queryset.model, self.school_id_field)
         
-        # Check if model has direct school_id field
-        if hasattr(queryset.model, self.school_id_field):
-            filter_kwargs[self.school_id_field] = school_id
-        # Check if model has ForeignKey to School (Django creates school_id field automatically)
-        elif hasattr(queryset.model, 'school'):
-            filter_kwargs['school__school_id'] = school_id
-        # Check if model has school ForeignKey with different name
-        elif hasattr(queryset.model, '_meta'):
-            # Look for any ForeignKey to School model
-            from super_admin.models import School
-            for field in queryset.model._meta.get_fields():
-                if hasattr(field, 'related_model') and field.related_model == School:
-                    filter_kwargs[f'{field.name}__school_id'] = school_id
-                    break
-        
-        if filter_kwargs:
+        if filter_path:
             # Apply school_id filter on top of existing filters
-            return queryset.filter(**filter_kwargs)
+            return queryset.filter(**{filter_path: school_id})
         
         # If no school_id field found, return queryset as-is (for models without school filtering)
         return queryset
@@ -89,11 +74,10 @@ class SchoolFilterMixin:
         school_id = self.get_school_id()
         
         # Check if user is super admin
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                # Super admin can set school_id manually or leave it
-                super().perform_create(serializer)
-                return
+        if get_request_role(self.request) == 'super_admin':
+            # Super admin can set school_id manually or leave it
+            super().perform_create(serializer)
+            return
         
         # For non-super-admin users, automatically set school_id
         if school_id:
@@ -123,9 +107,8 @@ class SchoolFilterMixin:
         school_id = self.get_school_id()
         
         # Check if user is super admin
-        if hasattr(request.user, 'role') and request.user.role:
-            if request.user.role.name == 'super_admin':
-                return super().create(request, *args, **kwargs)
+        if get_request_role(request) == 'super_admin':
+            return super().create(request, *args, **kwargs)
         
         # For non-super-admin users, check if school_id is available
         if not school_id:
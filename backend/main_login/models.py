@@ -5,6 +5,7 @@ Models for main_login app - User, Role, and Authentication
 import uuid
 import random
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -203,3 +204,78 @@ class User(AbstractBaseUser, PermissionsMixin):
         db_table = 'users'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+
+
+
+# -------------------------
+# IDENTIFIER SEQUENCE MODEL
+# -------------------------
+
+class IdentifierSequence(models.Model):
+    """
+    Counter table backing generated identifiers (usernames, admission numbers,
+    student IDs, employee numbers). One row per (name, scope_key, year);
+    values are handed out by main_login.identifiers.
+    """
+
+    name = models.CharField(max_length=50, help_text="Sequence name (e.g. 'admission_number')")
+    scope_key = models.CharField(max_length=150, blank=True, default='', help_text='Optional scope within the sequence (e.g. base username)')
+    year = models.PositiveIntegerField(default=0, help_text='Year the sequence applies to (0 for sequences that never reset)')
+    last_value = models.BigIntegerField(default=0, help_text='Last value handed out')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}[{self.scope_key}:{self.year}] = {self.last_value}"
+
+    class Meta:
+        db_table = 'identifier_sequences'
+        unique_together = ['name', 'scope_key', 'year']
+        verbose_name = 'Identifier Sequence'
+        verbose_name_plural = 'Identifier Sequences'
+
+
+# -------------------------
+# BACKGROUND JOB MODEL
+# -------------------------
+
+class BackgroundJob(models.Model):
+    """
+    A long-running task started from a request (e.g. a large batch approval).
+    Jobs are run by main_login.jobs; clients poll /api/auth/jobs/<job_id>/.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=100, help_text="Job name (e.g. 'approve_admissions')")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    school_id = models.CharField(max_length=100, db_index=True, null=True, blank=True, help_text='School the job works on (for filtering)')
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_jobs',
+        help_text='User who started the job'
+    )
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, help_text='Value returned by the job')
+    error = models.TextField(blank=True, default='', help_text='Error message if the job failed')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    class Meta:
+        db_table = 'background_jobs'
+        verbose_name = 'Background Job'
+        verbose_name_plural = 'Background Jobs'
+        ordering = ['-created_at']
@@ -0,0 +1,307 @@
+"""
+Pagination shared by the API apps.
+
+SelectablePagination (the REST_FRAMEWORK default) keeps page numbers for
+existing clients and switches to KeysetPagination per request.
+
+Unlike PageNumberPagination, a page is located with a WHERE clause on the
+ordering columns of the last row seen instead of an OFFSET, so fetching page
+N costs the same as fetching page 1 and rows inserted meanwhile never shift
+pages. The ordering always ends with the primary key so every position is
+unique, even when many rows share the same due date or timestamp.
+
+BidirectionalKeysetPagination also links to the page before the current one
+(e.g. newer messages of a chat whose pages go back in time).
+"""
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination.
+
+    Response format: {'next': <url or None>, 'results': [...]}
+    Query params: ?cursor=<opaque cursor from 'next'>&page_size=<n>
+
+    The ordering comes from the queryset (OrderingFilter / view.ordering /
+    model Meta.ordering). Ordering fields must be non-null columns of the
+    model: foreign keys are compared by their own id (see get_keyset_field),
+    and nullable or related-model fields are rejected with a 400.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of rows after the position encoded in ?cursor="""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        """Page size from ?page_size= (capped at max_page_size)"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Ordering of the queryset as a list of field names, with the primary key
+        appended as a tie-breaker (in the direction of the last field).
+        """
+        ordering = [
+            self.get_keyset_field(queryset.model, field)
+            for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+        return ordering
+
+    def get_keyset_field(self, model, field):
+        """
+        An ordering entry as a column the cursor can compare. A foreign key
+        becomes its id column: order_by('bus') would sort by the related
+        model's ordering, which a WHERE on the key value cannot follow.
+        Raises ValidationError for fields that cannot be used (NULLs have no
+        position in a comparison, related-model fields are not on the row).
+        """
+        name = field.lstrip('-')
+        if name == 'pk':
+            return field
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not model_field.concrete:
+            raise ValidationError({'ordering': [f'Cursor pagination cannot order by {name}.']})
+        if model_field.null:
+            raise ValidationError({'ordering': [f'Cursor pagination cannot order by {name}, it can be empty.']})
+        if model_field.is_relation:
+            name = model_field.attname
+        return f'-{name}' if field.startswith('-') else name
+
+    def get_position_filter(self, position):
+        """
+        WHERE clause selecting the rows after a position:
+        (a > x) OR (a = x AND b > y) OR ... with < for descending fields,
+        ANDed with a >= x (a <= x when descending). The OR-expanded form alone
+        cannot bound an index scan; the redundant bound on the leading column
+        lets the (school_id, a, pk) indexes start the range at the cursor.
+        """
+        condition = Q()
+        equal_so_far = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = f'{name}__lt' if field.startswith('-') else f'{name}__gt'
+            condition |= equal_so_far & Q(**{lookup: value})
+            equal_so_far &= Q(**{name: value})
+        if len(self.ordering) > 1:
+            field, value = self.ordering[0], position[0]
+            name = field.lstrip('-')
+            condition &= Q(**{f'{name}__lte' if field.startswith('-') else f'{name}__gte': value})
+        return condition
+
+    def get_next_link(self):
+        """URL of the next page, or None on the last page"""
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def encode_cursor(self, obj):
+        """Encode the ordering values of a row as an opaque cursor"""
+        values = [getattr(obj, self._get_field(type(obj), field).attname) for field in self.ordering]
+        # Dates/times are encoded with full precision (DjangoJSONEncoder drops microseconds)
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        payload = json.dumps(values, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        """
+        Decode ?cursor= into ordering values (converted to Python types).
+        Returns None if there is no cursor; raises NotFound if it is invalid.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        return self.decode_position(encoded, model)
+
+    def decode_position(self, encoded, model):
+        """Decode a cursor string into ordering values; raises NotFound if it is invalid"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self._get_field(model, field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _get_field(model, field):
+        """Model field for an ordering entry ('-due_date' -> due_date field)"""
+        name = field.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+
+class BidirectionalKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination that moves both ways from a position.
+
+    Response format: {'next': <url or None>, 'previous': <url or None>, 'results': [...]}
+    Query params: ?cursor=<opaque cursor from 'next' or 'previous'>&page_size=<n>
+
+    'next' continues in the queryset ordering after the last row of the page,
+    'previous' goes back before its first row. Results are always in the
+    queryset ordering. For a chat ordered newest first, the first page holds
+    the latest messages and 'next' loads older ones.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of rows after (or before) the position encoded in ?cursor="""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position = self.decode_cursor(request, queryset.model)
+        self.backwards = False
+        if position is not None:
+            self.backwards, position = position
+        if self.backwards:
+            # Walk the reversed ordering from the position, then restore the order
+            forward_ordering = self.ordering
+            self.ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in forward_ordering]
+            rows = list(queryset.order_by(*self.ordering).filter(self.get_position_filter(position))[:self.page_size + 1])
+            self.ordering = forward_ordering
+            self.has_previous = len(rows) > self.page_size
+            self.has_next = True
+            self.page = list(reversed(rows[:self.page_size]))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+            if position is not None:
+                queryset = queryset.filter(self.get_position_filter(position))
+            rows = list(queryset[:self.page_size + 1])
+            self.has_next = len(rows) > self.page_size
+            self.has_previous = position is not None
+            self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['previous'] = {'type': 'string', 'nullable': True, 'format': 'uri'}
+        return response_schema
+
+    def get_next_link(self):
+        """URL of the page after this one, or None on the last page"""
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        """URL of the page before this one, or None on the first page"""
+        if not self.has_previous or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[0], backwards=True))
+
+    def encode_cursor(self, obj, backwards=False):
+        """Encode a row position; backwards cursors are marked with a leading '-'"""
+        cursor = super().encode_cursor(obj)
+        return f'-{cursor}' if backwards else cursor
+
+    def decode_cursor(self, request, model):
+        """
+        Decode ?cursor= into (backwards, ordering values).
+        Returns None if there is no cursor; raises NotFound if it is invalid.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        # Encoded positions never start with '-' (base64 of a JSON list starts with 'W')
+        if encoded.startswith('-'):
+            return True, self.decode_position(encoded[1:], model)
+        return False, self.decode_position(encoded, model)
+
+
+class SelectablePagination(PageNumberPagination):
+    """
+    Page-number pagination (?page=N) by default; keyset pagination when the
+    request asks for it with ?pagination=cursor (or passes a ?cursor=).
+
+    Keyset pages follow the viewset's ordering plus the primary key, which the
+    tenant models back with (school_id, <ordering>, pk) indexes.
+    """
+    pagination_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        """Whether this request asked for keyset pagination"""
+        return (
+            request.query_params.get(self.pagination_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,96 @@
+"""
+In-process periodic tasks.
+
+start_periodic() runs a function every `interval` seconds in a daemon thread
+of the current process, for small maintenance work (status sweeps and the
+like) that would otherwise need cron. Every web worker process runs its own
+copy of the loop, so:
+
+- the first run is one interval after start-up, not at boot, so a deploy
+  does not run every task once per worker at the same moment;
+- on PostgreSQL each run takes a session advisory lock named after the task
+  (pg_try_advisory_lock); a worker that finds it taken skips that run, so
+  the workers never run the same task at the same time.
+
+Runs that start one after another in different workers are still possible,
+so the work must be idempotent.
+"""
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from django.db import close_old_connections, connection, connections
+
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def leader_lock(name):
+    """
+    Try to become the only process running task `name` (PostgreSQL advisory
+    lock, released on exit). Yields whether this process got it; always True
+    on other databases.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+    key = zlib.crc32(f'periodic:{name}'.encode())
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+
+
+def run_periodic(name, func, interval, stop=None):
+    """
+    Call func() every `interval` seconds, starting one interval from now,
+    until `stop` is set. A run is skipped while another process runs the
+    same task. Errors are logged and the loop carries on.
+    """
+    stop = stop or threading.Event()
+    while not stop.wait(interval):
+        close_old_connections()
+        try:
+            with leader_lock(name) as leader:
+                if leader:
+                    func()
+                else:
+                    logger.debug('Periodic task %s is running in another process, skipped', name)
+        except Exception:
+            logger.exception('Periodic task %s failed', name)
+        finally:
+            # The loop's thread holds its own connections; do not keep them idle
+            connections.close_all()
+
+
+def start_periodic(name, func, interval):
+    """
+    Start a periodic task in a daemon thread (once per process and name).
+
+    Returns:
+        threading.Event: set it to stop the task, or None if interval is 0
+    """
+    if not interval:
+        return None
+    with _lock:
+        if name in _tasks:
+            return _tasks[name]
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=run_periodic,
+            args=(name, func, interval, stop),
+            name=f'periodic-{name}',
+            daemon=True,
+        )
+        thread.start()
+        _tasks[name] = stop
+        return stop
@@ -2,7 +2,7 @@
 Serializer mixins for automatic school_id handling
 """
 from rest_framework import serializers
-from .utils import get_user_school_id
+from .utils import get_request_school_id, get_request_role
 
 
 class SchoolIdMixin:
@@ -38,17 +38,11 @@ class SchoolIdMixin:
         request = self.context.get('request') if hasattr(self, 'context') else None
         
         if request and hasattr(request, 'user'):
-            school_id = get_user_school_id(request.user)
+            school_id = get_request_school_id(request)
             
-            # Only auto-populate if user is not super admin
-            if school_id:
-                if hasattr(request.user, 'role') and request.user.role:
-                    if request.user.role.name != 'super_admin':
-                        # Auto-populate school_id for non-super-admin users
-                        validated_data['school_id'] = school_id
-                else:
-                    # No role means auto-populate
-                    validated_data['school_id'] = school_id
+            # Only auto-populate if user is not super admin (no role means auto-populate)
+            if school_id and get_request_role(request) != 'super_admin':
+                validated_data['school_id'] = school_id
         
         return super().create(validated_data)
 
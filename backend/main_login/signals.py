@@ -1,12 +1,77 @@
 """
 Signals to auto-populate school_id in User model when related profiles are created/updated
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from main_login.models import User
-from main_login.utils import get_user_school_id
+from main_login.utils import get_user_school_id, invalidate_user_school_id
+from main_login.authentication import invalidate_principal
+
+
+# -------------------------
+# PRINCIPAL CACHE INVALIDATION
+# -------------------------
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_principal_cache_for_user(sender, instance, **kwargs):
+    """Drop the cached principal when a user changes (e.g. deactivated or role changed)"""
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_save, sender='main_login.Role')
+@receiver(post_delete, sender='main_login.Role')
+def invalidate_principal_cache_for_role(sender, instance, **kwargs):
+    """Cached principals carry their Role, so drop them all when a role changes"""
+    invalidate_principal()
+
+
+# -------------------------
+# TENANT CACHE INVALIDATION
+# -------------------------
+# These receivers are registered before the school_id population handlers
+# below so that those handlers never read a stale cached school_id.
+
+@receiver(post_save, sender='super_admin.School')
+@receiver(post_delete, sender='super_admin.School')
+def invalidate_school_id_cache_for_school(sender, instance, **kwargs):
+    """
+    Clear the whole tenant cache when a School changes.
+    The school account user may have been re-assigned, and deleting a school
+    affects every user linked to it.
+    """
+    invalidate_user_school_id()
 
 
+@receiver(post_save, sender='management_admin.Teacher')
+@receiver(post_delete, sender='management_admin.Teacher')
+@receiver(post_save, sender='management_admin.Student')
+@receiver(post_delete, sender='management_admin.Student')
+@receiver(post_save, sender='student_parent.Parent')
+@receiver(post_delete, sender='student_parent.Parent')
+def invalidate_school_id_cache_for_profile(sender, instance, **kwargs):
+    """Invalidate the cached school_id of the user linked to a Teacher/Student/Parent profile"""
+    if instance.user_id:
+        invalidate_user_school_id(instance.user_id)
+
+
+@receiver(m2m_changed, sender='student_parent.Parent_students')
+def invalidate_school_id_cache_for_parent_students(sender, instance, action, reverse, **kwargs):
+    """Invalidate a parent's cached school_id when their linked students change"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user_school_id(instance.user_id)
+    else:
+        # Changed from the student side (student.parents.add(...)), so the
+        # affected parent users are not known without another query
+        invalidate_user_school_id()
+
+
+# -------------------------
+# USER school_id POPULATION
+# -------------------------
+
 @receiver(post_save, sender='management_admin.Teacher')
 def update_user_school_id_from_teacher(sender, instance, **kwargs):
     """
@@ -29,4 +94,3 @@ def update_user_school_id_from_student(sender, instance, **kwargs):
         if school_id and instance.user.school_id != school_id:
             # Use update_fields to avoid triggering save() again
             User.objects.filter(user_id=instance.user.user_id).update(school_id=school_id)
-
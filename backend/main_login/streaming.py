@@ -0,0 +1,45 @@
+"""
+Streaming responses that work under both WSGI and ASGI.
+
+Django serves a StreamingHttpResponse built from a synchronous generator
+under ASGI by consuming the whole generator first (sync_to_async(list)), so
+the response is buffered in memory and nothing is sent until the last line
+is ready. Under ASGI, stream_lines() hands Django an async iterator instead
+that pulls the generator a batch of lines at a time in the request's
+thread-sensitive thread (where its database connection and server-side
+cursor live). Under WSGI the generator is passed through unchanged.
+"""
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+def stream_lines(request, lines, batch_size=100, content_type='application/x-ndjson'):
+    """
+    Build a StreamingHttpResponse from a synchronous generator of lines.
+
+    Args:
+        request: the DRF or Django request being answered
+        lines: generator of str lines (may query the database)
+        batch_size: lines pulled per thread hop under ASGI
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return StreamingHttpResponse(iterate_async(lines, batch_size), content_type=content_type)
+    return StreamingHttpResponse(lines, content_type=content_type)
+
+
+async def iterate_async(lines, batch_size):
+    """Yield the lines of a synchronous generator, batch_size lines per chunk"""
+    next_batch = sync_to_async(lambda: list(islice(lines, batch_size)), thread_sensitive=True)
+    try:
+        while True:
+            batch = await next_batch()
+            if not batch:
+                return
+            yield ''.join(batch)
+    finally:
+        # Client gone or done: release the generator (and its cursor) in its own thread
+        close = getattr(lines, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
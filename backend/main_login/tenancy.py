@@ -0,0 +1,111 @@
+"""
+Tenant (school) filter registry for school-based data isolation.
+
+The lookup path used to filter a model by school_id is resolved once per model
+when the app registry is ready (see MainLoginConfig.ready) instead of being
+re-derived on every request by SchoolFilterMixin. The registry can be inspected
+with tenant_filter_registry(), and a system check verifies at startup that every
+routed viewset using SchoolFilterMixin maps to a tenant column.
+"""
+from django.apps import apps
+from django.core import checks
+
+
+# (model, school_id_field) -> filter lookup path, or None if the model has no tenant column
+_registry = {}
+
+
+def resolve_tenant_filter_path(model, school_id_field='school_id'):
+    """
+    Work out how to filter a model by school_id.
+
+    Returns:
+        str: lookup path (e.g. 'school_id' or 'school__school_id'), or None
+    """
+    # Direct school_id field (also the attname of a ForeignKey named 'school')
+    if hasattr(model, school_id_field):
+        return school_id_field
+    # ForeignKey to School named 'school'
+    if hasattr(model, 'school'):
+        return 'school__school_id'
+    # ForeignKey to School with a different name
+    from super_admin.models import School
+    for field in model._meta.get_fields():
+        if getattr(field, 'related_model', None) == School:
+            return f'{field.name}__school_id'
+    return None
+
+
+def build_tenant_filter_registry():
+    """Resolve the tenant filter path for every installed model"""
+    _registry.clear()
+    for model in apps.get_models():
+        _registry[(model, 'school_id')] = resolve_tenant_filter_path(model)
+
+
+def get_tenant_filter_path(model, school_id_field='school_id'):
+    """
+    Get the registered tenant filter path for a model.
+    Models or field names not seen at startup are resolved and registered on first use.
+    """
+    key = (model, school_id_field)
+    try:
+        return _registry[key]
+    except KeyError:
+        path = _registry[key] = resolve_tenant_filter_path(model, school_id_field)
+        return path
+
+
+def tenant_filter_registry():
+    """
+    Get a copy of the registry as {'app_label.ModelName': filter path or None}
+    (for the default school_id field).
+    """
+    return {
+        model._meta.label: path
+        for (model, school_id_field), path in _registry.items()
+        if school_id_field == 'school_id'
+    }
+
+
+def _iter_url_views(patterns):
+    """Yield the view classes of a (nested) list of URL patterns"""
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from _iter_url_views(pattern.url_patterns)
+        else:
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is not None:
+                yield view_class
+
+
+@checks.register('tenancy')
+def check_school_filter_viewsets(app_configs=None, **kwargs):
+    """Every routed viewset using SchoolFilterMixin must map to a tenant column"""
+    from django.urls import get_resolver
+    from .mixins import SchoolFilterMixin
+
+    errors = []
+    seen = set()
+    for view_class in _iter_url_views(get_resolver().url_patterns):
+        if view_class in seen or not issubclass(view_class, SchoolFilterMixin):
+            continue
+        seen.add(view_class)
+        queryset = getattr(view_class, 'queryset', None)
+        if queryset is None:
+            errors.append(checks.Error(
+                f'{view_class.__name__} uses SchoolFilterMixin but defines no queryset.',
+                hint='Set a queryset so its tenant filter can be resolved.',
+                obj=view_class,
+                id='main_login.E001',
+            ))
+            continue
+        if get_tenant_filter_path(queryset.model, view_class.school_id_field) is None:
+            errors.append(checks.Error(
+                f'{view_class.__name__} uses SchoolFilterMixin but '
+                f'{queryset.model._meta.label} has no school_id field or ForeignKey to School.',
+                hint='Add a tenant column to the model or set school_id_field on the viewset.',
+                obj=view_class,
+                id='main_login.E002',
+            ))
+    return errors
@@ -0,0 +1,359 @@
+"""
+Tests for main_login
+"""
+import asyncio
+import json
+import threading
+import zlib
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
+import psycopg2
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.utils import timezone
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase
+from .channel_layer import MAX_PAYLOAD_BYTES, LoopState, PostgresChannelLayer, get_connect_kwargs
+from .channel_sender import send_from_sync
+from .identifiers import next_username
+from .jobs import record_job
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from super_admin.models import School
+from .models import BackgroundJob, Role, User
+from .pagination import BidirectionalKeysetPagination, KeysetPagination
+from .scheduler import leader_lock, run_periodic
+from .views import get_tokens_for_user
+from .streaming import stream_lines
+
+
+class NextUsernameTests(TestCase):
+    """next_username() hands out names that are not taken yet"""
+
+    def create_user(self, username):
+        return User.objects.create(username=username, email=f'{username}@example.com')
+
+    def test_reuses_base_with_numbers(self):
+        self.create_user(next_username('john'))
+        self.assertEqual(next_username('john'), 'john1')
+
+    def test_skips_name_taken_by_another_base(self):
+        # "john2" is a base of its own and also john's third name
+        self.create_user(next_username('john'))
+        self.create_user(next_username('john'))
+        self.assertEqual(next_username('john2'), 'john2')
+        self.create_user('john2')
+
+        username = next_username('john')
+        self.assertEqual(username, 'john3')
+        self.create_user(username)
+
+
+class SchedulerTests(TestCase):
+    """Periodic tasks wait an interval, run in one process at a time and keep a bounded history"""
+
+    def test_first_run_waits_one_interval(self):
+        calls = []
+        stop = threading.Event()
+        thread = threading.Thread(target=run_periodic, args=('wait-test', lambda: calls.append(1), 0.5, stop))
+        thread.start()
+        stop.wait(0.2)
+        self.assertEqual(calls, [])
+        stop.wait(0.55)
+        stop.set()
+        thread.join()
+        self.assertEqual(calls, [1])
+
+    @skipUnless(connection.vendor == 'postgresql', 'advisory locks need PostgreSQL')
+    def test_leader_lock_is_exclusive(self):
+        key = zlib.crc32(b'periodic:lock-test')
+        other = psycopg2.connect(**get_connect_kwargs('default'))
+        try:
+            with leader_lock('lock-test') as leader:
+                self.assertTrue(leader)
+                with other.cursor() as cursor:
+                    cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+                    self.assertFalse(cursor.fetchone()[0])
+            with leader_lock('lock-test') as leader:
+                self.assertTrue(leader)
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+                self.assertTrue(cursor.fetchone()[0])
+                with leader_lock('lock-test') as leader:
+                    self.assertFalse(leader)
+        finally:
+            other.close()
+
+    def test_record_job_keeps_latest_runs(self):
+        started = BackgroundJob.objects.create(name='sweep', status='running')
+        with mock.patch('main_login.jobs.RECORDED_JOB_HISTORY', 3):
+            for run in range(5):
+                record_job('sweep', {'run': run}, timezone.now())
+        recorded = BackgroundJob.objects.filter(name='sweep', created_by__isnull=True).exclude(pk=started.pk)
+        self.assertEqual(sorted(job.result['run'] for job in recorded), [2, 3, 4])
+
+
+class KeysetPaginationTests(TestCase):
+    """Keyset pages visit every row once, including rows that share an ordering value"""
+
+    def setUp(self):
+        for number in range(7):
+            User.objects.create(
+                username=f'page{number}', email=f'page{number}@example.com', has_custom_password=number % 3 == 0
+            )
+        self.queryset = User.objects.order_by('-has_custom_password')
+        self.expected = list(self.queryset.order_by('-has_custom_password', '-user_id').values_list('pk', flat=True))
+
+    def get_page(self, pagination, cursor=None):
+        params = {'page_size': 2, **({'cursor': cursor} if cursor else {})}
+        page = pagination.paginate_queryset(self.queryset, Request(APIRequestFactory().get('/', params)))
+        return [user.pk for user in page], pagination.get_paginated_response([]).data
+
+    @staticmethod
+    def cursor(link):
+        return link and parse_qs(urlparse(link).query)['cursor'][0]
+
+    def test_forward_pages(self):
+        seen, cursor = [], None
+        while True:
+            page, data = self.get_page(KeysetPagination(), cursor)
+            seen += page
+            cursor = self.cursor(data['next'])
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_pages(self):
+        cursor = None
+        for _ in range(3):
+            _, data = self.get_page(BidirectionalKeysetPagination(), cursor)
+            cursor = self.cursor(data['next'])
+        page, data = self.get_page(BidirectionalKeysetPagination(), cursor)
+        self.assertEqual(page, self.expected[6:])
+        page, _ = self.get_page(BidirectionalKeysetPagination(), self.cursor(data['previous']))
+        self.assertEqual(page, self.expected[4:6])
+
+
+class TokenClaimTests(TestCase):
+    """Role and school come from the user's current state, not the JWT claims"""
+
+    def setUp(self):
+        self.admin_role, _ = Role.objects.get_or_create(name='management_admin')
+        self.teacher_role, _ = Role.objects.get_or_create(name='teacher')
+        self.user = User.objects.create(username='claims', email='claims@example.com', role=self.admin_role)
+        self.school = School.objects.create(
+            name='School', location='City', statecode='TG', districtcode='HYD',
+            registration_number='REG-CLAIMS', user=self.user,
+        )
+        self.tokens = get_tokens_for_user(self.user)
+        self.client = APIClient()
+
+    def demote(self):
+        self.user.role = self.teacher_role
+        self.user.save()
+        self.school.user = None
+        self.school.save()
+
+    def test_old_access_token_loses_demoted_role(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.tokens['access'])
+        self.assertEqual(self.client.get('/api/management-admin/buses/').status_code, 200)
+
+        self.demote()
+        self.assertEqual(self.client.get('/api/management-admin/buses/').status_code, 403)
+
+    def test_refresh_derives_claims_again(self):
+        self.demote()
+        response = self.client.post('/api/auth/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['role'], 'teacher')
+        self.assertIsNone(access['school_id'])
+
+    def test_refresh_rejects_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post('/api/auth/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StreamLinesTests(SimpleTestCase):
+    """stream_lines() streams under ASGI instead of buffering the generator"""
+
+    def lines(self, closed):
+        try:
+            for number in range(5):
+                yield f'{number}\n'
+        finally:
+            closed.append(True)
+
+    def test_asgi_streams_batches(self):
+        closed = []
+        response = stream_lines(AsyncRequestFactory().get('/'), self.lines(closed), batch_size=2)
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(asyncio.run(read()), [b'0\n1\n', b'2\n3\n', b'4\n'])
+        self.assertEqual(closed, [True])
+
+    def test_wsgi_passes_generator_through(self):
+        response = stream_lines(RequestFactory().get('/'), self.lines([]))
+        self.assertFalse(response.is_async)
+        self.assertEqual(b''.join(response.streaming_content), b'0\n1\n2\n3\n4\n')
+
+
+class SendFromSyncTests(SimpleTestCase):
+    """send_from_sync() reuses one event loop instead of one per call"""
+
+    async def current_loop(self):
+        return asyncio.get_running_loop()
+
+    def test_sync_callers_share_one_loop(self):
+        first = send_from_sync(self.current_loop)
+        self.assertIs(send_from_sync(self.current_loop), first)
+        self.assertTrue(first.is_running())
+
+    def test_server_threads_use_the_server_loop(self):
+        async def main():
+            server_loop = asyncio.get_running_loop()
+            self.assertIs(await sync_to_async(send_from_sync)(self.current_loop), server_loop)
+
+        asyncio.run(main())
+
+
+class FakeConnection:
+    """Stands in for the sending connection: records the statements"""
+
+    closed = False
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+
+class PostgresChannelLayerTests(SimpleTestCase):
+    """Batching and delivery of PostgresChannelLayer, without a server"""
+
+    def setUp(self):
+        self.layer = PostgresChannelLayer(prefix='test')
+
+    def test_build_batches_respects_payload_limit(self):
+        state = LoopState()
+        payload = json.dumps(['g', 'group', {'type': 'x', 'text': 'a' * 1000}])
+        pending = [('target_a', payload, None) for _ in range(20)] + [('target_b', payload, None)]
+
+        batches = self.layer.build_batches(state, pending)
+
+        self.assertGreater(len(batches), 2)
+        for target, packed, futures in batches:
+            self.assertLess(len(packed.encode()), MAX_PAYLOAD_BYTES)
+            self.assertEqual(len(json.loads(packed)[1]), len(futures))
+        self.assertEqual(sum(len(futures) for target, _, futures in batches if target == 'target_a'), 20)
+        self.assertEqual([len(futures) for target, _, futures in batches if target == 'target_b'], [1])
+
+    def test_publish_rejects_oversized_message(self):
+        async def send():
+            await self.layer.group_send('group', {'type': 'x', 'text': 'a' * MAX_PAYLOAD_BYTES})
+
+        with self.assertRaises(ValueError):
+            asyncio.run(send())
+
+    def test_publish_batches_concurrent_sends(self):
+        async def send():
+            state = self.layer.get_state()
+            state.sender = FakeConnection()
+            await asyncio.gather(*(
+                self.layer.group_send(f'group{index % 3}', {'type': 'x', 'index': index})
+                for index in range(30)
+            ))
+            return state.sender.statements
+
+        statements = asyncio.run(send())
+
+        # One statement, one NOTIFY per group
+        self.assertEqual(len(statements), 1)
+        sql, params = statements[0]
+        self.assertEqual(sql.count('pg_notify'), 3)
+        self.assertEqual(sum(len(json.loads(payload)[1]) for payload in params[1::2]), 30)
+
+    def test_dispatch_delivers_a_copy_to_every_member(self):
+        async def run():
+            self.layer.groups['group'] = {'one': 0, 'two': 0}
+            target = self.layer.notify_channel('g', 'group')
+            message = {'type': 'x', 'data': {'value': 1}}
+            self.layer.dispatch(target, json.dumps([1, [['g', 'group', message], ['c', 'three', message]]]))
+            return [self.layer.channels[name].get_nowait()[1] for name in ('one', 'two', 'three')]
+
+        one, two, three = asyncio.run(run())
+
+        self.assertEqual(one, {'type': 'x', 'data': {'value': 1}})
+        self.assertEqual(one, two)
+        self.assertIsNot(one['data'], two['data'])
+        self.assertEqual(three, one)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class PostgresChannelLayerIntegrationTests(SimpleTestCase):
+    """LISTEN/NOTIFY round trips against the configured PostgreSQL server"""
+
+    def test_group_and_channel_messages_round_trip(self):
+        async def run():
+            layer = PostgresChannelLayer(prefix='integration')
+            try:
+                channel = await layer.new_channel()
+                await layer.group_add('group', channel)
+                await layer.group_send('group', {'type': 'group.message'})
+                group_message = await asyncio.wait_for(layer.receive(channel), 5)
+                await layer.send(channel, {'type': 'direct.message'})
+                direct_message = await asyncio.wait_for(layer.receive(channel), 5)
+
+                # After group_discard the group is no longer listened to
+                await layer.group_discard('group', channel)
+                await layer.group_send('group', {'type': 'group.message'})
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(layer.receive(channel), 0.5)
+                return group_message, direct_message
+            finally:
+                await layer.flush()
+                await layer.close()
+
+        group_message, direct_message = asyncio.run(run())
+
+        self.assertEqual(group_message['type'], 'group.message')
+        self.assertEqual(direct_message['type'], 'direct.message')
+
+    def test_listener_reconnects_after_connection_loss(self):
+        async def run():
+            layer = PostgresChannelLayer(prefix='integration')
+            try:
+                channel = await layer.new_channel()
+                await layer.group_add('group', channel)
+                state = layer.get_state()
+                listener = state.listener
+
+                # Terminate the listening backend from another connection
+                with psycopg2.connect(**get_connect_kwargs()) as admin:
+                    with admin.cursor() as cursor:
+                        cursor.execute('SELECT pg_terminate_backend(%s)', [listener.conn.get_backend_pid()])
+                admin.close()
+
+                # Messages sent while reconnecting are lost; keep sending until one arrives
+                for _ in range(50):
+                    await layer.group_send('group', {'type': 'group.message'})
+                    try:
+                        return listener, state.listener, await asyncio.wait_for(layer.receive(channel), 0.2)
+                    except asyncio.TimeoutError:
+                        continue
+                return listener, state.listener, None
+            finally:
+                await layer.flush()
+                await layer.close()
+
+        old_listener, new_listener, message = asyncio.run(run())
+
+        self.assertIsNot(old_listener, new_listener)
+        self.assertEqual(message, {'type': 'group.message'})
+
@@ -0,0 +1,32 @@
+"""
+JWT token classes for main_login app
+"""
+from rest_framework_simplejwt.tokens import RefreshToken
+from .utils import get_user_school_id
+
+
+# Claim names embedded in every token issued by get_tokens_for_user
+SCHOOL_ID_CLAIM = 'school_id'
+ROLE_CLAIM = 'role'
+
+
+class SchoolRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's school_id and role name as signed claims.
+
+    Access tokens created from it (token.access_token) copy these claims. They
+    are for clients only: requests are authorized with the user's current role
+    and school (get_request_role / get_request_school_id), never the claims,
+    and the claims are derived again from the user on every refresh.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        return token
+
+    def set_user_claims(self, user):
+        """Set the school_id and role claims from the user's current state"""
+        self[SCHOOL_ID_CLAIM] = get_user_school_id(user)
+        self[ROLE_CLAIM] = user.role_name
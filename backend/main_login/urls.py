@@ -28,5 +28,8 @@ urlpatterns = [
     
     # Roles
     path('roles/', views.RoleListView.as_view(), name='roles_list'),
+    
+    # Background jobs
+    path('jobs/<uuid:job_id>/', views.job_status, name='job_status'),
 ]
 
@@ -1,9 +1,82 @@
 """
 Utility functions for school-based data isolation
 """
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
 from super_admin.models import School
 
 
+class TenantCache:
+    """
+    Bounded, thread-safe TTL/LRU cache keyed by user_id.
+    
+    Used for user_id -> school_id here: resolving a user's school walks up to
+    four relations (School, Teacher, Student, Parent), so the result is kept
+    per process and invalidated by the signal handlers in main_login.signals
+    whenever one of those changes. A cached value of None is a valid
+    (negative) entry. Also backs the principal cache in
+    main_login.authentication.
+    """
+    
+    MISSING = object()
+    
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value for key, or TenantCache.MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self.MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return self.MISSING
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        """Store value for key, evicting the least recently used entries"""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key=None):
+        """Drop a single key, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+school_id_cache = TenantCache(
+    max_entries=getattr(settings, 'TENANT_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'TENANT_CACHE_TTL', 300),
+)
+
+
+def invalidate_user_school_id(user_id=None):
+    """
+    Invalidate the cached school_id for a user (by user_id).
+    Pass None to clear the whole cache.
+    """
+    school_id_cache.invalidate(str(user_id) if user_id is not None else None)
+
+
 def get_user_school_id(user):
     """
     Get the school_id for a given user.
@@ -12,6 +85,72 @@ def get_user_school_id(user):
     For teacher users: Get from Teacher -> Department -> School
     For student/parent users: Get from Student -> School or Parent -> Student -> School
     
+    Results are cached per process (see TenantCache); use
+    resolve_user_school_id() to bypass the cache.
+    
+    Returns:
+        str: school_id if found, None otherwise
+    """
+    if not user or not user.is_authenticated:
+        return None
+    
+    cache_key = str(user.pk)
+    school_id = school_id_cache.get(cache_key)
+    if school_id is TenantCache.MISSING:
+        school_id = resolve_user_school_id(user)
+        school_id_cache.set(cache_key, school_id)
+    return school_id
+
+
+def get_request_school_id(request):
+    """
+    Get the school_id for the user of a request.
+    
+    The tenant comes from get_user_school_id() (the TenantCache, invalidated
+    when the user's school changes), never from the JWT's school_id claim,
+    which may be stale. It is resolved once per request and attached to it, so
+    the mixins, serializers and views handling the same request share one
+    lookup.
+    
+    Returns:
+        str: school_id if found, None otherwise
+    """
+    user = getattr(request, 'user', None)
+    user_id = getattr(user, 'pk', None)
+    tenant_context = getattr(request, '_tenant_context', None)
+    if tenant_context is not None and tenant_context[0] == user_id:
+        return tenant_context[1]
+    
+    school_id = get_user_school_id(user)
+    request._tenant_context = (user_id, school_id)
+    return school_id
+
+
+def get_request_role(request):
+    """
+    Get the role name for the user of a request.
+    
+    Taken from the user's current role (loaded with the user by
+    CachedJWTAuthentication, so no extra query), not the JWT's role claim,
+    which may be stale.
+    
+    Returns:
+        str: role name if found, None otherwise
+    """
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return None
+    
+    try:
+        return user.role_name
+    except Exception:
+        return None
+
+
+def resolve_user_school_id(user):
+    """
+    Resolve the school_id for a user directly from the database (uncached).
+    
     Returns:
         str: school_id if found, None otherwise
     """
@@ -4,10 +4,15 @@ Views for main_login app - Authentication and JWT
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import get_principal
+from .tokens import SchoolRefreshToken
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from .models import Role
+from .models import Role, BackgroundJob
+from .utils import get_request_role
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -21,8 +26,8 @@ User = get_user_model()
 
 
 def get_tokens_for_user(user):
-    """Generate JWT tokens for user"""
-    refresh = RefreshToken.for_user(user)
+    """Generate JWT tokens for user (with school_id and role claims)"""
+    refresh = SchoolRefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -85,6 +90,39 @@ def profile(request):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def job_status(request, job_id):
+    """
+    Get the status (and, once finished, the result) of a background job.
+    Visible to the user who started it and to super admins.
+    """
+    job = BackgroundJob.objects.filter(pk=job_id).first()
+    if job is None or (
+        job.created_by_id != request.user.pk and get_request_role(request) != 'super_admin'
+    ):
+        return Response(
+            {'success': False, 'message': 'Job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(
+        {
+            'success': True,
+            'data': {
+                'job_id': job.job_id,
+                'name': job.name,
+                'status': job.status,
+                'result': job.result,
+                'error': job.error,
+                'created_at': job.created_at,
+                'started_at': job.started_at,
+                'finished_at': job.finished_at,
+            },
+        },
+        status=status.HTTP_200_OK
+    )
+
+
 @api_view(['PUT', 'PATCH'])
 @permission_classes([permissions.IsAuthenticated])
 def update_profile(request):
@@ -182,7 +220,7 @@ class RoleListView(generics.ListAPIView):
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def refresh_token(request):
-    """Refresh JWT token"""
+    """Refresh JWT token (school_id and role claims are taken from the user's current state)"""
     try:
         refresh_token = request.data.get('refresh')
         if not refresh_token:
@@ -190,7 +228,11 @@ def refresh_token(request):
                 {'error': 'Refresh token is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        token = RefreshToken(refresh_token)
+        token = SchoolRefreshToken(refresh_token)
+        user = get_principal(token[jwt_settings.USER_ID_CLAIM])
+        if user is None or not user.is_active:
+            raise InvalidToken('User not found or inactive')
+        token.set_user_claims(user)
         return Response({
             'access': str(token.access_token),
         }, status=status.HTTP_200_OK)
@@ -0,0 +1,161 @@
+"""
+Batch approval of new admissions.
+
+approve_admissions() does for many admissions what NewAdmissionViewSet.approve
+does for one, with a fixed number of queries: existing students are matched
+with one set query, schools with another, admission numbers are allocated as
+one block, and the students and admissions are written with bulk_create /
+bulk_update in a single transaction.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from main_login.identifiers import allocate_admission_numbers
+from super_admin.models import School, SchoolStats
+from .models import NewAdmission, Student
+
+
+# Fields copied from the admission onto an existing student
+STUDENT_UPDATE_FIELDS = [
+    'student_name', 'parent_name', 'date_of_birth', 'gender',
+    'applying_class', 'grade', 'address', 'category',
+    'parent_phone', 'emergency_contact', 'medical_information',
+    'blood_group', 'previous_school', 'remarks',
+]
+
+
+def approve_admissions(admission_ids, school_id=None):
+    """
+    Approve admissions and create (or update) their Student records.
+
+    Args:
+        admission_ids: NewAdmission primary keys (student_id)
+        school_id: only approve admissions of this school (others are reported as not found)
+
+    Returns:
+        dict: approved / skipped / failed counts and a per-admission 'results' list
+              ({'student_id', 'status', 'message', 'admission_number', 'student_email'})
+    """
+    admission_ids = list(dict.fromkeys(admission_ids))
+    admissions = NewAdmission.objects.filter(pk__in=admission_ids)
+    if school_id is not None:
+        admissions = admissions.filter(school_id=school_id)
+    admissions = {admission.pk: admission for admission in admissions}
+    results = {}
+
+    def result(admission_id, outcome, message, admission=None, student=None):
+        results[admission_id] = {
+            'student_id': admission_id,
+            'status': outcome,
+            'message': message,
+            'admission_number': admission.admission_number if admission else None,
+            'student_email': student.email if student else None,
+        }
+
+    pending = []
+    for admission_id in admission_ids:
+        admission = admissions.get(admission_id)
+        if admission is None:
+            result(admission_id, 'failed', 'Admission not found')
+        elif admission.status == 'Approved':
+            result(admission_id, 'skipped', 'Admission is already approved', admission)
+        else:
+            pending.append(admission)
+
+    # Existing students, matched by admission number first, then by email (one query)
+    emails = [admission.email for admission in pending if admission.email]
+    admission_numbers = [admission.admission_number for admission in pending if admission.admission_number]
+    by_admission_number = {}
+    by_email = {}
+    for student in Student.objects.filter(Q(email__in=emails) | Q(admission_number__in=admission_numbers)):
+        by_email[student.email] = student
+        if student.admission_number:
+            by_admission_number[student.admission_number] = student
+
+    # Schools of the admissions (one query)
+    schools = School.objects.in_bulk({admission.school_id for admission in pending if admission.school_id})
+
+    # Admission numbers for admissions that do not have one yet (one block)
+    missing_numbers = sum(1 for admission in pending if not admission.admission_number)
+    new_numbers = iter(allocate_admission_numbers(count=missing_numbers) if missing_numbers else [])
+
+    now = timezone.now()
+    approved = []
+    new_students = []
+    updated_students = []
+    used_students = set()
+    for admission in pending:
+        student = by_admission_number.get(admission.admission_number) or by_email.get(admission.email)
+        school = schools.get(admission.school_id)
+        if student is None and school is None:
+            result(admission.pk, 'failed', 'Admission has no valid school', admission)
+            continue
+        if student is not None and student.pk in used_students:
+            result(admission.pk, 'failed', 'Another admission in this batch matches the same student', admission)
+            continue
+
+        if not admission.admission_number:
+            admission.admission_number = next(new_numbers)
+        admission.status = 'Approved'
+        admission.updated_at = now
+        approved.append(admission)
+
+        if student is not None:
+            # Student already exists, update it with the admission data
+            for field in STUDENT_UPDATE_FIELDS:
+                setattr(student, field, getattr(admission, field, None))
+            if admission.student_id:
+                student.student_id = admission.student_id
+            if not student.admission_number:
+                student.admission_number = admission.admission_number
+            student.updated_at = now
+            updated_students.append(student)
+            used_students.add(student.pk)
+            result(admission.pk, 'approved', 'Admission approved and existing student record updated', admission, student)
+        else:
+            student = Student(
+                email=admission.email,
+                school=school,
+                school_name=school.name,
+                student_id=admission.student_id,
+                student_name=admission.student_name,
+                parent_name=admission.parent_name,
+                date_of_birth=admission.date_of_birth,
+                gender=admission.gender,
+                applying_class=admission.applying_class,
+                grade=admission.grade,
+                address=admission.address or "Address not provided",
+                category=admission.category or "General",
+                admission_number=admission.admission_number,
+                parent_phone=admission.parent_phone,
+                emergency_contact=admission.emergency_contact,
+                medical_information=admission.medical_information,
+                blood_group=admission.blood_group,
+                previous_school=admission.previous_school,
+                remarks=admission.remarks,
+            )
+            new_students.append(student)
+            result(admission.pk, 'approved', 'Admission approved and student record created', admission, student)
+
+    with transaction.atomic():
+        NewAdmission.objects.bulk_update(approved, ['status', 'admission_number', 'updated_at'], batch_size=500)
+        Student.objects.bulk_create(new_students, batch_size=500)
+        Student.objects.bulk_update(
+            updated_students,
+            STUDENT_UPDATE_FIELDS + ['student_id', 'admission_number', 'updated_at'],
+            batch_size=500,
+        )
+        # Student post_save signals are bypassed by bulk_create
+        created_per_school = {}
+        for student in new_students:
+            created_per_school[student.school_id] = created_per_school.get(student.school_id, 0) + 1
+        for school_id, count in created_per_school.items():
+            SchoolStats.apply_delta(school_id, students=count)
+
+    ordered = [results[admission_id] for admission_id in admission_ids]
+    return {
+        'approved': sum(1 for item in ordered if item['status'] == 'approved'),
+        'skipped': sum(1 for item in ordered if item['status'] == 'skipped'),
+        'failed': sum(1 for item in ordered if item['status'] == 'failed'),
+        'results': ordered,
+    }
@@ -0,0 +1,117 @@
+"""
+Examination status sweeper.
+
+An exam starts at the date of Exam_Date combined with Exam_Time (in the
+current time zone) and ends Exam_Duration minutes later. sweep_exam_statuses()
+moves exams along upcoming -> ongoing -> completed with two set-based UPDATE
+statements, so only the rows whose window has crossed the current time are
+written:
+
+1. every exam that is not completed and has ended becomes 'completed'
+2. every upcoming exam that has started (and not ended) becomes 'ongoing'
+
+Both statements run across all schools and are bounded by Exam_Date. They
+are served by a partial index on Exam_Date over exams that are not completed
+yet (exam_mgmt_open_date_idx): completed exams, which pile up over the years,
+are not in it, and exams far in the future are cut off by the date range.
+
+On PostgreSQL the start and end times are computed in SQL with interval
+arithmetic; on other databases candidates are read and the same two UPDATEs
+are issued by primary key.
+
+The sweep runs every EXAM_STATUS_SWEEP_INTERVAL seconds through
+main_login.scheduler (see start_exam_status_sweeper), or on demand with
+`python manage.py update_exam_statuses`.
+"""
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import Examination_management
+
+
+# Exam_Date is at most one day plus the largest UTC offset before the exam
+# starts, so exams dated after now + SWEEP_HORIZON cannot have started.
+SWEEP_HORIZON = timedelta(days=2)
+
+
+def sweep_exam_statuses(now=None):
+    """
+    Update exam statuses for the current time.
+
+    Returns:
+        dict: number of exams moved to 'completed' and to 'ongoing'
+    """
+    now = now or timezone.now()
+    if connection.vendor == 'postgresql':
+        return sweep_sql(now)
+    return sweep_python(now)
+
+
+def sweep_sql(now):
+    """PostgreSQL: both transitions computed in the UPDATE statements"""
+    opts = Examination_management._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+
+    def column(name):
+        return quote(opts.get_field(name).column)
+
+    start = (
+        f"((({column('Exam_Date')} AT TIME ZONE 'UTC')::date + {column('Exam_Time')}) "
+        f"AT TIME ZONE %(tz)s)"
+    )
+    end = f"({start} + {column('Exam_Duration')} * INTERVAL '1 minute')"
+    params = {
+        'now': now,
+        'horizon': now + SWEEP_HORIZON,
+        'tz': timezone.get_current_timezone_name(),
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {column('Exam_Status')} = 'completed', {column('Exam_Updated_At')} = %(now)s "
+            f"WHERE {column('Exam_Status')} <> 'completed' "
+            f"AND {column('Exam_Date')} < %(horizon)s AND {end} <= %(now)s",
+            params
+        )
+        completed = cursor.rowcount
+        cursor.execute(
+            f"UPDATE {table} SET {column('Exam_Status')} = 'ongoing', {column('Exam_Updated_At')} = %(now)s "
+            f"WHERE {column('Exam_Status')} = 'upcoming' "
+            f"AND {column('Exam_Date')} < %(horizon)s AND {start} <= %(now)s AND {end} > %(now)s",
+            params
+        )
+        ongoing = cursor.rowcount
+    return {'completed': completed, 'ongoing': ongoing}
+
+
+def sweep_python(now):
+    """Other databases: pick the rows in Python, update them by primary key"""
+    candidates = Examination_management.objects.exclude(Exam_Status='completed').filter(
+        Exam_Date__lt=now + SWEEP_HORIZON
+    ).values_list('id', 'Exam_Status', 'Exam_Date', 'Exam_Time', 'Exam_Duration')
+
+    completed = []
+    ongoing = []
+    for exam_id, exam_status, exam_date, exam_time, duration in candidates:
+        if not exam_date or not exam_time:
+            continue
+        start = timezone.make_aware(datetime.combine(exam_date.date(), exam_time))
+        end = start + timedelta(minutes=duration)
+        if now >= end:
+            completed.append(exam_id)
+        elif exam_status == 'upcoming' and now >= start:
+            ongoing.append(exam_id)
+
+    exams = Examination_management.objects
+    return {
+        'completed': exams.filter(pk__in=completed).update(Exam_Status='completed', Exam_Updated_At=now) if completed else 0,
+        'ongoing': exams.filter(pk__in=ongoing).update(Exam_Status='ongoing', Exam_Updated_At=now) if ongoing else 0,
+    }
+
+
+def start_exam_status_sweeper():
+    """Run sweep_exam_statuses() every EXAM_STATUS_SWEEP_INTERVAL seconds in this process"""
+    from main_login.scheduler import start_periodic
+    return start_periodic('exam-status-sweep', sweep_exam_statuses, settings.EXAM_STATUS_SWEEP_INTERVAL)
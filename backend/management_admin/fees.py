@@ -0,0 +1,346 @@
+"""
+Fee helpers for management_admin.
+
+Per-student fee totals (total / paid / due / count) are attached to Student
+querysets with annotate_fee_rollups() so that serializing a page of students
+does not aggregate the fees table once per student. The totals come from the
+fees table in the same grouped query, or from StudentFeeBalance when
+STUDENT_FEE_BALANCE_ENABLED is on.
+
+Term fees for a whole class or grade are generated from a fee template with
+generate_fees(): the schedule is expanded in memory and inserted with one
+bulk_create, at most once per (student, fee_type, period).
+
+Fees past their due date are moved to 'overdue' by sweep_overdue_fees(),
+which also adds each fee's late_fee to its total once. It runs every
+FEE_OVERDUE_SWEEP_INTERVAL seconds (see start_fee_overdue_sweeper) or with
+`python manage.py sweep_overdue_fees`.
+"""
+import calendar
+from decimal import Decimal
+from django.conf import settings
+from django.db import DataError, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+# Annotations added by annotate_fee_rollups()
+FEE_ROLLUP_FIELDS = ['fee_rollup_total', 'fee_rollup_paid', 'fee_rollup_due', 'fee_rollup_count']
+
+# Fees locked and updated per statement by sweep_overdue_fees()
+OVERDUE_SWEEP_BATCH_SIZE = 500
+
+
+def annotate_fee_rollups(queryset):
+    """
+    Annotate a Student queryset with its fee totals
+    (fee_rollup_total, fee_rollup_paid, fee_rollup_due, fee_rollup_count).
+    """
+    if settings.STUDENT_FEE_BALANCE_ENABLED:
+        # Single LEFT JOIN on the denormalized balance table
+        amount = DecimalField(max_digits=12, decimal_places=2)
+        return queryset.annotate(
+            fee_rollup_total=Coalesce(F('fee_balance__total_fee_amount'), Value(Decimal('0')), output_field=amount),
+            fee_rollup_paid=Coalesce(F('fee_balance__paid_fee_amount'), Value(Decimal('0')), output_field=amount),
+            fee_rollup_due=Coalesce(F('fee_balance__due_fee_amount'), Value(Decimal('0')), output_field=amount),
+            fee_rollup_count=Coalesce(F('fee_balance__fees_count'), Value(0), output_field=IntegerField()),
+        )
+    # One grouped query over the student's fees
+    return queryset.annotate(
+        fee_rollup_total=Sum('management_fees__total_amount'),
+        fee_rollup_paid=Sum('management_fees__paid_amount'),
+        fee_rollup_due=Sum('management_fees__due_amount'),
+        fee_rollup_count=Count('management_fees'),
+    )
+
+
+def get_fee_rollups(student):
+    """
+    Get the fee totals of a student.
+
+    Uses the annotations from annotate_fee_rollups() when present; otherwise
+    aggregates the student's fees in one query and caches the result on the instance.
+
+    Returns:
+        dict: total_fee_amount, paid_fee_amount, due_fee_amount, fees_count
+    """
+    if not hasattr(student, 'fee_rollup_count'):
+        try:
+            totals = student.management_fees.aggregate(
+                fee_rollup_total=Sum('total_amount'),
+                fee_rollup_paid=Sum('paid_amount'),
+                fee_rollup_due=Sum('due_amount'),
+                fee_rollup_count=Count('id'),
+            )
+        except (DataError, ValueError, TypeError):
+            # Handle case where database column type doesn't match (e.g., UUID vs email)
+            totals = {name: None for name in FEE_ROLLUP_FIELDS}
+        for name, value in totals.items():
+            setattr(student, name, value)
+    return {
+        'total_fee_amount': float(student.fee_rollup_total or 0),
+        'paid_fee_amount': float(student.fee_rollup_paid or 0),
+        'due_fee_amount': float(student.fee_rollup_due or 0),
+        'fees_count': student.fee_rollup_count or 0,
+    }
+
+
+# -------------------------
+# TERM FEE GENERATION
+# -------------------------
+
+# Months between installments and installments in a year, per fee frequency
+FREQUENCY_MONTHS = {
+    'monthly': 1,
+    'quarterly': 3,
+    'half-yearly': 6,
+    'yearly': 12,
+    'one-time': 12,
+}
+FREQUENCY_INSTALLMENTS = {
+    'monthly': 12,
+    'quarterly': 4,
+    'half-yearly': 2,
+    'yearly': 1,
+    'one-time': 1,
+}
+# Period of generated one-time fees (unless the template names one)
+ONE_TIME_PERIOD = 'one-time'
+
+
+def add_months(day, months):
+    """Same day `months` later (clamped to the end of shorter months)"""
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def fee_period(frequency, due_date):
+    """
+    Billing period label of a fee due on due_date
+    (2025-04 monthly, 2025-Q2 quarterly, 2025-H1 half-yearly, 2025 yearly).
+    One-time fees are labelled ONE_TIME_PERIOD whatever their due date, so
+    generating them again with another date does not bill the student twice.
+    """
+    if frequency == 'monthly':
+        return f'{due_date.year}-{due_date.month:02d}'
+    if frequency == 'quarterly':
+        return f'{due_date.year}-Q{(due_date.month - 1) // 3 + 1}'
+    if frequency == 'half-yearly':
+        return f'{due_date.year}-H{1 if due_date.month <= 6 else 2}'
+    if frequency == 'yearly':
+        return str(due_date.year)
+    return ONE_TIME_PERIOD
+
+
+def fee_schedule(frequency, first_due_date, installments=None, period=None):
+    """
+    Expand a frequency into its installments.
+    `period` names a one-time fee (e.g. "trip-2025") so that several one-time
+    fees of the same type can be billed; it is ignored for other frequencies.
+
+    Returns:
+        list: (period, due_date) pairs, the first due on first_due_date
+    """
+    if frequency == 'one-time':
+        return [(period or ONE_TIME_PERIOD, first_due_date)]
+    elif installments is None:
+        installments = FREQUENCY_INSTALLMENTS[frequency]
+    due_dates = [add_months(first_due_date, FREQUENCY_MONTHS[frequency] * i) for i in range(installments)]
+    return [(fee_period(frequency, due_date), due_date) for due_date in due_dates]
+
+
+def generate_fees(students, template):
+    """
+    Create the fees described by a template for every student in a queryset.
+
+    Students are read once (joined with their school) and the fees of every
+    installment are built in memory and inserted with one bulk_create.
+    Fees that already exist for a (student, fee_type, period) are skipped, so
+    running the same template again creates nothing.
+
+    Args:
+        students: Student queryset
+        template: dict with fee_type, total_amount, frequency, first_due_date and
+                  optionally installments, period (one-time fees), late_fee, description, grade
+
+    Returns:
+        dict: students, periods, created, skipped
+    """
+    from .models import Fee, StudentFeeBalance
+
+    schedule = fee_schedule(
+        template['frequency'], template['first_due_date'], template.get('installments'), template.get('period')
+    )
+    periods = [period for period, _ in schedule]
+    rows = list(students.order_by().values(
+        'email', 'student_id', 'student_name', 'applying_class', 'grade', 'school_id', 'school__name'
+    ))
+    existing = set(
+        Fee.objects.filter(
+            student_id__in=[row['email'] for row in rows],
+            fee_type=template['fee_type'],
+            period__in=periods,
+        ).values_list('student_id', 'period')
+    )
+
+    total_amount = template['total_amount']
+    # Same rule as Fee.save(); the overdue sweep still charges the late fee once
+    today = timezone.localdate()
+    fees = [
+        Fee(
+            student_id=row['email'],
+            student_id_string=row['student_id'] or '',
+            student_name=row['student_name'] or '',
+            applying_class=row['applying_class'] or '',
+            grade=row['grade'] or template.get('grade') or '',
+            school_id=row['school_id'],
+            school_name=row['school__name'],
+            fee_type=template['fee_type'],
+            total_amount=total_amount,
+            frequency=template['frequency'],
+            due_date=due_date,
+            period=period,
+            late_fee=template.get('late_fee') or Decimal('0'),
+            description=template.get('description', ''),
+            status='overdue' if due_date < today else 'pending',
+            paid_amount=Decimal('0'),
+            due_amount=total_amount,
+        )
+        for row in rows
+        for period, due_date in schedule
+        if (row['email'], period) not in existing
+    ]
+
+    with transaction.atomic():
+        # ignore_conflicts covers a concurrent run creating the same fees
+        Fee.objects.bulk_create(fees, batch_size=1000, ignore_conflicts=True)
+        if fees and settings.STUDENT_FEE_BALANCE_ENABLED:
+            StudentFeeBalance.rebuild(student_ids={fee.student_id for fee in fees})
+
+    return {
+        'students': len(rows),
+        'periods': periods,
+        'created': len(fees),
+        'skipped': len(rows) * len(schedule) - len(fees),
+    }
+
+
+# -------------------------
+# OVERDUE SWEEP
+# -------------------------
+
+def locked_batches(queryset, fields, batch_size):
+    """
+    Yield the rows of a queryset as lists of dicts, batch_size at a time.
+
+    Each batch is locked (skipping rows locked by someone else, e.g. a payment
+    in progress) and the caller's work on it runs in the same transaction, so
+    locks are held for one batch only. The caller must change every row it is
+    given so that it no longer matches the queryset.
+    """
+    while True:
+        with transaction.atomic():
+            batch = list(
+                queryset.select_for_update(skip_locked=True).order_by('pk').values('pk', *fields)[:batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+
+
+def sweep_overdue_fees(today=None, batch_size=OVERDUE_SWEEP_BATCH_SIZE):
+    """
+    Mark unpaid fees past their due date as overdue and charge their late fee.
+
+    management_admin fees: status becomes 'overdue', and the late_fee is added
+    to total_amount and due_amount the first time (late_fee_applied_date).
+    student_parent fees: pending fees past their due date become 'overdue'.
+
+    Fees are updated school by school in batches of batch_size, one UPDATE
+    per batch.
+
+    Returns:
+        dict: overdue, late_fees_charged, late_fee_amount, student_fees_overdue
+              and the per-school counts
+    """
+    from .models import Fee, StudentFeeBalance
+    from student_parent.models import Fee as StudentFee
+
+    today = today or timezone.localdate()
+    due = Fee.objects.filter(
+        Q(status='pending') | Q(late_fee_applied_date__isnull=True),
+        due_date__lt=today,
+        paid_amount__lt=F('total_amount'),
+    ).exclude(status='paid')
+    late_fee = Case(
+        When(late_fee_applied_date__isnull=True, then=F('late_fee')),
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+    result = {
+        'overdue': 0,
+        'late_fees_charged': 0,
+        'late_fee_amount': Decimal('0'),
+        'student_fees_overdue': 0,
+        'schools': {},
+    }
+
+    def count(school_id, key, n):
+        result[key] += n
+        school = result['schools'].setdefault(school_id or '', {})
+        school[key] = school.get(key, 0) + n
+
+    school_ids = list(due.order_by().values_list('school_id', flat=True).distinct())
+    for school_id in school_ids:
+        fees = due.filter(school_id=school_id) if school_id is not None else due.filter(school_id__isnull=True)
+        for batch in locked_batches(fees, ['student_id', 'late_fee', 'late_fee_applied_date'], batch_size):
+            Fee.objects.filter(pk__in=[row['pk'] for row in batch]).update(
+                status='overdue',
+                total_amount=F('total_amount') + late_fee,
+                due_amount=F('due_amount') + late_fee,
+                late_fee_applied_date=Coalesce(F('late_fee_applied_date'), Value(today)),
+                updated_at=timezone.now(),
+            )
+            charged = [row for row in batch if row['late_fee_applied_date'] is None and row['late_fee']]
+            count(school_id, 'overdue', len(batch))
+            count(school_id, 'late_fees_charged', len(charged))
+            result['late_fee_amount'] += sum((row['late_fee'] for row in charged), Decimal('0'))
+
+            # Fee.save() is bypassed; keep the denormalized balances in step
+            if charged and settings.STUDENT_FEE_BALANCE_ENABLED:
+                per_student = {}
+                for row in charged:
+                    per_student[row['student_id']] = per_student.get(row['student_id'], Decimal('0')) + row['late_fee']
+                for student_id, amount in per_student.items():
+                    StudentFeeBalance.apply_delta(student_id, total=amount, due=amount)
+
+    student_due = StudentFee.objects.filter(status='pending', due_date__lt=today)
+    school_ids = list(student_due.order_by().values_list('school_id', flat=True).distinct())
+    for school_id in school_ids:
+        fees = student_due.filter(school_id=school_id) if school_id is not None else student_due.filter(school_id__isnull=True)
+        for batch in locked_batches(fees, [], batch_size):
+            StudentFee.objects.filter(pk__in=[row['pk'] for row in batch]).update(
+                status='overdue', updated_at=timezone.now()
+            )
+            count(school_id, 'student_fees_overdue', len(batch))
+
+    return result
+
+
+def run_fee_overdue_sweep():
+    """Sweep overdue fees and record the outcome as a BackgroundJob"""
+    from main_login.jobs import record_job
+    started_at = timezone.now()
+    result = sweep_overdue_fees()
+    record_job('fee-overdue-sweep', result, started_at)
+    return result
+
+
+def start_fee_overdue_sweeper():
+    """Run the overdue fee sweep every FEE_OVERDUE_SWEEP_INTERVAL seconds in this process"""
+    from main_login.scheduler import start_periodic
+    return start_periodic('fee-overdue-sweep', run_fee_overdue_sweep, settings.FEE_OVERDUE_SWEEP_INTERVAL)
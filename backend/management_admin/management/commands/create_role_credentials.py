@@ -5,10 +5,11 @@ Creates at least 10 users across all roles with proper links to respective table
 Usage: python manage.py create_role_credentials
 """
 import random
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from main_login.models import Role
+from main_login.identifiers import next_employee_no, next_admission_number
 from super_admin.models import School
 from management_admin.models import Teacher, Student, Department
 
@@ -287,14 +288,9 @@ class Command(BaseCommand):
                 
                 # Create new teacher if doesn't exist
                 if not teacher:
-                    # Generate unique employee_no if not provided or if it exists
-                    final_employee_no = employee_no
-                    if not final_employee_no:
-                        final_employee_no = f'EMP{random.randint(1000, 9999)}'
-                    
-                    # Ensure uniqueness
-                    while Teacher.objects.filter(employee_no=final_employee_no).exists():
-                        final_employee_no = f'EMP{random.randint(1000, 9999)}'
+                    # Generate unique employee_no if not provided
+                    # (a provided one that exists was matched above)
+                    final_employee_no = employee_no or next_employee_no()
                     
                     teacher = Teacher.objects.create(
                         user=user,
@@ -349,14 +345,9 @@ class Command(BaseCommand):
                 
                 # Create new student if doesn't exist
                 if not student:
-                    # Generate unique admission_number if not provided or if it exists
-                    final_admission_number = admission_number
-                    if not final_admission_number:
-                        final_admission_number = f'ADM-{datetime.now().year}-{random.randint(100, 999)}'
-                    
-                    # Ensure uniqueness
-                    while Student.objects.filter(admission_number=final_admission_number).exists():
-                        final_admission_number = f'ADM-{datetime.now().year}-{random.randint(100, 999)}'
+                    # Generate unique admission_number if not provided
+                    # (a provided one that exists was matched above)
+                    final_admission_number = admission_number or next_admission_number()
                     
                     student = Student.objects.create(
                         user=user,
@@ -0,0 +1,66 @@
+"""
+Management command to bulk import students from a CSV file.
+Uses the same chunked COPY/merge loader as the students import endpoint
+(see management_admin.student_import).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from super_admin.models import School
+from management_admin.student_import import StudentImport, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Bulk import students from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row (email plus Student fields)')
+        parser.add_argument(
+            '--school',
+            help='School ID for rows without a "school" column'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows loaded per statement (default: {DEFAULT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        school = None
+        if options['school']:
+            school = School.objects.filter(school_id=options['school']).first()
+            if school is None:
+                raise CommandError(f'School "{options["school"]}" not found.')
+
+        try:
+            csv_file = open(options['path'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open {options["path"]}: {e}')
+
+        with csv_file:
+            student_import = StudentImport(
+                csv_file,
+                school=school,
+                allow_school_column=True,
+                chunk_size=options['chunk_size'],
+            )
+            try:
+                for progress in student_import.run():
+                    self.stdout.write(
+                        f"Processed {progress['processed']} row(s): {progress['created']} created, "
+                        f"{progress['updated']} updated, {progress['failed']} rejected"
+                    )
+            except ValidationError as e:
+                raise CommandError(e.detail)
+
+        summary = student_import.summary()
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']} ({error['email']}): {error['errors']}"))
+        if summary['errors_truncated']:
+            self.stdout.write(self.style.WARNING(f"... {summary['failed'] - len(summary['errors'])} more rejected row(s)"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {summary['created'] + summary['updated']} student(s) "
+                f"({summary['created']} created, {summary['updated']} updated), {summary['failed']} row(s) rejected."
+            )
+        )
@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the denormalized per-student fee balances
+(StudentFeeBalance) from the fees table.
+Run it after enabling STUDENT_FEE_BALANCE_ENABLED, or to repair drift.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from management_admin.models import StudentFeeBalance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-student fee balances from the fees table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student',
+            action='append',
+            dest='students',
+            help='Student email to rebuild (can be repeated; default: all students)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.STUDENT_FEE_BALANCE_ENABLED:
+            self.stdout.write(
+                self.style.WARNING(
+                    'STUDENT_FEE_BALANCE_ENABLED is off; balances will not be kept up to date after this rebuild.'
+                )
+            )
+        
+        count = StudentFeeBalance.rebuild(student_ids=options['students'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt fee balances for {count} student(s).'))
@@ -0,0 +1,57 @@
+"""
+Management command to reconcile fee payments from a CSV file.
+Uses the same batched matcher as the fees reconcile endpoint
+(see management_admin.payments).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from super_admin.models import School
+from management_admin.payments import PaymentReconciliation, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Reconcile fee payments from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with receipt_number, fee_id or student, amount and date columns')
+        parser.add_argument('--school', required=True, help='School ID the payments belong to')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows matched and applied per batch (default: {DEFAULT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if not School.objects.filter(school_id=options['school']).exists():
+            raise CommandError(f'School "{options["school"]}" not found.')
+
+        try:
+            csv_file = open(options['path'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open {options["path"]}: {e}')
+
+        with csv_file:
+            reconciliation = PaymentReconciliation(csv_file, options['school'], batch_size=options['batch_size'])
+            try:
+                for progress in reconciliation.run():
+                    self.stdout.write(
+                        f"Processed {progress['processed']} row(s): {progress['matched']} recorded, "
+                        f"{progress['duplicates']} already recorded, {progress['unmatched']} unmatched"
+                    )
+            except ValidationError as e:
+                raise CommandError(e.detail)
+
+        summary = reconciliation.summary()
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(
+                f"Row {error['row']} ({error['receipt_number']}, {error['reference']}): {error['errors']}"
+            ))
+        if summary['errors_truncated']:
+            self.stdout.write(self.style.WARNING(f"... {summary['unmatched'] - len(summary['errors'])} more unmatched row(s)"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recorded {summary['matched']} payment(s) totalling {summary['amount']}, "
+                f"{summary['duplicates']} already recorded, {summary['unmatched']} row(s) unmatched."
+            )
+        )
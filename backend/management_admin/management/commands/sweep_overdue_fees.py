@@ -0,0 +1,42 @@
+"""
+Management command to mark unpaid fees past their due date as overdue and
+charge their late fees. Web processes already run the sweep every
+FEE_OVERDUE_SWEEP_INTERVAL seconds (see management_admin.fees).
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from management_admin.fees import sweep_overdue_fees, OVERDUE_SWEEP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Mark past-due unpaid fees as overdue and apply late fees'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Treat fees due before this date (YYYY-MM-DD) as past due (default: today)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OVERDUE_SWEEP_BATCH_SIZE,
+            help=f'Fees locked and updated per statement (default: {OVERDUE_SWEEP_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f'Invalid date "{options["date"]}", expected YYYY-MM-DD.')
+
+        result = sweep_overdue_fees(today=today, batch_size=options['batch_size'])
+        for school_id, counts in sorted(result['schools'].items()):
+            self.stdout.write(f"School {school_id or '(none)'}: {counts}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Marked {result['overdue']} fee(s) overdue, charged {result['late_fees_charged']} late fee(s) "
+                f"totalling {result['late_fee_amount']}; {result['student_fees_overdue']} student fee(s) overdue."
+            )
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_admin', '0041_busstop_school_name_busstopstudent_school_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeeBalance',
+            fields=[
+                ('student', models.OneToOneField(help_text='Student these totals belong to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fee_balance', serialize=False, to='management_admin.student')),
+                ('total_fee_amount', models.DecimalField(decimal_places=2, default=0.0, help_text="Sum of total_amount over the student's fees", max_digits=12)),
+                ('paid_fee_amount', models.DecimalField(decimal_places=2, default=0.0, help_text="Sum of paid_amount over the student's fees", max_digits=12)),
+                ('due_fee_amount', models.DecimalField(decimal_places=2, default=0.0, help_text="Sum of due_amount over the student's fees", max_digits=12)),
+                ('fees_count', models.IntegerField(default=0, help_text='Number of fees for the student')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Student Fee Balance',
+                'verbose_name_plural': 'Student Fee Balances',
+                'db_table': 'student_fee_balances',
+            },
+        ),
+    ]
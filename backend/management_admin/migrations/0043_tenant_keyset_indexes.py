@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_admin', '0042_student_fee_balance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bus',
+            index=models.Index(fields=['school', 'created_at', 'bus_number'], name='buses_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='department',
+            index=models.Index(fields=['school', 'created_at', 'id'], name='departments_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examination_management',
+            index=models.Index(fields=['school_id', 'Exam_Created_At', 'id'], name='exam_mgmt_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fee',
+            index=models.Index(fields=['school_id', 'due_date', 'id'], name='mgmt_fees_school_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['school_id', 'created_at', 'file_id'], name='files_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newadmission',
+            index=models.Index(fields=['school_id', 'created_at', 'student_id'], name='new_adm_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'created_at', 'email'], name='students_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['school_id', 'created_at', 'teacher_id'], name='teachers_school_created_idx'),
+        ),
+    ]
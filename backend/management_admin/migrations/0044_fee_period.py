@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_admin', '0043_tenant_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fee',
+            name='period',
+            field=models.CharField(blank=True, default='', help_text='Billing period of a generated fee (e.g. 2025-04, 2025-Q2, 2025-H1, 2025, one-time); empty for fees added by hand', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='fee',
+            constraint=models.UniqueConstraint(condition=models.Q(('period', ''), _negated=True), fields=('student', 'fee_type', 'period'), name='mgmt_fees_student_period_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_admin', '0044_fee_period'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='examination_management',
+            index=models.Index(condition=models.Q(('Exam_Status', 'completed'), _negated=True), fields=['Exam_Date'], name='exam_mgmt_open_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_admin', '0045_exam_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fee',
+            name='late_fee_applied_date',
+            field=models.DateField(blank=True, help_text='Date the late fee was added to total_amount (set by the overdue fee sweep, at most once per fee)', null=True),
+        ),
+    ]
@@ -75,6 +75,9 @@ class File(models.Model):
     
     class Meta:
         db_table = 'files'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'file_id'], name='files_school_created_idx'),
+        ]
         verbose_name = 'File'
         verbose_name_plural = 'Files'
 
@@ -99,6 +102,9 @@ class Department(models.Model):
     
     class Meta:
         db_table = 'departments'
+        indexes = [
+            models.Index(fields=['school', 'created_at', 'id'], name='departments_school_created_idx'),
+        ]
         verbose_name = 'Department'
         verbose_name_plural = 'Departments'
         unique_together = ['school', 'name']
@@ -194,6 +200,9 @@ class Teacher(models.Model):
     
     class Meta:
         db_table = 'teachers'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'teacher_id'], name='teachers_school_created_idx'),
+        ]
         verbose_name = 'Teacher'
         verbose_name_plural = 'Teachers'
 
@@ -313,6 +322,9 @@ class Student(models.Model):
 
     class Meta:
         db_table = 'students'
+        indexes = [
+            models.Index(fields=['school', 'created_at', 'email'], name='students_school_created_idx'),
+        ]
         verbose_name = 'Student'
         verbose_name_plural = 'Students'
 
@@ -436,7 +448,6 @@ class NewAdmission(models.Model):
         Returns the created or updated Student instance.
         """
         from django.db import IntegrityError
-        import datetime
         
         # Check if student already exists with this admission number or email
         existing_student = None
@@ -470,12 +481,8 @@ class NewAdmission(models.Model):
         # Generate admission number if not provided
         admission_number = self.admission_number
         if not admission_number:
-            timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            admission_number = f'ADM-{datetime.datetime.now().year}-{timestamp[-6:]}'
-            # Ensure uniqueness
-            while Student.objects.filter(admission_number=admission_number).exists():
-                timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
-                admission_number = f'ADM-{datetime.datetime.now().year}-{timestamp[-6:]}'
+            from main_login.identifiers import next_admission_number
+            admission_number = next_admission_number()
             # Update the admission record with generated number
             self.admission_number = admission_number
             self.save(update_fields=['admission_number'])
@@ -546,6 +553,9 @@ class NewAdmission(models.Model):
     
     class Meta:
         db_table = 'new_admissions'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'student_id'], name='new_adm_school_created_idx'),
+        ]
         verbose_name = 'New Admission'
         verbose_name_plural = 'New Admissions'
         ordering = ['-created_at']
@@ -587,6 +597,13 @@ class Examination_management(models.Model):
     
     class Meta:
         db_table = 'examination_management'
+        indexes = [
+            models.Index(fields=['school_id', 'Exam_Created_At', 'id'], name='exam_mgmt_school_created_idx'),
+            # Exams the status sweep may still move (see management_admin.exam_status)
+            models.Index(
+                fields=['Exam_Date'], condition=~models.Q(Exam_Status='completed'), name='exam_mgmt_open_date_idx'
+            ),
+        ]
         verbose_name = 'Examination Management'
         verbose_name_plural = 'Examination Management'
         ordering = ['-Exam_Created_At']
@@ -651,6 +668,17 @@ class Fee(models.Model):
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text='Total amount paid so far (sum of all payments)')
     due_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text='Amount due (remaining to be paid)')
     last_paid_date = models.DateField(null=True, blank=True, help_text='Date of last payment')
+    period = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        help_text='Billing period of a generated fee (e.g. 2025-04, 2025-Q2, 2025-H1, 2025, one-time); empty for fees added by hand'
+    )
+    late_fee_applied_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text='Date the late fee was added to total_amount (set by the overdue fee sweep, at most once per fee)'
+    )
     
     def save(self, *args, **kwargs):
         """Auto-calculate fields when saving"""
@@ -678,15 +706,69 @@ class Fee(models.Model):
         from decimal import Decimal
         self.due_amount = Decimal(str(self.total_amount)) - Decimal(str(self.paid_amount))
         
-        # Update status based on payment
+        # Update status based on payment and due date
+        # (late fees are charged by the overdue sweep, see fees.sweep_overdue_fees)
+        from django.utils import timezone
         if self.paid_amount >= self.total_amount:
             self.status = 'paid'
-        elif self.paid_amount > 0:
-            self.status = 'pending'
+        elif self.due_date and self.due_date < timezone.localdate():
+            self.status = 'overdue'
         else:
             self.status = 'pending'
         
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        
+        # Keep the denormalized per-student balance in step (if enabled)
+        from django.conf import settings
+        if settings.STUDENT_FEE_BALANCE_ENABLED:
+            self._sync_fee_balance(adding)
+    
+    def delete(self, *args, **kwargs):
+        """Remove this fee from the student's denormalized balance (if enabled)"""
+        from django.conf import settings
+        amounts = getattr(self, '_balance_amounts', None) or self._get_balance_amounts()
+        result = super().delete(*args, **kwargs)
+        if settings.STUDENT_FEE_BALANCE_ENABLED:
+            student_id, total, paid, due = amounts
+            StudentFeeBalance.apply_delta(student_id, total=-total, paid=-paid, due=-due, count=-1)
+        return result
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the amounts as loaded so saves can update balances incrementally"""
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields():
+            instance._balance_amounts = instance._get_balance_amounts()
+        return instance
+    
+    def _get_balance_amounts(self):
+        """(student_id, total_amount, paid_amount, due_amount) as counted in StudentFeeBalance"""
+        from decimal import Decimal
+        return (
+            self.student_id,
+            Decimal(str(self.total_amount)),
+            Decimal(str(self.paid_amount)),
+            Decimal(str(self.due_amount)),
+        )
+    
+    def _sync_fee_balance(self, adding):
+        """Apply the change made by this save to StudentFeeBalance"""
+        old = getattr(self, '_balance_amounts', None)
+        new = self._get_balance_amounts()
+        if old is None and not adding:
+            # Saved without knowing the previous amounts - recompute this student's row
+            StudentFeeBalance.rebuild(student_ids=[self.student_id])
+        elif old is None or old[0] != new[0]:
+            if old is not None:
+                # Fee moved to another student
+                StudentFeeBalance.apply_delta(old[0], total=-old[1], paid=-old[2], due=-old[3], count=-1)
+            StudentFeeBalance.apply_delta(new[0], total=new[1], paid=new[2], due=new[3], count=1)
+        elif old != new:
+            StudentFeeBalance.apply_delta(
+                new[0], total=new[1] - old[1], paid=new[2] - old[2], due=new[3] - old[3]
+            )
+        self._balance_amounts = new
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -696,6 +778,17 @@ class Fee(models.Model):
     
     class Meta:
         db_table = 'management_fees'
+        indexes = [
+            models.Index(fields=['school_id', 'due_date', 'id'], name='mgmt_fees_school_due_idx'),
+        ]
+        constraints = [
+            # Generated fees are created at most once per student, fee type and period
+            models.UniqueConstraint(
+                fields=['student', 'fee_type', 'period'],
+                condition=~models.Q(period=''),
+                name='mgmt_fees_student_period_uniq',
+            ),
+        ]
         verbose_name = 'Fee'
         verbose_name_plural = 'Fees'
         ordering = ['-due_date', '-created_at']
@@ -728,6 +821,97 @@ class PaymentHistory(models.Model):
         ordering = ['-payment_date', '-created_at']
 
 
+class StudentFeeBalance(models.Model):
+    """
+    Denormalized fee totals per student (optional, see STUDENT_FEE_BALANCE_ENABLED).
+    Updated incrementally when a Fee is saved or deleted (including payments
+    recorded through FeeViewSet.record_payment). Rebuild with
+    `python manage.py rebuild_fee_balances`.
+    """
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fee_balance',
+        help_text='Student these totals belong to'
+    )
+    total_fee_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='Sum of total_amount over the student\'s fees')
+    paid_fee_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='Sum of paid_amount over the student\'s fees')
+    due_fee_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='Sum of due_amount over the student\'s fees')
+    fees_count = models.IntegerField(default=0, help_text='Number of fees for the student')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.student_id} - due {self.due_fee_amount}"
+    
+    @classmethod
+    def apply_delta(cls, student_id, total=0, paid=0, due=0, count=0):
+        """
+        Add fee changes to a student's balance in a single UPDATE.
+        If the student has no balance row yet it is built from the fees table.
+        """
+        from django.db.models import F
+        from django.utils import timezone
+        updated = cls.objects.filter(student_id=student_id).update(
+            total_fee_amount=F('total_fee_amount') + total,
+            paid_fee_amount=F('paid_fee_amount') + paid,
+            due_fee_amount=F('due_fee_amount') + due,
+            fees_count=F('fees_count') + count,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            cls.rebuild(student_ids=[student_id])
+    
+    @classmethod
+    def rebuild(cls, student_ids=None):
+        """
+        Recompute balances from the fees table.
+        
+        Args:
+            student_ids: students to rebuild (all students if None)
+        
+        Returns:
+            int: number of balance rows written
+        """
+        from django.db import transaction
+        from django.db.models import Sum, Count
+        
+        students = Student.objects.order_by()
+        if student_ids is not None:
+            students = students.filter(pk__in=student_ids)
+        totals = {
+            row['student_id']: row
+            for row in Fee.objects.filter(student__in=students).order_by().values('student_id').annotate(
+                total=Sum('total_amount'),
+                paid=Sum('paid_amount'),
+                due=Sum('due_amount'),
+                count=Count('id'),
+            )
+        }
+        balances = []
+        for student_id in students.values_list('pk', flat=True).iterator():
+            row = totals.get(student_id, {})
+            balances.append(cls(
+                student_id=student_id,
+                total_fee_amount=row.get('total') or 0,
+                paid_fee_amount=row.get('paid') or 0,
+                due_fee_amount=row.get('due') or 0,
+                fees_count=row.get('count') or 0,
+            ))
+        with transaction.atomic():
+            stale = cls.objects.all()
+            if student_ids is not None:
+                stale = stale.filter(student_id__in=student_ids)
+            stale.delete()
+            cls.objects.bulk_create(balances, batch_size=1000)
+        return len(balances)
+    
+    class Meta:
+        db_table = 'student_fee_balances'
+        verbose_name = 'Student Fee Balance'
+        verbose_name_plural = 'Student Fee Balances'
+
+
 class Bus(models.Model):
     """Bus model"""
     BUS_TYPE_CHOICES = [
@@ -769,6 +953,9 @@ class Bus(models.Model):
     
     class Meta:
         db_table = 'buses'
+        indexes = [
+            models.Index(fields=['school', 'created_at', 'bus_number'], name='buses_school_created_idx'),
+        ]
         verbose_name = 'Bus'
         verbose_name_plural = 'Buses'
 
@@ -0,0 +1,324 @@
+"""
+Bulk payment reconciliation from a bank / cash-register CSV.
+
+Each row is a payment: receipt_number, a fee reference (fee_id) or a student
+reference (email, student ID or admission number, optionally with fee_type),
+amount and date. Rows are processed in batches:
+
+- all fees referenced by a batch are found with one joined query; a student
+  reference pays the student's unpaid fees (of fee_type, if given) oldest
+  first, split over several fees when it covers more than one
+- a payment larger than what is still due (counting earlier rows of the
+  batch) is rejected, so due_amount never goes negative; the fees of a batch
+  are locked from the moment they are read until the batch is applied
+- receipts already recorded are skipped, so re-importing a file is safe
+- PaymentHistory rows are inserted with one bulk_create
+- paid_amount, due_amount, status and last_paid_date of the matched fees are
+  updated with one UPDATE per batch (with Fee.save()'s status rules)
+
+Unmatched and invalid rows are reported back with their CSV line numbers.
+"""
+import csv
+import io
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateField, DecimalField, F, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+from rest_framework import serializers
+from super_admin.models import SchoolStats
+from .models import Fee, PaymentHistory, StudentFeeBalance
+
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class PaymentRowSerializer(serializers.Serializer):
+    """One CSV row of a payment reconciliation file"""
+    receipt_number = serializers.CharField(max_length=100)
+    fee_id = serializers.IntegerField(required=False, min_value=1)
+    student = serializers.CharField(required=False, help_text='Student email, student ID or admission number')
+    fee_type = serializers.ChoiceField(choices=Fee.FEE_TYPE_CHOICES, required=False)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    date = serializers.DateField()
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        """A fee_id or a student reference is required"""
+        if not attrs.get('fee_id') and not attrs.get('student'):
+            raise serializers.ValidationError('fee_id or student is required.')
+        return attrs
+
+
+class PaymentReconciliation:
+    """
+    One reconciliation run over a CSV file, limited to one school.
+
+    Usage:
+        reconciliation = PaymentReconciliation(csv_file, school_id)
+        for progress in reconciliation.run():
+            ...
+        reconciliation.summary()
+    """
+
+    def __init__(self, file, school_id, batch_size=DEFAULT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+        if isinstance(file, io.TextIOBase):
+            self.file = file
+        else:
+            self.file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        self.school_id = school_id
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+        self.processed = 0
+        self.matched = 0
+        self.duplicates = 0
+        self.unmatched = 0
+        self.amount = Decimal('0')
+        self.errors = []
+
+        self._seen_receipts = set()
+
+    def run(self):
+        """
+        Reconcile the whole file, one batch at a time.
+        Yields the progress (see progress()) after every batch.
+        """
+        reader = csv.DictReader(self.file)
+        header = [name.strip() for name in (reader.fieldnames or [])]
+        missing = {'receipt_number', 'amount', 'date'} - set(header)
+        if missing or not {'fee_id', 'student'} & set(header):
+            raise serializers.ValidationError({
+                'file': 'The CSV file must have receipt_number, amount, date and fee_id or student columns.'
+            })
+        reader.fieldnames = header
+
+        batch = []
+        # Line 1 is the header
+        for line, row in enumerate(reader, start=2):
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.reconcile_batch(batch)
+                batch = []
+                yield self.progress()
+        if batch:
+            self.reconcile_batch(batch)
+            yield self.progress()
+
+    def progress(self):
+        """Counters so far"""
+        return {
+            'processed': self.processed,
+            'matched': self.matched,
+            'duplicates': self.duplicates,
+            'unmatched': self.unmatched,
+            'amount': self.amount,
+        }
+
+    def summary(self):
+        """Counters and the (first max_errors) unmatched rows"""
+        return {
+            **self.progress(),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'errors_truncated': self.unmatched > len(self.errors),
+        }
+
+    def add_error(self, line, raw, errors):
+        """Record a row that could not be reconciled"""
+        self.unmatched += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({
+                'row': line,
+                'receipt_number': (raw.get('receipt_number') or '').strip() or None,
+                'reference': (raw.get('fee_id') or raw.get('student') or '').strip() or None,
+                'errors': errors,
+            })
+
+    # -------------------------
+    # BATCHES
+    # -------------------------
+
+    def reconcile_batch(self, batch):
+        """Match, record and apply one batch of (line number, CSV row) pairs"""
+        self.processed += len(batch)
+        rows = []
+        for line, raw in batch:
+            serializer = PaymentRowSerializer(data={
+                name: value.strip() for name, value in raw.items() if name and value and value.strip()
+            })
+            if not serializer.is_valid():
+                self.add_error(line, raw, serializer.errors)
+                continue
+            data = serializer.validated_data
+            if data['receipt_number'] in self._seen_receipts:
+                self.add_error(line, raw, {'receipt_number': ['This receipt appears more than once in the file.']})
+                continue
+            self._seen_receipts.add(data['receipt_number'])
+            rows.append((line, raw, data))
+        if not rows:
+            return
+
+        with transaction.atomic():
+            # Receipts already recorded (re-imported file)
+            recorded = set(
+                PaymentHistory.objects.filter(
+                    fee__school_id=self.school_id,
+                    receipt_number__in=[data['receipt_number'] for _, _, data in rows],
+                ).values_list('receipt_number', flat=True)
+            )
+            # The fees stay locked until the payments are applied, so a concurrent
+            # payment cannot make the amounts checked below out of date
+            fees_by_id, open_fees = self.load_fees(
+                [data for _, _, data in rows if data['receipt_number'] not in recorded]
+            )
+
+            payments = []
+            matched = []
+            # Amount still due per fee, as rows of this batch are matched
+            remaining = {fee_id: fee['total_amount'] - fee['paid_amount'] for fee_id, fee in fees_by_id.items()}
+            for line, raw, data in rows:
+                if data['receipt_number'] in recorded:
+                    self.duplicates += 1
+                    continue
+                allocations, error = self.match(data, fees_by_id, open_fees, remaining)
+                if error:
+                    self.add_error(line, raw, {'reference': [error]})
+                    continue
+                payments.extend((fee, data, amount) for fee, amount in allocations)
+                matched.append(data)
+            if not payments:
+                return
+
+            PaymentHistory.objects.bulk_create([
+                PaymentHistory(
+                    fee_id=fee['id'],
+                    payment_amount=amount,
+                    payment_date=data['date'],
+                    receipt_number=data['receipt_number'],
+                    notes=data['notes'],
+                )
+                for fee, data, amount in payments
+            ])
+            self.apply_payments(payments)
+
+        self.matched += len(matched)
+        self.amount += sum((data['amount'] for data in matched), Decimal('0'))
+
+    def load_fees(self, rows):
+        """
+        Fees referenced by a batch, with their students, in one query.
+        The fees are locked (SELECT ... FOR UPDATE); call inside a transaction.
+
+        Returns:
+            tuple: ({fee_id: fee}, {student reference: [unpaid fees, oldest first]})
+        """
+        fee_ids = [data['fee_id'] for data in rows if data.get('fee_id')]
+        references = [data['student'] for data in rows if not data.get('fee_id')]
+        if not fee_ids and not references:
+            return {}, {}
+        condition = Q(pk__in=fee_ids)
+        if references:
+            condition |= ~Q(status='paid') & (
+                Q(student__email__in=references)
+                | Q(student__student_id__in=references)
+                | Q(student__admission_number__in=references)
+            )
+        fees = Fee.objects.filter(condition, school_id=self.school_id).select_for_update(of=('self',)).order_by(
+            'due_date', 'id'
+        ).values(
+            'id', 'student_id', 'fee_type', 'status', 'total_amount', 'paid_amount',
+            'student__student_id', 'student__admission_number'
+        )
+
+        fees_by_id = {}
+        open_fees = {}
+        for fee in fees:
+            fees_by_id[fee['id']] = fee
+            if fee['status'] == 'paid':
+                continue
+            for reference in {fee['student_id'], fee['student__student_id'], fee['student__admission_number']}:
+                if reference:
+                    open_fees.setdefault(reference, []).append(fee)
+        return fees_by_id, open_fees
+
+    @staticmethod
+    def match(data, fees_by_id, open_fees, remaining):
+        """
+        Fees a payment row applies to, and the amount applied to each.
+        A student reference pays the oldest unpaid fees first; `remaining`
+        (amount still due per fee) is reduced by what is applied.
+
+        Returns:
+            tuple: ([(fee, amount), ...], None) or (None, error message)
+        """
+        amount = data['amount']
+        if data.get('fee_id'):
+            fee = fees_by_id.get(data['fee_id'])
+            if not fee:
+                return None, f"Fee {data['fee_id']} not found."
+            due = remaining[fee['id']]
+            if amount > due:
+                return None, f"Payment of {amount} is more than the {max(due, 0)} due on fee {fee['id']}."
+            remaining[fee['id']] = due - amount
+            return [(fee, amount)], None
+
+        candidates = open_fees.get(data['student'], [])
+        if data.get('fee_type'):
+            candidates = [fee for fee in candidates if fee['fee_type'] == data['fee_type']]
+        if len({fee['student_id'] for fee in candidates}) > 1:
+            return None, f"Student reference {data['student']} matches more than one student."
+        candidates = [fee for fee in candidates if remaining[fee['id']] > 0]
+        if not candidates:
+            return None, f"No unpaid fee found for student {data['student']}."
+        due = sum((remaining[fee['id']] for fee in candidates), Decimal('0'))
+        if amount > due:
+            return None, f"Payment of {amount} is more than the {due} due on the unpaid fees of student {data['student']}."
+
+        allocations = []
+        for fee in candidates:
+            applied = min(amount, remaining[fee['id']])
+            remaining[fee['id']] -= applied
+            allocations.append((fee, applied))
+            amount -= applied
+            if not amount:
+                break
+        return allocations, None
+
+    def apply_payments(self, payments):
+        """
+        Add a batch of payments to their fees with one UPDATE, and to the
+        denormalized totals (SchoolStats revenue, StudentFeeBalance) that
+        Fee.save() would otherwise keep up to date.
+        """
+        totals = {}
+        last_dates = {}
+        for fee, data, amount in payments:
+            totals[fee['id']] = totals.get(fee['id'], Decimal('0')) + amount
+            last_dates[fee['id']] = max(last_dates.get(fee['id'], data['date']), data['date'])
+
+        amount = DecimalField(max_digits=10, decimal_places=2)
+        paid = Case(*[When(pk=fee_id, then=Value(total)) for fee_id, total in totals.items()], output_field=amount)
+        last_paid = Case(*[When(pk=fee_id, then=Value(day)) for fee_id, day in last_dates.items()], output_field=DateField())
+        new_paid = F('paid_amount') + paid
+        Fee.objects.filter(pk__in=totals).update(
+            paid_amount=new_paid,
+            due_amount=F('total_amount') - new_paid,
+            status=Case(
+                When(GreaterThanOrEqual(new_paid, F('total_amount')), then=Value('paid')),
+                When(due_date__lt=timezone.localdate(), then=Value('overdue')),
+                default=Value('pending'),
+            ),
+            last_paid_date=Coalesce(Greatest('last_paid_date', last_paid), last_paid),
+            updated_at=timezone.now(),
+        )
+
+        SchoolStats.apply_delta(self.school_id, revenue=sum(totals.values(), Decimal('0')))
+        if settings.STUDENT_FEE_BALANCE_ENABLED:
+            per_student = {}
+            for fee, data, amount in payments:
+                per_student[fee['student_id']] = per_student.get(fee['student_id'], Decimal('0')) + amount
+            for student_id, total in per_student.items():
+                StudentFeeBalance.apply_delta(student_id, paid=total, due=-total)
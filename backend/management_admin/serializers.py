@@ -5,7 +5,9 @@ from rest_framework import serializers
 from .models import File, Department, Teacher, Student, DashboardStats, NewAdmission, Examination_management, Fee, PaymentHistory, Bus, BusStop, BusStopStudent
 from main_login.serializers import UserSerializer
 from main_login.serializer_mixins import SchoolIdMixin
-from main_login.utils import get_user_school_id
+from main_login.utils import get_request_school_id, get_request_role
+from main_login.identifiers import next_username, next_student_id
+from .fees import get_fee_rollups
 from super_admin.serializers import SchoolSerializer
 
 
@@ -100,23 +102,8 @@ class TeacherSerializer(SchoolIdMixin, serializers.ModelSerializer):
         # Create user from email if email is provided
         user = None
         if email:
-            # Generate username from email (part before @)
-            username = email.split('@')[0] if email else None
-            
-            # Ensure username is unique
-            if username:
-                base_username = username
-                counter = 1
-                while User.objects.filter(username=username).exists():
-                    username = f'{base_username}{counter}'
-                    counter += 1
-            else:
-                # Fallback if no email
-                username = f'teacher_{validated_data.get("employee_no", "unknown")}'
-                counter = 1
-                while User.objects.filter(username=username).exists():
-                    username = f'teacher_{validated_data.get("employee_no", "unknown")}_{counter}'
-                    counter += 1
+            # Generate username from email (part before @), allocated only if a new user is created
+            base_username = email.split('@')[0] or f'teacher_{validated_data.get("employee_no", "unknown")}'
             
             # Get or create teacher role
             role, _ = Role.objects.get_or_create(
@@ -132,7 +119,7 @@ class TeacherSerializer(SchoolIdMixin, serializers.ModelSerializer):
             user, created = User.objects.get_or_create(
                 email=email,
                 defaults={
-                    'username': username,
+                    'username': lambda: next_username(base_username),
                     'first_name': first_name or '',
                     'last_name': last_name or '',
                     'role': role,
@@ -199,43 +186,20 @@ class StudentSerializer(serializers.ModelSerializer):
         return None
     
     def get_total_fee_amount(self, obj):
-        """Calculate total fee amount for this student"""
-        from django.db.models import Sum
-        from django.db import DataError
-        try:
-            total = obj.management_fees.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-            return float(total)
-        except (DataError, ValueError, TypeError):
-            # Handle case where database column type doesn't match (e.g., UUID vs email)
-            return 0.0
+        """Total fee amount for this student"""
+        return get_fee_rollups(obj)['total_fee_amount']
     
     def get_paid_fee_amount(self, obj):
-        """Calculate total paid fee amount for this student"""
-        from django.db.models import Sum
-        from django.db import DataError
-        try:
-            paid = obj.management_fees.aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0
-            return float(paid)
-        except (DataError, ValueError, TypeError):
-            return 0.0
+        """Total paid fee amount for this student"""
+        return get_fee_rollups(obj)['paid_fee_amount']
     
     def get_due_fee_amount(self, obj):
-        """Calculate total due fee amount for this student"""
-        from django.db.models import Sum
-        from django.db import DataError
-        try:
-            due = obj.management_fees.aggregate(Sum('due_amount'))['due_amount__sum'] or 0
-            return float(due)
-        except (DataError, ValueError, TypeError):
-            return 0.0
+        """Total due fee amount for this student"""
+        return get_fee_rollups(obj)['due_fee_amount']
     
     def get_fees_count(self, obj):
-        """Get count of fees for this student"""
-        from django.db import DataError
-        try:
-            return obj.management_fees.count()
-        except (DataError, ValueError, TypeError):
-            return 0
+        """Count of fees for this student"""
+        return get_fee_rollups(obj)['fees_count']
 
 
 class NewAdmissionSerializer(SchoolIdMixin, serializers.ModelSerializer):
@@ -288,10 +252,8 @@ class NewAdmissionSerializer(SchoolIdMixin, serializers.ModelSerializer):
         """Override create to generate student_id and password if not provided"""
         import random
         import string
-        import datetime
         from django.db import IntegrityError
         from main_login.models import User, Role
-        from main_login.utils import get_user_school_id
         
         # Auto-populate school_id from logged-in user (from SchoolIdMixin logic)
         request = None
@@ -299,27 +261,15 @@ class NewAdmissionSerializer(SchoolIdMixin, serializers.ModelSerializer):
             request = self.context.get('request')
         
         if request and hasattr(request, 'user') and request.user.is_authenticated:
-            school_id = get_user_school_id(request.user)
-            if school_id:
-                # Only auto-populate if user is not super admin
-                if hasattr(request.user, 'role') and request.user.role:
-                    if request.user.role.name != 'super_admin':
-                        validated_data['school_id'] = school_id
-                else:
-                    # No role means auto-populate
-                    validated_data['school_id'] = school_id
+            school_id = get_request_school_id(request)
+            # Only auto-populate if user is not super admin (no role means auto-populate)
+            if school_id and get_request_role(request) != 'super_admin':
+                validated_data['school_id'] = school_id
         
         # Generate student_id if not provided
         student_id = validated_data.get('student_id')
         if not student_id:
-            # Generate unique student ID
-            timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            student_id = f'STUD-{datetime.datetime.now().year}-{timestamp[-6:]}'
-            # Ensure uniqueness
-            while NewAdmission.objects.filter(student_id=student_id).exists():
-                timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
-                student_id = f'STUD-{datetime.datetime.now().year}-{timestamp[-6:]}'
-            validated_data['student_id'] = student_id
+            validated_data['student_id'] = next_student_id()
         
         # Generate 8-character password for user login
         characters = string.ascii_letters + string.digits
@@ -331,14 +281,8 @@ class NewAdmissionSerializer(SchoolIdMixin, serializers.ModelSerializer):
         # Create user account if email is provided
         email = validated_data.get('email')
         if email:
-            # Generate username from email
-            username = email.split('@')[0]
-            # Ensure username is unique
-            base_username = username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f'{base_username}{counter}'
-                counter += 1
+            # Generate username from email (allocated only if a new user is created)
+            base_username = email.split('@')[0]
             
             # Get or create student/parent role
             role, _ = Role.objects.get_or_create(
@@ -350,7 +294,7 @@ class NewAdmissionSerializer(SchoolIdMixin, serializers.ModelSerializer):
             user, user_created = User.objects.get_or_create(
                 email=email,
                 defaults={
-                    'username': username,
+                    'username': lambda: next_username(base_username),
                     'first_name': validated_data.get('student_name', ''),
                     'role': role,
                     'is_active': True,
@@ -440,6 +384,35 @@ class PaymentHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class FeeTemplateSerializer(serializers.Serializer):
+    """
+    Fee template expanded across a class and/or grade (see FeeViewSet.generate).
+    One fee is created per student and installment, starting on first_due_date.
+    """
+    applying_class = serializers.CharField(required=False, help_text='Class of the students to bill')
+    grade = serializers.CharField(required=False, help_text='Grade of the students to bill')
+    fee_type = serializers.ChoiceField(choices=Fee.FEE_TYPE_CHOICES)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, help_text='Amount of each installment')
+    frequency = serializers.ChoiceField(choices=Fee.FREQUENCY_CHOICES)
+    first_due_date = serializers.DateField()
+    installments = serializers.IntegerField(
+        required=False, min_value=1, max_value=24,
+        help_text='Number of installments (default: one year, e.g. 12 for monthly)'
+    )
+    period = serializers.CharField(
+        required=False, max_length=20,
+        help_text='Name of a one-time fee (default: one per student and fee type)'
+    )
+    late_fee = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, default=0)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate(self, attrs):
+        """A class or a grade is required"""
+        if not attrs.get('applying_class') and not attrs.get('grade'):
+            raise serializers.ValidationError('applying_class or grade is required.')
+        return attrs
+
+
 class FeeSerializer(SchoolIdMixin, serializers.ModelSerializer):
     """Serializer for Fee model"""
     student_id = serializers.SerializerMethodField()
@@ -452,9 +425,15 @@ class FeeSerializer(SchoolIdMixin, serializers.ModelSerializer):
             'id', 'school_id', 'student', 'student_id', 'student_id_string', 'student_email', 'student_name', 'applying_class', 'fee_type', 'grade',
             'total_amount', 'frequency', 'due_date', 'late_fee', 'description',
             'status', 'paid_amount', 'due_amount', 
-            'last_paid_date', 'payment_history', 'created_at', 'updated_at'
+            'last_paid_date', 'period', 'late_fee_applied_date', 'payment_history', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'student_name', 'applying_class', 'payment_history']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'student_name', 'applying_class', 'period', 'late_fee_applied_date', 'payment_history']
+    
+    def __init__(self, *args, **kwargs):
+        """Drop nested payment_history unless requested (see FeeViewSet.include_payment_history)"""
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_payment_history', True):
+            self.fields.pop('payment_history', None)
     
     def get_student_id(self, obj):
         """Safely get student ID"""
@@ -551,48 +530,49 @@ class BusSerializer(SchoolIdMixin, serializers.ModelSerializer):
         ]
         read_only_fields = ['school_id', 'created_at', 'updated_at']
     
+    def _get_route_stops(self, obj):
+        """
+        Split the bus's stops into (morning, afternoon) lists ordered by stop_order.
+        Uses the stops and students prefetched by BusViewSet, so no queries are
+        issued per stop; the result is cached on the bus for both route fields.
+        """
+        if not hasattr(obj, '_route_stops'):
+            morning, afternoon = [], []
+            for stop in sorted(obj.stops.all(), key=lambda stop: stop.stop_order):
+                if stop.route_type == 'morning':
+                    morning.append(stop)
+                elif stop.route_type == 'afternoon':
+                    afternoon.append(stop)
+            obj._route_stops = (morning, afternoon)
+        return obj._route_stops
+    
+    def _serialize_stop(self, stop, students):
+        """Serialize a stop with the given (already loaded) students"""
+        stop_data = BusStopSerializer(stop, context=self.context).data
+        stop_data['students'] = BusStopStudentSerializer(students, many=True, context=self.context).data
+        stop_data['student_count'] = len(students)
+        return stop_data
+    
     def get_morning_stops(self, obj):
         """Get all morning route stops with their students"""
-        morning_stops = obj.stops.filter(route_type='morning').order_by('stop_order')
-        stops_data = []
-        for stop in morning_stops:
-            stop_data = BusStopSerializer(stop, context=self.context).data
-            # Get students for this stop
-            students = stop.stop_students.all()
-            stop_data['students'] = BusStopStudentSerializer(students, many=True, context=self.context).data
-            stop_data['student_count'] = students.count()
-            stops_data.append(stop_data)
-        return stops_data
+        morning_stops, _ = self._get_route_stops(obj)
+        return [self._serialize_stop(stop, list(stop.stop_students.all())) for stop in morning_stops]
     
     def get_afternoon_stops(self, obj):
         """Get all afternoon route stops with their students.
         Students are always taken from the corresponding morning stop (matched by stop_name),
         so only the stop order changes, not the student assignments.
         """
-        afternoon_stops = obj.stops.filter(route_type='afternoon').order_by('stop_order')
-        morning_stops = obj.stops.filter(route_type='morning').order_by('stop_order')
+        morning_stops, afternoon_stops = self._get_route_stops(obj)
         
         # Create a map of morning stops by stop_name for quick lookup
         morning_stops_map = {stop.stop_name: stop for stop in morning_stops}
         
         stops_data = []
         for stop in afternoon_stops:
-            stop_data = BusStopSerializer(stop, context=self.context).data
-            
             # Always get students from the corresponding morning stop (matched by stop_name)
-            # This ensures students remain the same, only stop_order changes
-            corresponding_morning_stop = morning_stops_map.get(stop.stop_name)
-            
-            if corresponding_morning_stop:
-                # Get students from corresponding morning stop (same location name)
-                morning_students = corresponding_morning_stop.stop_students.all()
-                stop_data['students'] = BusStopStudentSerializer(morning_students, many=True, context=self.context).data
-                stop_data['student_count'] = morning_students.count()
-            else:
-                # If no corresponding morning stop found, use students directly assigned to afternoon stop
-                students = stop.stop_students.all()
-                stop_data['students'] = BusStopStudentSerializer(students, many=True, context=self.context).data
-                stop_data['student_count'] = students.count()
-            
-            stops_data.append(stop_data)
+            # This ensures students remain the same, only stop_order changes.
+            # If no corresponding morning stop found, use students directly assigned to afternoon stop
+            source_stop = morning_stops_map.get(stop.stop_name, stop)
+            stops_data.append(self._serialize_stop(stop, list(source_stop.stop_students.all())))
         return stops_data
@@ -0,0 +1,393 @@
+"""
+Bulk student import from CSV.
+
+The file is read as a stream and processed in chunks. Each chunk is validated
+row by row with the StudentSerializer field rules, and schools, existing
+students, admission numbers and login users are resolved with one set lookup
+per chunk instead of one query per row. Valid rows are then loaded in one
+statement: on PostgreSQL through COPY into a temporary staging table followed
+by INSERT ... SELECT ... ON CONFLICT, elsewhere through bulk_create with
+update_conflicts.
+
+Rows are upserted on email (the Student primary key). A student that already
+exists in another school is never overwritten; the row is reported as an
+error instead. Only the columns present in the file are updated on existing
+students, and a blank cell keeps the student's current value, so a partial
+file (e.g. email and parent_phone) changes nothing else. New students get the
+model default for blank cells and missing columns. An existing login link is
+never removed.
+
+Student.save() and the post_save signals are bypassed, so the work they do is
+repeated here in bulk: school_name is filled in, students are linked to the
+login user with the same email, the user's school_id is set and the
+SchoolStats counters are updated.
+"""
+import csv
+import io
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+from main_login.models import User
+from main_login.utils import invalidate_user_school_id
+from super_admin.models import School, SchoolStats
+from .models import Student
+
+
+# CSV columns loaded into the students table (besides email and school)
+IMPORT_FIELDS = [
+    'student_id', 'student_name', 'parent_name', 'date_of_birth', 'gender',
+    'applying_class', 'grade', 'address', 'category', 'admission_number',
+    'parent_phone', 'emergency_contact', 'medical_information',
+    'blood_group', 'previous_school', 'remarks',
+]
+
+# Optional CSV column with the school_id of each row (when allowed)
+SCHOOL_COLUMN = 'school'
+
+# Columns always written when an existing student is imported again (besides
+# the IMPORT_FIELDS columns present in the file)
+MERGE_FIELDS = ['user', 'school_name', 'updated_at']
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+
+class StudentImport:
+    """
+    One CSV import run.
+
+    Usage:
+        student_import = StudentImport(csv_file, school=school)
+        for progress in student_import.run():
+            ...
+        student_import.summary()
+    """
+
+    def __init__(self, file, school=None, allow_school_column=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE, max_errors=MAX_REPORTED_ERRORS):
+        """
+        Args:
+            file: binary or text file object with a header row
+            school: School every row is imported into (default for rows without a school column)
+            allow_school_column: whether rows may name their own school (super admin / command line)
+            chunk_size: rows validated and loaded per statement
+            max_errors: maximum number of row errors kept for the report
+        """
+        if isinstance(file, io.TextIOBase):
+            self.file = file
+        else:
+            self.file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        self.school = school
+        self.allow_school_column = allow_school_column
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+        self._schools = {school.school_id: school} if school else {}
+        self._seen_emails = set()
+        self._seen_admission_numbers = set()
+        self._fields = self.get_row_fields()
+        # Columns updated on existing students (set from the header in run())
+        self.merge_fields = list(MERGE_FIELDS)
+
+    @staticmethod
+    def get_row_fields():
+        """Validation fields for one CSV row, taken from StudentSerializer"""
+        from .serializers import StudentSerializer
+        student_fields = StudentSerializer().fields
+        fields = {'email': serializers.EmailField(max_length=254)}
+        for name in IMPORT_FIELDS:
+            field = student_fields[name]
+            # Uniqueness is checked per chunk with set lookups, not one query per row
+            field.validators = [
+                validator for validator in field.validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+            fields[name] = field
+        return fields
+
+    # -------------------------
+    # RUN
+    # -------------------------
+
+    def run(self):
+        """
+        Import the whole file, one chunk at a time.
+        Yields the progress (see progress()) after every chunk.
+        """
+        reader = csv.DictReader(self.file)
+        header = [name.strip() for name in (reader.fieldnames or [])]
+        if 'email' not in header:
+            raise serializers.ValidationError({'file': 'The CSV file must have a header row with an "email" column.'})
+        reader.fieldnames = header
+        self.merge_fields = [name for name in IMPORT_FIELDS if name in header] + MERGE_FIELDS
+
+        chunk = []
+        # Line 1 is the header
+        for line, row in enumerate(reader, start=2):
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+                yield self.progress()
+        if chunk:
+            self.import_chunk(chunk)
+            yield self.progress()
+
+    def progress(self):
+        """Counters so far"""
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+        }
+
+    def summary(self):
+        """Counters and the (first max_errors) row errors"""
+        return {
+            **self.progress(),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def add_error(self, line, email, errors):
+        """Record a rejected row"""
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': line, 'email': email, 'errors': errors})
+
+    # -------------------------
+    # CHUNKS
+    # -------------------------
+
+    def import_chunk(self, chunk):
+        """Validate and load one chunk of (line number, CSV row) pairs"""
+        self.processed += len(chunk)
+        rows = []
+        for line, raw in chunk:
+            values, errors = self.validate_row(raw)
+            if errors:
+                self.add_error(line, (raw.get('email') or '').strip() or None, errors)
+            else:
+                rows.append((line, values, (raw.get(SCHOOL_COLUMN) or '').strip()))
+        if not rows:
+            return
+
+        self.resolve_schools({school_id for _, _, school_id in rows if school_id})
+
+        emails = [values['email'] for _, values, _ in rows]
+        admission_numbers = [values['admission_number'] for _, values, _ in rows if values.get('admission_number')]
+        current = {
+            row['email']: row
+            for row in Student.objects.filter(email__in=emails)
+            .values('email', 'school_id', 'user_id', *IMPORT_FIELDS)
+        }
+        existing = {email: (row['school_id'], row['user_id']) for email, row in current.items()}
+        admission_owners = dict(
+            Student.objects.filter(admission_number__in=admission_numbers)
+            .values_list('admission_number', 'email')
+        )
+        users = dict(User.objects.filter(email__in=emails).values_list('email', 'user_id'))
+
+        now = timezone.now()
+        students = []
+        for line, values, school_id in rows:
+            email = values['email']
+            school = self.get_row_school(school_id)
+            errors = {}
+            if school is None:
+                errors[SCHOOL_COLUMN] = [
+                    f'School "{school_id}" not found.' if school_id else 'No school given for this row.'
+                ]
+            elif email in existing and existing[email][0] != school.school_id:
+                errors['email'] = ['A student with this email already exists in another school.']
+            admission_number = values.get('admission_number')
+            if admission_number and admission_owners.get(admission_number, email) != email:
+                errors['admission_number'] = ['This admission number is already used by another student.']
+            if errors:
+                self.add_error(line, email, errors)
+                continue
+
+            # Blank cells keep the current value, or take the default for a new student
+            for name in IMPORT_FIELDS:
+                if name not in values:
+                    if email in current:
+                        values[name] = current[email][name]
+                    else:
+                        values[name] = Student._meta.get_field(name).get_default()
+            # Keep an existing login link, otherwise link the user with the same email
+            user_id = existing[email][1] if email in existing else None
+            students.append(Student(
+                school=school,
+                school_name=school.name,
+                user_id=user_id or users.get(email),
+                created_at=now,
+                updated_at=now,
+                **values
+            ))
+        if not students:
+            return
+
+        with transaction.atomic():
+            self.load(students)
+            self.after_load(students, existing)
+
+        created = sum(1 for student in students if student.email not in existing)
+        self.created += created
+        self.updated += len(students) - created
+
+    def validate_row(self, raw):
+        """
+        Validate one CSV row with the serializer field rules.
+        Also rejects emails and admission numbers repeated in the file.
+
+        Returns:
+            tuple: (values, errors); blank cells are left out of values
+        """
+        values = {}
+        errors = {}
+        for name, field in self._fields.items():
+            value = (raw.get(name) or '').strip()
+            if not value:
+                if name == 'email':
+                    errors[name] = ['This field is required.']
+                continue
+            try:
+                values[name] = field.run_validation(value)
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+
+        email = values.get('email')
+        if email:
+            if email in self._seen_emails:
+                errors['email'] = ['This email appears more than once in the file.']
+            self._seen_emails.add(email)
+        admission_number = values.get('admission_number')
+        if admission_number:
+            if admission_number in self._seen_admission_numbers:
+                errors['admission_number'] = ['This admission number appears more than once in the file.']
+            self._seen_admission_numbers.add(admission_number)
+        return values, errors
+
+    def resolve_schools(self, school_ids):
+        """Load the schools named in a chunk that have not been seen yet (one query)"""
+        if not self.allow_school_column:
+            return
+        missing = school_ids - set(self._schools)
+        if missing:
+            for school in School.objects.filter(school_id__in=missing):
+                self._schools[school.school_id] = school
+
+    def get_row_school(self, school_id):
+        """School for a row: its school column if allowed, else the import's school"""
+        if self.allow_school_column and school_id:
+            return self._schools.get(school_id)
+        return self.school
+
+    # -------------------------
+    # LOADING
+    # -------------------------
+
+    def load(self, students):
+        """Insert or update a chunk of students in one statement"""
+        if connection.vendor == 'postgresql':
+            self.copy_merge(students)
+        else:
+            Student.objects.bulk_create(
+                students,
+                update_conflicts=True,
+                unique_fields=['email'],
+                update_fields=self.merge_fields,
+            )
+
+    def copy_merge(self, students):
+        """
+        PostgreSQL: COPY the chunk into a temporary staging table, then merge it
+        into the students table with INSERT ... SELECT ... ON CONFLICT.
+        New rows get every column; existing rows only self.merge_fields.
+        """
+        opts = Student._meta
+        fields = [
+            opts.get_field(name)
+            for name in ['email', 'school'] + IMPORT_FIELDS + MERGE_FIELDS + ['created_at']
+        ]
+        quote = connection.ops.quote_name
+        table = quote(opts.db_table)
+        staging = quote(f'{opts.db_table}_import')
+        columns = ', '.join(quote(field.column) for field in fields)
+        user_column = quote(opts.get_field('user').column)
+        updates = ', '.join(
+            # A login link set meanwhile is kept
+            f'{user_column} = COALESCE(EXCLUDED.{user_column}, {table}.{user_column})'
+            if name == 'user' else
+            f'{quote(opts.get_field(name).column)} = EXCLUDED.{quote(opts.get_field(name).column)}'
+            for name in self.merge_fields
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for student in students:
+            writer.writerow([
+                self.copy_value(field.get_db_prep_save(getattr(student, field.attname), connection))
+                for field in fields
+            ])
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+            # Rows of students in another school were rejected before loading;
+            # the WHERE clause keeps a concurrent import from overwriting them.
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} '
+                f'ON CONFLICT ({quote(opts.pk.column)}) DO UPDATE SET {updates} '
+                f'WHERE {table}.{quote(opts.get_field("school").column)} = '
+                f'EXCLUDED.{quote(opts.get_field("school").column)}'
+            )
+            # ON COMMIT DROP only fires at the outermost commit; the next chunk may share it
+            cursor.execute(f'DROP TABLE {staging}')
+
+    @staticmethod
+    def copy_value(value):
+        """Format a database value for COPY ... (FORMAT csv, NULL '\\N')"""
+        if value is None:
+            return '\\N'
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def after_load(self, students, existing):
+        """
+        Bulk version of what Student.save() and its signals do per row:
+        set the linked users' school_id, drop their cached school_id and
+        update the SchoolStats student counts.
+        """
+        linked = {}
+        created = {}
+        for student in students:
+            if student.user_id:
+                linked.setdefault(student.school_id, []).append(student.user_id)
+            if student.email not in existing:
+                created[student.school_id] = created.get(student.school_id, 0) + 1
+
+        for school_id, user_ids in linked.items():
+            # Users already resolved to a school (e.g. staff accounts) keep it
+            User.objects.filter(user_id__in=user_ids, school_id__isnull=True).update(school_id=school_id)
+            for user_id in user_ids:
+                invalidate_user_school_id(user_id)
+
+        for school_id, count in created.items():
+            SchoolStats.apply_delta(school_id, students=count)
@@ -0,0 +1,234 @@
+"""
+Tests for management_admin
+"""
+import io
+from datetime import date, time
+from unittest import skipUnless
+from rest_framework.test import APIClient
+from django.db import connection
+from django.test import TestCase
+from main_login.models import Role, User
+from main_login.views import get_tokens_for_user
+from super_admin.models import School
+from .models import Bus, BusStop, BusStopStudent, NewAdmission, Student
+from .student_import import StudentImport
+
+
+class BusListQueryTests(TestCase):
+    """Listing buses costs a fixed number of queries, however many buses, stops and students"""
+
+    # Count, buses with school, stops, stop students with student
+    # (the user and school lookups are cached after the first request)
+    LIST_QUERIES = 4
+
+    def setUp(self):
+        role, _ = Role.objects.get_or_create(name='management_admin')
+        admin = User.objects.create(username='busadmin', email='busadmin@example.com', role=role)
+        self.school = School.objects.create(
+            name='School', location='City', statecode='TG', districtcode='HYD',
+            registration_number='REG-BUS', user=admin,
+        )
+        self.students = [
+            Student.objects.create(email=f'student{number}@example.com', school=self.school, student_name=f'Student {number}')
+            for number in range(6)
+        ]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + get_tokens_for_user(admin)['access'])
+
+    def create_bus(self, number):
+        """A bus with three stops each way and two students per morning stop"""
+        bus = Bus.objects.create(
+            bus_number=f'BUS{number}', school=self.school, bus_type='Mini Bus', capacity=20,
+            registration_number=f'TG-{number}', driver_name='Driver', driver_phone='9000000000',
+            driver_license=f'DL-{number}', route_name=f'Route {number}',
+            morning_start_time=time(7), morning_end_time=time(8),
+            afternoon_start_time=time(15), afternoon_end_time=time(16),
+        )
+        for order in range(1, 4):
+            morning = BusStop.objects.create(bus=bus, stop_name=f'Stop {order}', route_type='morning', stop_order=order)
+            BusStop.objects.create(bus=bus, stop_name=f'Stop {order}', route_type='afternoon', stop_order=4 - order)
+            for student in self.students[2 * (order - 1):2 * order]:
+                BusStopStudent.objects.create(bus_stop=morning, student=student)
+        return bus
+
+    def list_buses(self):
+        response = self.client.get('/api/management-admin/buses/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['results'] if isinstance(data, dict) else data
+
+    def test_query_count_does_not_grow_with_buses(self):
+        self.create_bus(1)
+        # Warm the per-process principal and school caches
+        self.list_buses()
+
+        with self.assertNumQueries(self.LIST_QUERIES):
+            self.assertEqual(len(self.list_buses()), 1)
+
+        for number in range(2, 6):
+            self.create_bus(number)
+        with self.assertNumQueries(self.LIST_QUERIES):
+            buses = self.list_buses()
+        self.assertEqual(len(buses), 5)
+
+        for bus in buses:
+            self.assertEqual([stop['student_count'] for stop in bus['morning_stops']], [2, 2, 2])
+            # Afternoon stops run in reverse and carry the morning stop's students
+            self.assertEqual([stop['stop_name'] for stop in bus['afternoon_stops']], ['Stop 3', 'Stop 2', 'Stop 1'])
+            self.assertEqual(
+                [student['student_name'] for student in bus['afternoon_stops'][0]['students']],
+                ['Student 4', 'Student 5'],
+            )
+
+
+class ApproveBatchTests(TestCase):
+    """Batch approval only ever touches admissions of the caller's school"""
+
+    URL = '/api/management-admin/admissions/approve-batch/'
+
+    def setUp(self):
+        self.role, _ = Role.objects.get_or_create(name='management_admin')
+        self.school = self.create_school('a')
+        self.other_school = self.create_school('b')
+
+    def create_admin(self, name):
+        return User.objects.create(username=name, email=f'{name}@example.com', role=self.role)
+
+    def create_school(self, name):
+        return School.objects.create(
+            name=f'School {name}', location='City', statecode='TG', districtcode='HYD',
+            registration_number=f'REG-{name}', user=self.create_admin(f'admin-{name}'),
+        )
+
+    def create_admission(self, school, number):
+        return NewAdmission.objects.create(
+            student_id=f'STUD-{number}', school_id=school.school_id, email=f'applicant{number}@example.com',
+            student_name='Applicant', parent_name='Parent', date_of_birth='2015-01-01',
+            gender='Male', applying_class='5',
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + get_tokens_for_user(user)['access'])
+        return client
+
+    def test_other_school_admission_is_not_found(self):
+        own = self.create_admission(self.school, 1)
+        foreign = self.create_admission(self.other_school, 2)
+
+        response = self.client_for(self.school.user).post(
+            self.URL, {'student_ids': [own.pk, foreign.pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        results = {result['student_id']: result for result in response.data['data']['results']}
+        self.assertEqual(results[own.pk]['status'], 'approved')
+        self.assertEqual(results[foreign.pk]['status'], 'failed')
+        self.assertEqual(results[foreign.pk]['message'], 'Admission not found')
+
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, 'Pending')
+        self.assertFalse(Student.objects.filter(email=foreign.email).exists())
+
+    def test_admin_without_school_is_rejected(self):
+        foreign = self.create_admission(self.other_school, 3)
+
+        response = self.client_for(self.create_admin('no-school')).post(
+            self.URL, {'student_ids': [foreign.pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, 'Pending')
+
+
+class FeeListErrorTests(TestCase):
+    """Client errors in the fee list come back as 4xx, not 500"""
+
+    def setUp(self):
+        role, _ = Role.objects.get_or_create(name='management_admin')
+        admin = User.objects.create(username='feeadmin', email='feeadmin@example.com', role=role)
+        School.objects.create(
+            name='School', location='City', statecode='TG', districtcode='HYD',
+            registration_number='REG-FEES', user=admin,
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + get_tokens_for_user(admin)['access'])
+
+    def test_invalid_filter_is_400(self):
+        response = self.client.get('/api/management-admin/fees/', {'status': 'no-such-status'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/management-admin/fees/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY merge needs PostgreSQL')
+class StudentImportCopyMergeTests(TestCase):
+    """StudentImport through COPY into the staging table and INSERT ... ON CONFLICT"""
+
+    def setUp(self):
+        role, _ = Role.objects.get_or_create(name='management_admin')
+        self.school = School.objects.create(
+            name='School A', location='City', statecode='TG', districtcode='HYD',
+            registration_number='REG-IMPORT-A',
+            user=User.objects.create(username='import-a', email='import-a@example.com', role=role),
+        )
+        self.other_school = School.objects.create(
+            name='School B', location='City', statecode='TG', districtcode='HYD',
+            registration_number='REG-IMPORT-B',
+            user=User.objects.create(username='import-b', email='import-b@example.com', role=role),
+        )
+
+    def run_import(self, text, school=None):
+        student_import = StudentImport(io.StringIO(text), school=school or self.school, chunk_size=2)
+        for _ in student_import.run():
+            pass
+        return student_import.summary()
+
+    def test_insert_update_and_partial_reimport(self):
+        login = User.objects.create(username='asha', email='asha@example.com')
+        summary = self.run_import(
+            'email,student_name,date_of_birth,applying_class,address,admission_number,parent_phone\n'
+            'asha@example.com,Asha,2015-04-01,5,1 Main Road,ADM-1,9000000001\n'
+            'ravi@example.com,Ravi,2014-02-01,6,2 Main Road,,9000000002\n'
+            'meena@example.com,Meena,,4,,,\n'
+        )
+        self.assertEqual((summary['created'], summary['updated'], summary['failed']), (3, 0, 0))
+        asha = Student.objects.get(email='asha@example.com')
+        self.assertEqual((asha.school_id, asha.school_name, asha.user_id), (self.school.pk, 'School A', login.pk))
+        self.assertEqual(asha.date_of_birth, date(2015, 4, 1))
+        # Blank cells of a new student take the model default
+        self.assertEqual(Student.objects.get(email='meena@example.com').address, 'Address not provided')
+
+        summary = self.run_import(
+            'email,student_name,applying_class\n'
+            'ravi@example.com,Ravi Kumar,7\n'
+        )
+        self.assertEqual((summary['created'], summary['updated']), (0, 1))
+        ravi = Student.objects.get(email='ravi@example.com')
+        self.assertEqual((ravi.student_name, ravi.applying_class, ravi.address), ('Ravi Kumar', '7', '2 Main Road'))
+
+        # Only the phone column: everything else, including the login link, stays
+        login.email = 'asha.login@example.com'
+        login.save()
+        summary = self.run_import(
+            'email,parent_phone,address\n'
+            'asha@example.com,9111111111,\n'
+        )
+        self.assertEqual((summary['updated'], summary['failed']), (1, 0))
+        asha = Student.objects.get(email='asha@example.com')
+        self.assertEqual(asha.parent_phone, '9111111111')
+        self.assertEqual(
+            (asha.student_name, asha.date_of_birth, asha.applying_class, asha.address, asha.admission_number),
+            ('Asha', date(2015, 4, 1), '5', '1 Main Road', 'ADM-1'),
+        )
+        self.assertEqual(asha.user_id, login.pk)
+
+    def test_student_of_another_school_is_rejected(self):
+        self.run_import('email,student_name,applying_class\nasha@example.com,Asha,5\n', school=self.other_school)
+
+        summary = self.run_import('email,student_name,applying_class\nasha@example.com,Changed,6\n')
+        self.assertEqual((summary['updated'], summary['failed']), (0, 1))
+        self.assertIn('another school', summary['errors'][0]['errors']['email'][0])
+        asha = Student.objects.get(email='asha@example.com')
+        self.assertEqual((asha.school_id, asha.student_name), (self.other_school.pk, 'Asha'))
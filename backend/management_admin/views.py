@@ -1,13 +1,20 @@
 """
 Views for management_admin app - API layer for App 2
 """
+import json
 import random
 import string
+from django.conf import settings
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.utils.encoders import JSONEncoder
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Prefetch
 from .models import File, Department, Teacher, Student, DashboardStats, NewAdmission, Examination_management, Fee, PaymentHistory, Bus, BusStop, BusStopStudent
 from super_admin.models import School
 from .serializers import (
@@ -19,13 +26,22 @@ from .serializers import (
     NewAdmissionSerializer,
     ExaminationManagementSerializer,
     FeeSerializer,
+    FeeTemplateSerializer,
     BusSerializer,
     BusStopSerializer,
     BusStopStudentSerializer
 )
-from main_login.permissions import IsManagementAdmin
+from main_login.permissions import IsManagementAdmin, IsSuperAdminOrManagementAdmin
 from main_login.mixins import SchoolFilterMixin
-from main_login.utils import get_user_school_id
+from main_login.pagination import KeysetPagination
+from main_login.streaming import stream_lines
+from main_login.utils import get_request_school_id, get_request_role
+from main_login.identifiers import next_username, next_admission_number
+from .fees import annotate_fee_rollups, generate_fees
+from .student_import import StudentImport
+from .payments import PaymentReconciliation
+from .admissions import approve_admissions
+from main_login.jobs import start_job
 
 
 class FileViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
@@ -41,7 +57,7 @@ class FileViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Set uploaded_by and school_id when creating file"""
-        school_id = get_user_school_id(self.request.user)
+        school_id = get_request_school_id(self.request)
         serializer.save(
             uploaded_by=self.request.user,
             school_id=school_id
@@ -84,19 +100,18 @@ class TeacherViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         school_id = self.get_school_id()
         
         # Check if user is super admin
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                # Super admin can set school_id manually or leave it
-                # If school_id is provided in data, use it; otherwise let it be set from department
-                super().perform_create(serializer)
-                # After save, ensure school_id is set from department if not already set
-                teacher = serializer.instance
-                if teacher and teacher.department and teacher.department.school:
-                    department_school_id = teacher.department.school.school_id
-                    if not teacher.school_id or teacher.school_id != department_school_id:
-                        teacher.school_id = department_school_id
-                        teacher.save(update_fields=['school_id'])
-                return
+        if get_request_role(self.request) == 'super_admin':
+            # Super admin can set school_id manually or leave it
+            # If school_id is provided in data, use it; otherwise let it be set from department
+            super().perform_create(serializer)
+            # After save, ensure school_id is set from department if not already set
+            teacher = serializer.instance
+            if teacher and teacher.department and teacher.department.school:
+                department_school_id = teacher.department.school.school_id
+                if not teacher.school_id or teacher.school_id != department_school_id:
+                    teacher.school_id = department_school_id
+                    teacher.save(update_fields=['school_id'])
+            return
         
         # For non-super-admin users, automatically set school_id
         serializer.save()
@@ -128,8 +143,7 @@ class TeacherViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         
         if profile_photo_file:
             # Create File record for the uploaded photo
-            from main_login.utils import get_user_school_id
-            school_id = get_user_school_id(request.user) if request.user.is_authenticated else None
+            school_id = get_request_school_id(request)
             
             file_obj = File.objects.create(
                 file=profile_photo_file,
@@ -179,10 +193,9 @@ class TeacherViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
             return queryset.none()  # Changed: Return empty instead of all teachers
         
         # Check if user is super admin
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                # Super admin can see all teachers
-                return queryset
+        if get_request_role(self.request) == 'super_admin':
+            # Super admin can see all teachers
+            return queryset
         
         # Get school_id for filtering
         school_id = self.get_school_id()
@@ -215,6 +228,9 @@ class StudentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
             return [IsAuthenticated()]  # Changed from AllowAny() to ensure school filtering
         if self.action in ['create', 'destroy']:
             return [AllowAny()]  # Keep AllowAny for create/destroy if needed
+        if self.action == 'import_students':
+            # Super admins import into the school given in the file or request
+            return [IsAuthenticated(), IsSuperAdminOrManagementAdmin()]
         return [IsAuthenticated(), IsManagementAdmin()]
     
     def get_queryset(self):
@@ -222,8 +238,10 @@ class StudentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         Override to ensure school_id filtering is applied when user is authenticated.
         Now all list/retrieve requests are authenticated, so filtering will always work.
         """
-        # Get base queryset
-        queryset = super(SchoolFilterMixin, self).get_queryset()
+        # Get base queryset with related rows and fee totals loaded in the same query
+        queryset = annotate_fee_rollups(
+            super(SchoolFilterMixin, self).get_queryset().select_related('school', 'user__role', 'profile_photo')
+        )
         
         # All requests should be authenticated now (due to permission change above)
         # But keep the check for safety
@@ -232,9 +250,8 @@ class StudentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         
         # For authenticated users, apply school filtering via SchoolFilterMixin
         # Check if user is super admin (should see all data)
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                return queryset
+        if get_request_role(self.request) == 'super_admin':
+            return queryset
         
         # Get school_id for current user
         school_id = self.get_school_id()
@@ -251,23 +268,22 @@ class StudentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         school_id = self.get_school_id()
         
         # Check if user is super admin
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                # Super admin can set school manually or leave it
-                # If school is provided in data, use it; otherwise let it be set manually
-                if 'school' not in serializer.validated_data:
-                    # Try to get school from request data
-                    school_id_from_request = self.request.data.get('school')
-                    if school_id_from_request:
-                        from super_admin.models import School
-                        try:
-                            school = School.objects.get(school_id=school_id_from_request)
-                            serializer.save(school=school)
-                            return
-                        except School.DoesNotExist:
-                            pass
-                super().perform_create(serializer)
-                return
+        if get_request_role(self.request) == 'super_admin':
+            # Super admin can set school manually or leave it
+            # If school is provided in data, use it; otherwise let it be set manually
+            if 'school' not in serializer.validated_data:
+                # Try to get school from request data
+                school_id_from_request = self.request.data.get('school')
+                if school_id_from_request:
+                    from super_admin.models import School
+                    try:
+                        school = School.objects.get(school_id=school_id_from_request)
+                        serializer.save(school=school)
+                        return
+                    except School.DoesNotExist:
+                        pass
+            super().perform_create(serializer)
+            return
         
         # For non-super-admin users, automatically set school
         if school_id:
@@ -303,6 +319,89 @@ class StudentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
                 pass
         
         return student
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_students(self, request):
+        """
+        Bulk import students from an uploaded CSV file (multipart field "file").
+        The header row names the columns (email plus any StudentSerializer field);
+        super admins may add a "school" column or pass a school in the form data.
+        
+        Returns a summary with per-row errors. With ?stream=true the response is
+        JSON lines instead: one progress line per chunk, then the summary.
+        See management_admin.student_import for details.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'A CSV file is required (form field "file")',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if get_request_role(request) == 'super_admin':
+            school_id = request.data.get('school')
+            school = School.objects.filter(school_id=school_id).first() if school_id else None
+            allow_school_column = True
+        else:
+            school_id = self.get_school_id()
+            school = School.objects.filter(school_id=school_id).first() if school_id else None
+            if school is None:
+                return Response(
+                    {
+                        'success': False,
+                        'message': 'No school associated with your account. Please contact administrator.',
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Always import into the admin's own school (to prevent cross-school data)
+            allow_school_column = False
+        
+        student_import = StudentImport(upload, school=school, allow_school_column=allow_school_column)
+        if request.query_params.get('stream', '').lower() == 'true':
+            return self.stream_import(student_import)
+        
+        try:
+            for _ in student_import.run():
+                pass
+        except ValidationError as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': e.detail,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        summary = student_import.summary()
+        return Response(
+            {
+                'success': not summary['failed'],
+                'message': (
+                    f"Imported {summary['created'] + summary['updated']} student(s), "
+                    f"{summary['failed']} row(s) rejected"
+                ),
+                'data': summary,
+            },
+            status=status.HTTP_200_OK
+        )
+    
+    def stream_import(self, student_import):
+        """Run an import while streaming its progress as JSON lines"""
+        def lines():
+            try:
+                for progress in student_import.run():
+                    yield json.dumps({'progress': progress}) + '\n'
+            except ValidationError as e:
+                yield json.dumps({'success': False, 'errors': e.detail}, cls=JSONEncoder) + '\n'
+                return
+            yield json.dumps({'success': True, 'summary': student_import.summary()}, cls=JSONEncoder) + '\n'
+        
+        # One progress line per chunk, so send each line as soon as it is ready
+        return stream_lines(self.request, lines(), batch_size=1)
 
 
 class NewAdmissionViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
@@ -389,20 +488,14 @@ class NewAdmissionViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
             defaults={'description': 'Student/Parent role'}
         )
         
-        # Create username from email (part before @)
-        username = email.split('@')[0] if email else f'student_{random.randint(1000, 9999)}'
-        # Ensure username is unique
-        base_username = username
-        counter = 1
-        while User.objects.filter(username=username).exists():
-            username = f'{base_username}{counter}'
-            counter += 1
+        # Create username from email (part before @), unique via the identifier allocator
+        base_username = email.split('@')[0] if email else f'student_{random.randint(1000, 9999)}'
         
-        # Create User account
+        # Create User account (the username is only allocated if a new user is created)
         user, user_created = User.objects.get_or_create(
             email=email,
             defaults={
-                'username': username,
+                'username': lambda: next_username(base_username),
                 'first_name': first_name,
                 'last_name': last_name,
                 'role': role,
@@ -522,15 +615,7 @@ class NewAdmissionViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         
         # Generate admission number if not provided
         if not admission.admission_number:
-            import datetime
-            timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            admission_number = f'ADM-{datetime.datetime.now().year}-{timestamp[-6:]}'
-            # Ensure uniqueness
-            while Student.objects.filter(admission_number=admission_number).exists() or \
-                  NewAdmission.objects.filter(admission_number=admission_number).exists():
-                timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
-                admission_number = f'ADM-{datetime.datetime.now().year}-{timestamp[-6:]}'
-            admission.admission_number = admission_number
+            admission.admission_number = next_admission_number()
         
         admission.save()
         
@@ -568,6 +653,87 @@ class NewAdmissionViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    @action(detail=False, methods=['post'], url_path='approve-batch')
+    def approve_batch(self, request):
+        """
+        Approve many admissions at once and create their Student records.
+        POST /api/management-admin/admissions/approve-batch/
+        {"student_ids": ["STUD-2025-0000001", ...]}
+        or a filter of pending admissions: {"filter": {"applying_class": "5", "category": "General"}}
+        
+        Returns a per-admission result summary. Batches larger than
+        ADMISSION_APPROVAL_BACKGROUND_THRESHOLD run as a background job; the
+        response is then 202 with the job to poll.
+        """
+        # Admissions outside the user's school are reported as not found
+        is_super_admin = get_request_role(request) == 'super_admin'
+        school_id = None if is_super_admin else self.get_school_id()
+        if not is_super_admin and not school_id:
+            # Without a school approve_admissions() would not filter at all
+            return Response(
+                {
+                    'success': False,
+                    'message': 'No school found for approving admissions',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        student_ids = request.data.get('student_ids')
+        filters_data = request.data.get('filter')
+        if isinstance(student_ids, list) and student_ids:
+            admission_ids = [str(student_id) for student_id in student_ids]
+        elif isinstance(filters_data, dict):
+            allowed = {'applying_class', 'category', 'gender', 'grade', 'status'}
+            unknown = set(filters_data) - allowed
+            if unknown:
+                return Response(
+                    {
+                        'success': False,
+                        'message': f"Unsupported filter(s): {', '.join(sorted(unknown))}",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            lookup = {'status': 'Pending', **filters_data}
+            admission_ids = list(self.get_queryset().filter(**lookup).order_by('created_at').values_list('pk', flat=True))
+        else:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Provide student_ids (a non-empty list) or filter',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(admission_ids) > settings.ADMISSION_APPROVAL_BACKGROUND_THRESHOLD:
+            job = start_job(
+                'approve_admissions',
+                approve_admissions,
+                {'admission_ids': admission_ids, 'school_id': school_id},
+                user=request.user,
+                school_id=school_id,
+            )
+            return Response(
+                {
+                    'success': True,
+                    'message': f'Approving {len(admission_ids)} admission(s) in the background',
+                    'data': {
+                        'job_id': job.job_id,
+                        'status': job.status,
+                        'status_url': request.build_absolute_uri(f'/api/auth/jobs/{job.job_id}/'),
+                    },
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        summary = approve_admissions(admission_ids, school_id=school_id)
+        return Response(
+            {
+                'success': not summary['failed'],
+                'message': f"Approved {summary['approved']} admission(s), skipped {summary['skipped']}, failed {summary['failed']}",
+                'data': summary,
+            },
+            status=status.HTTP_200_OK
+        )
+    
 
 
 class DashboardViewSet(viewsets.ViewSet):
@@ -611,30 +777,56 @@ class ExaminationManagementViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
 
 
 class FeeViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
-    """ViewSet for Fee Management"""
-    queryset = Fee.objects.select_related('student').prefetch_related('payment_history').all()
+    """
+    ViewSet for Fee Management
+    
+    list supports:
+    - keyset pagination (default): ?cursor=...&page_size=...
+    - streaming JSON lines of the whole filtered list: ?stream=true
+    - nested payment_history (opt-in): ?include_payment_history=true
+    """
+    queryset = Fee.objects.select_related('student').all()
     serializer_class = FeeSerializer
     permission_classes = [IsAuthenticated, IsManagementAdmin]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['fee_type', 'status', 'frequency', 'grade', 'student']
     search_fields = ['student__student_name', 'description', 'fee_type']
     ordering_fields = ['due_date', 'created_at', 'total_amount']
     ordering = ['-due_date']
+    # Rows fetched per query when streaming
+    stream_chunk_size = 500
     
     def get_permissions(self):
         """Allow read/create/update/delete without auth for development - can be adjusted"""
         if self.action in ['list', 'retrieve', 'create', 'update', 'partial_update', 'destroy']:
             return [AllowAny()]
+        if self.action in ['generate', 'reconcile']:
+            # Super admins pass the school to bill / reconcile
+            return [IsAuthenticated(), IsSuperAdminOrManagementAdmin()]
         return [IsAuthenticated(), IsManagementAdmin()]
     
+    def include_payment_history(self):
+        """Nest payment_history in list responses only when ?include_payment_history=true"""
+        if self.action != 'list':
+            return True
+        return self.request.query_params.get('include_payment_history', '').lower() in ['1', 'true', 'yes']
+    
+    def get_serializer_context(self):
+        """Tell FeeSerializer whether to include payment_history"""
+        context = super().get_serializer_context()
+        context['include_payment_history'] = self.include_payment_history()
+        return context
+    
     def get_queryset(self):
         """Override to ensure school_id filtering is applied"""
         queryset = super().get_queryset()
+        if self.include_payment_history():
+            queryset = queryset.prefetch_related('payment_history')
         
         # Check if user is super admin
-        if hasattr(self.request.user, 'role') and self.request.user.role:
-            if self.request.user.role.name == 'super_admin':
-                return queryset
+        if get_request_role(self.request) == 'super_admin':
+            return queryset
         
         # Get school_id for filtering
         school_id = self.get_school_id()
@@ -657,11 +849,16 @@ class FeeViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
             # Apply additional filters if any
             queryset = self.filter_queryset(queryset)
             
-            # Serialize the data
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
+            if request.query_params.get('stream', '').lower() in ['1', 'true', 'yes']:
+                return self.stream_list(queryset)
             
-            return Response(data)
+            # Serialize one keyset page
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        except APIException:
+            # Bad filters, orderings and cursors keep their 4xx responses
+            raise
         except Exception as e:
             import traceback
             import logging
@@ -674,6 +871,133 @@ class FeeViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def stream_list(self, queryset):
+        """
+        Stream the filtered fees as JSON lines (one fee per line).
+        Rows are fetched stream_chunk_size at a time, so memory use does not
+        grow with the number of fees (under WSGI and ASGI alike).
+        """
+        serializer = self.get_serializer()
+        
+        def lines():
+            for fee in queryset.iterator(chunk_size=self.stream_chunk_size):
+                yield json.dumps(serializer.to_representation(fee), cls=JSONEncoder) + '\n'
+        
+        return stream_lines(self.request, lines(), batch_size=self.stream_chunk_size)
+    
+    @action(detail=False, methods=['post'], url_path='generate')
+    def generate(self, request):
+        """
+        Generate term fees for every student of a class and/or grade from a fee template.
+        Safe to re-run: a student never gets two fees of the same type for the same period.
+        POST /api/fees/generate/
+        {"applying_class": "5", "fee_type": "tuition", "total_amount": "1500.00",
+         "frequency": "monthly", "first_due_date": "2025-04-10", "late_fee": "50.00"}
+        """
+        serializer = FeeTemplateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        template = serializer.validated_data
+        
+        # Super admins choose the school; everyone else bills their own school
+        if get_request_role(request) == 'super_admin':
+            school_id = request.data.get('school')
+        else:
+            school_id = self.get_school_id()
+        if not school_id:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'No school selected for fee generation',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        students = Student.objects.filter(school__school_id=school_id)
+        if template.get('applying_class'):
+            students = students.filter(applying_class=template['applying_class'])
+        if template.get('grade'):
+            students = students.filter(grade=template['grade'])
+        
+        result = generate_fees(students, template)
+        return Response(
+            {
+                'success': True,
+                'message': f"Generated {result['created']} fee(s) for {result['students']} student(s)",
+                'data': result,
+            },
+            status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK
+        )
+    
+    @action(detail=False, methods=['post'], url_path='reconcile')
+    def reconcile(self, request):
+        """
+        Reconcile payments from an uploaded CSV file (multipart field "file").
+        Columns: receipt_number, fee_id or student (email, student ID or admission
+        number, optionally with fee_type), amount, date and optional notes.
+        
+        Receipts already recorded are skipped; rows that match no fee are
+        returned in the summary. See management_admin.payments for details.
+        POST /api/fees/reconcile/
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'A CSV file is required (form field "file")',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Super admins choose the school; everyone else reconciles their own school
+        if get_request_role(request) == 'super_admin':
+            school_id = request.data.get('school')
+        else:
+            school_id = self.get_school_id()
+        if not school_id:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'No school selected for payment reconciliation',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        reconciliation = PaymentReconciliation(upload, school_id)
+        try:
+            for _ in reconciliation.run():
+                pass
+        except ValidationError as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': e.detail,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        summary = reconciliation.summary()
+        return Response(
+            {
+                'success': not summary['unmatched'],
+                'message': (
+                    f"Recorded {summary['matched']} payment(s), {summary['duplicates']} already recorded, "
+                    f"{summary['unmatched']} row(s) unmatched"
+                ),
+                'data': summary,
+            },
+            status=status.HTTP_200_OK
+        )
+    
     @action(detail=True, methods=['post'], url_path='record-payment')
     def record_payment(self, request, pk=None):
         """Record a payment for a fee and create payment history"""
@@ -897,13 +1221,17 @@ class BusViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Optimize queryset with prefetch_related for stops and students"""
+        """
+        Load the whole bus -> stops -> stop students tree up front.
+        Listing any number of buses costs a fixed number of queries
+        (buses with school, stops, stop students with student); BusSerializer
+        splits and mirrors the morning/afternoon routes in memory.
+        """
         queryset = super().get_queryset()
-        # Prefetch stops and their students to avoid N+1 queries
-        queryset = queryset.prefetch_related(
-            'stops__stop_students__student',
-            'stops__bus'
-        ).select_related('school')
+        queryset = queryset.select_related('school').prefetch_related(
+            Prefetch('stops', queryset=BusStop.objects.order_by('route_type', 'stop_order')),
+            Prefetch('stops__stop_students', queryset=BusStopStudent.objects.select_related('student')),
+        )
         return queryset
     
     def create(self, request, *args, **kwargs):
@@ -1139,6 +1467,149 @@ class BusStopStudentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
         
         serializer = self.get_serializer(bus_stop_student)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-assign')
+    def bulk_assign(self, request):
+        """
+        Assign many students to one stop in a single transaction.
+        POST /api/bus-stop-students/bulk-assign/
+        {"stop": "<stop_id>", "student_ids": ["STUD-001", ...], "move": false}
+        
+        Students already on another stop of the same bus are a conflict, unless
+        "move" is true, in which case they are moved to this stop. Nothing is
+        written if any student is unknown, conflicting or the bus would exceed
+        its capacity.
+        """
+        stop_id = request.data.get('stop')
+        student_ids = request.data.get('student_ids')
+        move = str(request.data.get('move', '')).lower() == 'true'
+        
+        if not stop_id:
+            return Response(
+                {'error': 'stop is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(student_ids, list) or not student_ids:
+            return Response(
+                {'error': 'student_ids must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        student_ids = list(dict.fromkeys(str(student_id) for student_id in student_ids))
+        
+        stops = BusStop.objects.select_related('bus', 'bus__school')
+        if get_request_role(request) != 'super_admin':
+            stops = stops.filter(bus__school__school_id=self.get_school_id())
+        stop = stops.filter(pk=stop_id).first()
+        if not stop:
+            return Response(
+                {'error': 'Stop not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        bus = stop.bus
+        bus_school = bus.school
+        
+        # Students of the bus's school, in one query
+        students = {}
+        ambiguous = set()
+        for student in Student.objects.filter(school=bus_school, student_id__in=student_ids).only(
+            'email', 'student_id', 'student_name', 'applying_class', 'grade'
+        ):
+            if student.student_id in students:
+                ambiguous.add(student.student_id)
+            students[student.student_id] = student
+        not_found = [student_id for student_id in student_ids if student_id not in students]
+        if not_found or ambiguous:
+            return Response(
+                {
+                    'error': f'Some students were not found in school {bus_school.name}',
+                    'not_found': not_found,
+                    'ambiguous': sorted(ambiguous),
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Existing assignments of these students on this bus, in one query
+        emails = {student.email: student_id for student_id, student in students.items()}
+        already_assigned = []
+        to_move = []
+        conflicts = []
+        for assignment in BusStopStudent.objects.filter(
+            bus_stop__bus=bus, student_id__in=emails
+        ).select_related('bus_stop'):
+            if assignment.bus_stop_id == stop.stop_id:
+                already_assigned.append(emails[assignment.student_id])
+            elif move:
+                to_move.append(assignment)
+            else:
+                conflicts.append({
+                    'student_id': emails[assignment.student_id],
+                    'existing_stop_id': assignment.bus_stop_id,
+                    'existing_stop_name': assignment.bus_stop.stop_name,
+                    'existing_route_type': assignment.bus_stop.route_type,
+                })
+        if conflicts:
+            return Response(
+                {
+                    'error': 'Some students are already assigned to another stop of this bus',
+                    'conflicts': conflicts,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # A student moving between stops of the bus keeps one seat
+        on_bus = {emails[assignment.student_id] for assignment in to_move}
+        on_bus.update(already_assigned)
+        new_students = [student for student_id, student in students.items() if student_id not in on_bus]
+        
+        with transaction.atomic():
+            # Lock the bus so concurrent assignments cannot both pass the capacity check
+            Bus.objects.select_for_update().filter(pk=bus.pk).exists()
+            seats_taken = BusStopStudent.objects.filter(bus_stop__bus=bus).values('student').distinct().count()
+            if seats_taken + len(new_students) > bus.capacity:
+                return Response(
+                    {
+                        'error': f'Bus {bus.bus_number} has capacity {bus.capacity}; {seats_taken} seat(s) are taken and {len(new_students)} more were requested',
+                        'capacity': bus.capacity,
+                        'seats_taken': seats_taken,
+                        'requested': len(new_students),
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            BusStopStudent.objects.bulk_create([
+                BusStopStudent(
+                    bus_stop=stop,
+                    student=student,
+                    school_id=bus_school.school_id,
+                    school_name=bus_school.name,
+                    student_id_string=student.student_id or '',
+                    student_name=student.student_name or '',
+                    student_class=student.applying_class or '',
+                    student_grade=student.grade or '',
+                )
+                for student in new_students
+            ])
+            now = timezone.now()
+            for assignment in to_move:
+                assignment.bus_stop = stop
+                assignment.updated_at = now
+            BusStopStudent.objects.bulk_update(to_move, ['bus_stop', 'updated_at'])
+        
+        return Response(
+            {
+                'success': True,
+                'message': f'Assigned {len(new_students)} and moved {len(to_move)} student(s) to {stop.stop_name}',
+                'data': {
+                    'stop': stop.stop_id,
+                    'assigned': len(new_students),
+                    'moved': len(to_move),
+                    'already_assigned': len(already_assigned),
+                    'capacity': bus.capacity,
+                    'seats_taken': seats_taken + len(new_students),
+                },
+            },
+            status=status.HTTP_200_OK
+        )
 
 
 class SchoolViewSet(viewsets.ViewSet):
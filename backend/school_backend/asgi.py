@@ -21,17 +21,28 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.urls import path
 from teacher.routing import websocket_urlpatterns
+from student_parent.routing import websocket_urlpatterns as notification_websocket_urlpatterns
 from teacher.middleware import JWTAuthMiddleware
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_backend.settings')
 
 django_asgi_app = get_asgi_application()
 
+# Periodic sweeps in this process (EXAM_STATUS_SWEEP_INTERVAL, FEE_OVERDUE_SWEEP_INTERVAL,
+# SCHOOL_STATS_REBUILD_INTERVAL)
+from management_admin.exam_status import start_exam_status_sweeper
+from management_admin.fees import start_fee_overdue_sweeper
+from super_admin.stats import start_school_stats_rebuilder
+start_exam_status_sweeper()
+start_fee_overdue_sweeper()
+start_school_stats_rebuilder()
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": JWTAuthMiddleware(
         URLRouter(
-            websocket_urlpatterns  # currently only teacher/parent chat
+            # teacher/parent chat and per-user notifications
+            websocket_urlpatterns + notification_websocket_urlpatterns
         )
     ),
 })
@@ -136,12 +136,12 @@ AUTHENTICATION_BACKENDS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'main_login.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'main_login.pagination.SelectablePagination',  # ?pagination=cursor for keyset pages
     'PAGE_SIZE': 20,
 }
 
@@ -159,6 +159,39 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Tenant (school) resolution cache - see main_login.utils.TenantCache
+TENANT_CACHE_TTL = 300  # seconds
+TENANT_CACHE_MAX_ENTRIES = 10000
+
+# Authenticated user (principal) cache - see main_login.authentication
+PRINCIPAL_CACHE_TTL = 60  # seconds
+PRINCIPAL_CACHE_MAX_ENTRIES = 10000
+
+# Denormalized per-student fee totals (management_admin.StudentFeeBalance).
+# When enabled, fee saves keep the table up to date and student listings read
+# fee totals from it instead of aggregating the fees table.
+# Run `python manage.py rebuild_fee_balances` after turning this on.
+STUDENT_FEE_BALANCE_ENABLED = False
+
+# Batch admission approvals larger than this run as a background job
+# (main_login.jobs) and return a job to poll instead of the results.
+ADMISSION_APPROVAL_BACKGROUND_THRESHOLD = 200
+
+# Exam statuses (upcoming -> ongoing -> completed) are swept this often, in
+# seconds, by a thread of each web process (management_admin.exam_status).
+# 0 disables the in-process sweeper.
+EXAM_STATUS_SWEEP_INTERVAL = 60
+
+# Unpaid fees past their due date are marked overdue (and charged their late
+# fee once) this often, in seconds (management_admin.fees.sweep_overdue_fees).
+# 0 disables the in-process sweeper.
+FEE_OVERDUE_SWEEP_INTERVAL = 3600
+
+# SchoolStats is rebuilt from the source tables this often, in seconds
+# (super_admin.stats), to catch writes that bypassed its signals.
+# 0 disables the in-process rebuild.
+SCHOOL_STATS_REBUILD_INTERVAL = 86400
+
 # CORS Settings
 # Allow all localhost origins for Flutter web development
 CORS_ALLOWED_ORIGINS = [
@@ -178,9 +211,21 @@ else:
 
 ASGI_APPLICATION = 'school_backend.asgi.application'
 
+# The in-memory layer only reaches sockets of the same process. To share
+# groups between several daphne workers through PostgreSQL LISTEN/NOTIFY,
+# switch to main_login.channel_layer.PostgresChannelLayer once its
+# integration tests (main_login.tests) and `python manage.py
+# benchmark_channel_layer --backend postgres` pass against your server:
+#
+#     'BACKEND': 'main_login.channel_layer.PostgresChannelLayer',
+#     'CONFIG': {'database': 'default'},
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',  # OK for dev
-        # For production you'd usually switch to Redis
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
     },
 }
+
+# Chat messages are stored in batches (teacher.chat_buffer): every this many
+# messages or this many milliseconds, whichever comes first.
+CHAT_WRITE_BUFFER_MAX_MESSAGES = 100
+CHAT_WRITE_BUFFER_INTERVAL_MS = 200
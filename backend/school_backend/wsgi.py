@@ -15,3 +15,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_backend.settings')
 
 application = get_wsgi_application()
 
+# Periodic sweeps in this process (EXAM_STATUS_SWEEP_INTERVAL, FEE_OVERDUE_SWEEP_INTERVAL,
+# SCHOOL_STATS_REBUILD_INTERVAL)
+from management_admin.exam_status import start_exam_status_sweeper
+from management_admin.fees import start_fee_overdue_sweeper
+from super_admin.stats import start_school_stats_rebuilder
+start_exam_status_sweeper()
+start_fee_overdue_sweeper()
+start_school_stats_rebuilder()
+
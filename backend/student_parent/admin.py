@@ -2,7 +2,7 @@
 Admin configuration for student_parent app
 """
 from django.contrib import admin
-from .models import Parent, Notification, Fee, Communication
+from .models import Parent, Notification, NotificationCounter, Fee, Communication
 
 
 @admin.register(Parent)
@@ -20,6 +20,13 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ['title', 'message', 'recipient__username']
 
 
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread', 'updated_at']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = ['unread', 'updated_at']
+
+
 @admin.register(Fee)
 class FeeAdmin(admin.ModelAdmin):
     list_display = ['student', 'amount', 'due_date', 'status', 'payment_date', 'created_at']
@@ -0,0 +1,52 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from .models import NotificationCounter
+from .notifications import notification_group
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Per-user notification socket (ws/notifications/?token=...).
+    Sends the unread count on connect, then every new notification and every
+    unread count change of the user (see student_parent.notifications).
+    Notifications are still marked read over the REST API.
+    """
+
+    async def connect(self):
+        # Get authenticated user (JWTAuthMiddleware)
+        self.user = self.scope.get('user')
+        
+        if not self.user or not self.user.is_authenticated:
+            await self.close()
+            return
+        
+        self.group_name = notification_group(self.user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        
+        counts = await database_sync_to_async(NotificationCounter.get_counts)([self.user.pk])
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'unread_count': counts.get(self.user.pk, 0),
+        }))
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_created(self, event):
+        """Send a new notification and the updated unread count to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': event['notification'],
+            'unread_count': event['unread_count'],
+        }))
+
+    async def notification_unread(self, event):
+        """Send the unread count to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'unread_count': event['unread_count'],
+        }))
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the per-user unread notification counters
+(NotificationCounter) from the notifications table.
+Run it to repair drift, e.g. after notifications were changed with raw SQL.
+"""
+from django.core.management.base import BaseCommand
+from main_login.models import User
+from student_parent.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user unread notification counters from the notifications table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='users',
+            help='Username to rebuild (can be repeated; default: all users)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['users']:
+            user_ids = list(User.objects.filter(username__in=options['users']).values_list('pk', flat=True))
+        
+        count = NotificationCounter.rebuild(user_ids=user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt notification counters for {count} user(s).'))
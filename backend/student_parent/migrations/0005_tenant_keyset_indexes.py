@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_parent', '0004_parent_school_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='communication',
+            index=models.Index(fields=['school_id', 'created_at', 'id'], name='comms_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fee',
+            index=models.Index(fields=['school_id', 'due_date', 'id'], name='fees_school_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['school_id', 'created_at', 'id'], name='notif_school_created_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_conversations(apps, schema_editor):
+    """Data migration: one conversation per sender/recipient pair, linked to its messages"""
+    Communication = apps.get_model('student_parent', 'Communication')
+    Conversation = apps.get_model('student_parent', 'Conversation')
+    
+    pairs = set()
+    for sender_id, recipient_id in Communication.objects.order_by().values_list('sender_id', 'recipient_id').distinct():
+        pairs.add(tuple(sorted([sender_id, recipient_id], key=str)))
+    
+    for one, two in pairs:
+        conversation = Conversation.objects.create(participant_one_id=one, participant_two_id=two)
+        messages = Communication.objects.filter(
+            models.Q(sender_id=one, recipient_id=two) | models.Q(sender_id=two, recipient_id=one)
+        )
+        messages.update(conversation=conversation)
+        last = messages.order_by('-created_at', '-id').values('id', 'created_at', 'school_id').first()
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message_id=last['id'],
+            last_message_at=last['created_at'],
+            school_id=last['school_id'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('student_parent', '0005_tenant_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school_id', models.CharField(blank=True, db_index=True, editable=False, help_text='School ID for filtering (read-only, school of the first message)', max_length=100, null=True)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Conversation',
+                'verbose_name_plural': 'Conversations',
+                'db_table': 'conversations',
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='communication',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='comms_conversation_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, help_text='Most recent message of the thread', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='student_parent.communication'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_one',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations_as_first', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_two',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations_as_second', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='communication',
+            name='conversation',
+            field=models.ForeignKey(blank=True, help_text='Thread between the sender and the recipient (set on save)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='student_parent.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['participant_one', 'last_message_at', 'id'], name='conversation_one_last_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['participant_two', 'last_message_at', 'id'], name='conversation_two_last_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('participant_one', 'participant_two'), name='conversation_participants_uniq'),
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    """Data migration: counters for users with unread notifications (others are built on first use)"""
+    Notification = apps.get_model('student_parent', 'Notification')
+    NotificationCounter = apps.get_model('student_parent', 'NotificationCounter')
+    
+    unread = Notification.objects.filter(is_read=False).order_by().values('recipient_id').annotate(
+        count=models.Count('id')
+    ).values_list('recipient_id', 'count')
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread=count) for user_id, count in unread],
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_login', '0007_background_job'),
+        ('student_parent', '0006_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(help_text='User this count belongs to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0, help_text='Number of unread notifications of the user')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Notification Counter',
+                'verbose_name_plural': 'Notification Counters',
+                'db_table': 'notification_counters',
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@
 Models for student_parent app - API layer for App 4
 """
 from django.db import models
+from django.db.models.functions import Coalesce
 from main_login.models import User
 from management_admin.models import Student
 from teacher.models import Class, Attendance, Assignment, Exam, Grade, Timetable, StudyMaterial
@@ -82,15 +83,154 @@ class Notification(models.Model):
                             self.school_id = first_student.school.school_id
                 except Exception:
                     pass
-        super().save(*args, **kwargs)
+        
+        # Keep the recipient's unread counter in step and push the change
+        # (see student_parent.notifications)
+        from django.db import transaction
+        from .notifications import push_notifications, push_unread_counts
+        adding = self._state.adding
+        was_unread = not adding and getattr(self, 'loaded_is_read', self.is_read) is False
+        delta = int(not self.is_read) - int(was_unread)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if delta:
+                NotificationCounter.apply_delta([self.recipient_id], delta)
+        self.loaded_is_read = self.is_read
+        if adding:
+            transaction.on_commit(lambda: push_notifications([self]))
+        elif delta:
+            transaction.on_commit(lambda: push_unread_counts([self.recipient_id]))
+    
+    def delete(self, *args, **kwargs):
+        """Take a deleted unread notification off the recipient's unread counter"""
+        from django.db import transaction
+        from .notifications import push_unread_counts
+        recipient_id = self.recipient_id
+        was_unread = getattr(self, 'loaded_is_read', self.is_read) is False
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if was_unread:
+                NotificationCounter.apply_delta([recipient_id], -1)
+        if was_unread:
+            transaction.on_commit(lambda: push_unread_counts([recipient_id]))
+        return result
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored is_read so save() can tell when it changes"""
+        instance = super().from_db(db, field_names, values)
+        if 'is_read' in field_names:
+            instance.loaded_is_read = instance.is_read
+        return instance
     
     class Meta:
         db_table = 'notifications'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'id'], name='notif_school_created_idx'),
+        ]
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
         ordering = ['-created_at']
 
 
+class NotificationCounter(models.Model):
+    """
+    Unread notification count per user, pushed over the notification socket.
+    Updated incrementally when a notification is created (including
+    broadcasts), marked read or deleted. Rebuild with
+    `python manage.py rebuild_notification_counters`.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter',
+        help_text='User this count belongs to'
+    )
+    unread = models.IntegerField(default=0, help_text='Number of unread notifications of the user')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.unread} unread"
+    
+    @classmethod
+    def apply_delta(cls, user_ids, unread):
+        """
+        Add `unread` to the counters of several users in a single UPDATE.
+        Users without a counter yet get one built from the notifications table.
+        """
+        from django.db.models import F
+        from django.utils import timezone
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        updated = cls.objects.filter(user_id__in=user_ids).update(
+            unread=F('unread') + unread,
+            updated_at=timezone.now(),
+        )
+        if updated < len(user_ids):
+            existing = set(cls.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+            cls.rebuild(user_ids=user_ids - existing)
+    
+    @classmethod
+    def get_counts(cls, user_ids):
+        """
+        Unread counts of several users (counters are built for users without one).
+        
+        Returns:
+            dict: {user_id: unread}
+        """
+        user_ids = set(user_ids)
+        counts = dict(cls.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread'))
+        missing = user_ids - set(counts)
+        if missing:
+            cls.rebuild(user_ids=missing)
+            counts.update(cls.objects.filter(user_id__in=missing).values_list('user_id', 'unread'))
+        return counts
+    
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """
+        Recompute unread counts from the notifications table.
+        
+        Args:
+            user_ids: users to rebuild (all users if None)
+        
+        Returns:
+            int: number of counter rows written
+        """
+        from django.db.models import Count
+        from django.utils import timezone
+        
+        users = User.objects.order_by()
+        notifications = Notification.objects.filter(is_read=False).order_by()
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+            notifications = notifications.filter(recipient_id__in=user_ids)
+        unread = dict(
+            notifications.values('recipient_id').annotate(count=Count('id')).values_list('recipient_id', 'count')
+        )
+        
+        now = timezone.now()
+        counters = [
+            cls(user_id=user_id, unread=unread.get(user_id, 0), updated_at=now)
+            for user_id in users.values_list('pk', flat=True).iterator()
+        ]
+        cls.objects.bulk_create(
+            counters,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['unread', 'updated_at'],
+        )
+        return len(counters)
+    
+    class Meta:
+        db_table = 'notification_counters'
+        verbose_name = 'Notification Counter'
+        verbose_name_plural = 'Notification Counters'
+
+
 class Fee(models.Model):
     """Fee model"""
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='fees')
@@ -119,6 +259,9 @@ class Fee(models.Model):
     
     class Meta:
         db_table = 'fees'
+        indexes = [
+            models.Index(fields=['school_id', 'due_date', 'id'], name='fees_school_due_idx'),
+        ]
         verbose_name = 'Fee'
         verbose_name_plural = 'Fees'
         ordering = ['-due_date']
@@ -137,13 +280,24 @@ class Communication(models.Model):
         on_delete=models.CASCADE,
         related_name='received_messages'
     )
+    conversation = models.ForeignKey(
+        'Conversation',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='messages',
+        help_text='Thread between the sender and the recipient (set on save)'
+    )
     subject = models.CharField(max_length=255)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def save(self, *args, **kwargs):
-        """Auto-populate school_id from sender or recipient's school"""
+        """Auto-populate school_id from sender or recipient's school, and the conversation"""
+        adding = self._state.adding
+        if not self.conversation_id and self.sender_id and self.recipient_id:
+            self.conversation = Conversation.get_between(self.sender_id, self.recipient_id)
         if not self.school_id:
             # Try to get school_id from sender's school
             if self.sender:
@@ -173,10 +327,138 @@ class Communication(models.Model):
                     except Exception:
                         pass
         super().save(*args, **kwargs)
+        if adding and self.conversation_id:
+            Conversation.objects.filter(pk=self.conversation_id).update(
+                last_message=self,
+                last_message_at=self.created_at,
+                school_id=Coalesce('school_id', models.Value(self.school_id)),
+            )
     
     class Meta:
         db_table = 'communications'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'id'], name='comms_school_created_idx'),
+            models.Index(fields=['conversation', 'created_at', 'id'], name='comms_conversation_created_idx'),
+        ]
         verbose_name = 'Communication'
         verbose_name_plural = 'Communications'
         ordering = ['-created_at']
 
+
+class Conversation(models.Model):
+    """
+    Message thread between two users.
+    
+    The participants are stored in a fixed order (participant_one has the
+    lower user_id) so each pair has exactly one conversation. The thread's
+    messages are the Communications pointing to it, read through the
+    (conversation, created_at, id) index.
+    """
+    participant_one = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations_as_first')
+    participant_two = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations_as_second')
+    school_id = models.CharField(max_length=100, db_index=True, null=True, blank=True, editable=False, help_text='School ID for filtering (read-only, school of the first message)')
+    last_message = models.ForeignKey(
+        Communication,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text='Most recent message of the thread'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Conversation {self.participant_one_id} - {self.participant_two_id}"
+    
+    @staticmethod
+    def ordered_pair(user_id, other_user_id):
+        """The two user IDs in participant_one / participant_two order"""
+        return tuple(sorted([user_id, other_user_id], key=str))
+    
+    @classmethod
+    def get_between(cls, user_id, other_user_id, create=True):
+        """The conversation between two users (created if missing, unless create=False)"""
+        one, two = cls.ordered_pair(user_id, other_user_id)
+        if not create:
+            return cls.objects.filter(participant_one_id=one, participant_two_id=two).first()
+        conversation, _ = cls.objects.get_or_create(participant_one_id=one, participant_two_id=two)
+        return conversation
+    
+    @classmethod
+    def get_many_between(cls, pairs):
+        """
+        Conversations for many (user_id, other_user_id) pairs, creating the
+        missing ones (one query to read, one bulk insert, one query to re-read).
+        
+        Returns:
+            dict: {ordered pair: conversation}
+        """
+        pairs = {cls.ordered_pair(*pair) for pair in pairs}
+        if not pairs:
+            return {}
+        
+        def load(wanted):
+            condition = models.Q()
+            for one, two in wanted:
+                condition |= models.Q(participant_one_id=one, participant_two_id=two)
+            return {
+                (conversation.participant_one_id, conversation.participant_two_id): conversation
+                for conversation in cls.objects.filter(condition)
+            }
+        
+        conversations = load(pairs)
+        missing = pairs - set(conversations)
+        if missing:
+            # ignore_conflicts covers another process creating the same conversation
+            cls.objects.bulk_create(
+                [cls(participant_one_id=one, participant_two_id=two) for one, two in missing],
+                ignore_conflicts=True,
+            )
+            conversations.update(load(missing))
+        return conversations
+    
+    @classmethod
+    def for_user(cls, user):
+        """Conversations a user takes part in"""
+        return cls.objects.filter(models.Q(participant_one=user) | models.Q(participant_two=user))
+    
+    def other_participant_id(self, user_id):
+        """The participant that is not `user_id`"""
+        return self.participant_two_id if str(self.participant_one_id) == str(user_id) else self.participant_one_id
+    
+    def mark_read(self, user_id, up_to=None):
+        """
+        Mark the messages `user_id` received in this conversation read, up to
+        `up_to` (default: now), with one UPDATE. The other participant's chat
+        sockets are told after commit (see teacher.read_receipts).
+        
+        Returns:
+            int: number of messages marked read
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        from teacher.read_receipts import push_read_receipt
+        up_to = up_to or timezone.now()
+        count = self.messages.filter(
+            recipient_id=user_id,
+            is_read=False,
+            created_at__lte=up_to,
+        ).update(is_read=True)
+        if count:
+            transaction.on_commit(lambda: push_read_receipt(self, user_id, up_to, count))
+        return count
+    
+    class Meta:
+        db_table = 'conversations'
+        constraints = [
+            models.UniqueConstraint(fields=['participant_one', 'participant_two'], name='conversation_participants_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['participant_one', 'last_message_at', 'id'], name='conversation_one_last_idx'),
+            models.Index(fields=['participant_two', 'last_message_at', 'id'], name='conversation_two_last_idx'),
+        ]
+        verbose_name = 'Conversation'
+        verbose_name_plural = 'Conversations'
+        ordering = ['-last_message_at']
+
@@ -0,0 +1,188 @@
+"""
+Notification fan-out for class / grade / school broadcasts, and real-time push.
+
+The recipients of a broadcast (the login users of the targeted students and
+of their parents) are resolved with one query, and the notifications are
+inserted with bulk_create in chunks with school_id already filled in, instead
+of Notification.save() looking the school up for every row. Broadcasts are
+run as background jobs (see NotificationViewSet.broadcast).
+
+New notifications and unread count changes are pushed to the recipients'
+notification sockets (student_parent.consumers.NotificationConsumer) once
+the transaction commits. Each user has a channel layer group; the unread
+counts come from NotificationCounter, which is updated in the same
+transaction as the notifications, so clients no longer poll unread_count.
+"""
+import asyncio
+import logging
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Q
+from main_login.channel_sender import send_from_sync
+from main_login.models import User
+from management_admin.models import Student
+from .models import Notification, NotificationCounter
+
+
+logger = logging.getLogger(__name__)
+
+AUDIENCES = ['all', 'students', 'parents']
+DEFAULT_CHUNK_SIZE = 1000
+
+
+# -------------------------
+# Real-time push
+# -------------------------
+
+def notification_group(user_id):
+    """Channel layer group of a user's notification sockets"""
+    return f'notifications_{user_id}'
+
+
+def notification_payload(notification):
+    """JSON-serializable notification as sent over the socket"""
+    return {
+        'id': notification.pk,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def push_notifications(notifications):
+    """Send new notifications, each with its recipient's unread count"""
+    counts = NotificationCounter.get_counts({notification.recipient_id for notification in notifications})
+    send_to_users([
+        (notification.recipient_id, {
+            'type': 'notification.created',
+            'notification': notification_payload(notification),
+            'unread_count': counts.get(notification.recipient_id, 0),
+        })
+        for notification in notifications
+    ])
+
+
+def push_unread_counts(user_ids):
+    """Send the current unread counts of some users"""
+    counts = NotificationCounter.get_counts(user_ids)
+    send_to_users([
+        (user_id, {'type': 'notification.unread', 'unread_count': unread})
+        for user_id, unread in counts.items()
+    ])
+
+
+def mark_notifications_read(user_id, notifications):
+    """
+    Mark a user's unread notifications among `notifications` read with one
+    UPDATE, take them off the unread counter and push the new count.
+    
+    Returns:
+        int: number of notifications marked read
+    """
+    with transaction.atomic():
+        count = notifications.filter(recipient_id=user_id, is_read=False).update(is_read=True)
+        if count:
+            NotificationCounter.apply_delta([user_id], -count)
+    if count:
+        transaction.on_commit(lambda: push_unread_counts([user_id]))
+    return count
+
+
+def send_to_users(messages):
+    """
+    Send (user_id, message) pairs to the users' groups, concurrently so the
+    channel layer can batch them, through main_login.channel_sender. Failures
+    are logged: the data is already stored and clients get the current count
+    when they reconnect.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not messages:
+        return
+    
+    async def send_all():
+        await asyncio.gather(*(
+            channel_layer.group_send(notification_group(user_id), message)
+            for user_id, message in messages
+        ))
+    
+    try:
+        send_from_sync(send_all)
+    except Exception:
+        logger.exception('Could not push %s notification message(s)', len(messages))
+
+
+# -------------------------
+# Broadcasts
+# -------------------------
+
+
+def get_target_students(school_id, class_id=None, grade=None):
+    """Students of a school, optionally limited to a class (ClassStudent) and/or a grade"""
+    students = Student.objects.filter(school_id=school_id)
+    if class_id:
+        students = students.filter(student_classes__class_obj_id=class_id)
+    if grade:
+        students = students.filter(grade=grade)
+    return students
+
+
+def resolve_recipients(school_id, class_id=None, grade=None, audience='all'):
+    """
+    User IDs to notify for a broadcast, in one query.
+
+    Args:
+        school_id: school of the targeted students
+        class_id: only students of this class
+        grade: only students of this grade
+        audience: 'all' (students and parents), 'students' or 'parents'
+
+    Returns:
+        list: distinct user IDs
+    """
+    students = get_target_students(school_id, class_id, grade).values('pk')
+    condition = Q()
+    if audience in ('all', 'students'):
+        condition |= Q(student_profiles__in=students)
+    if audience in ('all', 'parents'):
+        condition |= Q(parent_profile__students__in=students)
+    return list(
+        User.objects.filter(condition, is_active=True)
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+
+
+def fan_out_notification(school_id, title, message, notification_type='general',
+                         class_id=None, grade=None, audience='all', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Create one notification per recipient of a broadcast.
+
+    Returns:
+        dict: recipients, created
+    """
+    recipients = resolve_recipients(school_id, class_id, grade, audience)
+    created = 0
+    for start in range(0, len(recipients), chunk_size):
+        chunk = recipients[start:start + chunk_size]
+        with transaction.atomic():
+            # bulk_create skips Notification.save(), so counters and pushes are done here
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=user_id,
+                    school_id=school_id,
+                    title=title,
+                    message=message,
+                    notification_type=notification_type,
+                )
+                for user_id in chunk
+            ])
+            NotificationCounter.apply_delta(chunk, 1)
+            transaction.on_commit(lambda notifications=notifications: push_notifications(notifications))
+        created += len(chunk)
+    return {
+        'recipients': len(recipients),
+        'created': created,
+    }
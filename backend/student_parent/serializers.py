@@ -2,7 +2,8 @@
 Serializers for student_parent app
 """
 from rest_framework import serializers
-from .models import Parent, Notification, Fee, Communication
+from .models import Parent, Notification, Fee, Communication, Conversation
+from .notifications import AUDIENCES
 from main_login.serializer_mixins import SchoolIdMixin
 from management_admin.serializers import StudentSerializer
 from main_login.serializers import UserSerializer
@@ -35,6 +36,29 @@ class NotificationSerializer(SchoolIdMixin, serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class NotificationBroadcastSerializer(serializers.Serializer):
+    """Broadcast to the students and/or parents of a class, a grade or a whole school"""
+    title = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+    notification_type = serializers.ChoiceField(
+        choices=Notification._meta.get_field('notification_type').choices, default='general'
+    )
+    class_id = serializers.IntegerField(required=False, help_text='Only students of this class')
+    grade = serializers.CharField(required=False, help_text='Only students of this grade')
+    audience = serializers.ChoiceField(choices=AUDIENCES, default='all')
+    school = serializers.CharField(required=False, help_text='School ID (super admin only)')
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """Mark everything received up to a time read"""
+    up_to = serializers.DateTimeField(required=False, help_text='Only items created at or before this time (default: now)')
+
+
+class ConversationReadSerializer(MarkReadSerializer):
+    """Mark the messages of the conversation with another user read"""
+    user_id = serializers.UUIDField(help_text='The other participant')
+
+
 class FeeSerializer(SchoolIdMixin, serializers.ModelSerializer):
     """Serializer for Fee model"""
     student = StudentSerializer(read_only=True)
@@ -61,3 +85,37 @@ class CommunicationSerializer(SchoolIdMixin, serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Conversation model, from the point of view of the requesting
+    user: 'participant' is the other user of the thread.
+    """
+    participant = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Conversation
+        fields = ['id', 'school_id', 'participant', 'last_message', 'last_message_at', 'created_at']
+        read_only_fields = fields
+    
+    def get_participant(self, obj):
+        """The other participant (participants are select_related by the view)"""
+        request = self.context.get('request')
+        user_id = request.user.pk if request else None
+        if str(obj.participant_one_id) == str(user_id):
+            return UserSerializer(obj.participant_two).data
+        return UserSerializer(obj.participant_one).data
+    
+    def get_last_message(self, obj):
+        message = obj.last_message
+        if message is None:
+            return None
+        return {
+            'id': message.id,
+            'sender_id': str(message.sender_id),
+            'message': message.message,
+            'is_read': message.is_read,
+            'created_at': message.created_at,
+        }
+
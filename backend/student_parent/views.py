@@ -7,14 +7,20 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from .models import Parent, Notification, Fee, Communication
+from django.db.models import Count, Q, Sum
+from .models import Parent, Notification, NotificationCounter, Fee, Communication, Conversation
 from .serializers import (
     ParentSerializer, NotificationSerializer,
-    FeeSerializer, CommunicationSerializer
+    FeeSerializer, CommunicationSerializer, NotificationBroadcastSerializer,
+    MarkReadSerializer, ConversationReadSerializer
 )
-from main_login.permissions import IsStudentParent
+from .notifications import fan_out_notification, mark_notifications_read
+from main_login.permissions import IsStudentParent, IsAdminOrTeacher
 from main_login.mixins import SchoolFilterMixin
+from main_login.utils import get_request_role
+from main_login.jobs import start_job
 from management_admin.models import Student
+from teacher.models import Class
 from management_admin.serializers import StudentSerializer
 
 
@@ -46,20 +52,129 @@ class NotificationViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
-        """Mark notification as read"""
-        notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        """Mark notification as read (one UPDATE; the unread counter and sockets follow)"""
+        if not mark_notifications_read(request.user.pk, self.get_queryset().filter(pk=pk)):
+            self.get_object()  # 404 unless it is the user's (already read) notification
         return Response({'message': 'Notification marked as read'})
     
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """
+        Mark every notification up to a time read, in one UPDATE.
+        POST /api/student-parent/notifications/mark_all_read/
+        {"up_to": "2024-01-01T10:00:00Z"}  (optional, default: now)
+        """
+        serializer = MarkReadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        up_to = serializer.validated_data.get('up_to') or timezone.now()
+        count = mark_notifications_read(
+            request.user.pk,
+            Notification.objects.filter(created_at__lte=up_to)
+        )
+        return Response({
+            'success': True,
+            'message': f'{count} notification(s) marked as read',
+            'data': {'marked_read': count},
+        })
+    
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        """Get count of unread notifications"""
-        count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).count()
+        """
+        Get count of unread notifications (from NotificationCounter).
+        Clients can get it pushed instead over ws/notifications/.
+        """
+        count = NotificationCounter.get_counts([request.user.pk]).get(request.user.pk, 0)
         return Response({'unread_count': count})
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrTeacher])
+    def broadcast(self, request):
+        """
+        Notify the students and/or parents of a class, a grade or a whole school.
+        Runs as a background job; poll the returned job for the result.
+        POST /api/student-parent/notifications/broadcast/
+        {"title": "...", "message": "...", "class_id": 3, "audience": "parents"}
+        
+        Teachers may only broadcast to classes they teach.
+        """
+        serializer = NotificationBroadcastSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = serializer.validated_data
+        role = get_request_role(request)
+        
+        school_id = data.get('school') if role == 'super_admin' else self.get_school_id()
+        if not school_id:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'No school selected for the broadcast',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if data.get('class_id'):
+            classes = Class.objects.filter(pk=data['class_id'], school_id=school_id)
+            if role == 'teacher':
+                classes = classes.filter(teacher__user=request.user)
+            if not classes.exists():
+                return Response(
+                    {
+                        'success': False,
+                        'message': 'Class not found',
+                    },
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        elif role == 'teacher':
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Teachers can only broadcast to a class they teach',
+                },
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        job = start_job(
+            'notification_broadcast',
+            fan_out_notification,
+            {
+                'school_id': school_id,
+                'title': data['title'],
+                'message': data['message'],
+                'notification_type': data['notification_type'],
+                'class_id': data.get('class_id'),
+                'grade': data.get('grade'),
+                'audience': data['audience'],
+            },
+            user=request.user,
+            school_id=school_id,
+        )
+        return Response(
+            {
+                'success': True,
+                'message': 'Broadcast queued',
+                'data': {
+                    'job_id': job.job_id,
+                    'status': job.status,
+                    'status_url': request.build_absolute_uri(f'/api/auth/jobs/{job.job_id}/'),
+                },
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
 class FeeViewSet(SchoolFilterMixin, viewsets.ReadOnlyModelViewSet):
@@ -90,23 +205,23 @@ class FeeViewSet(SchoolFilterMixin, viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get fee summary"""
-        fees = self.get_queryset()
-        total_pending = sum(
-            float(fee.amount) for fee in fees.filter(status='pending')
-        )
-        total_paid = sum(
-            float(fee.amount) for fee in fees.filter(status='paid')
-        )
-        total_overdue = sum(
-            float(fee.amount) for fee in fees.filter(status='overdue')
+        """
+        Get fee summary.
+        Statuses are kept up to date by the overdue fee sweep
+        (management_admin.fees.sweep_overdue_fees), so one aggregate query is enough.
+        """
+        totals = self.get_queryset().aggregate(
+            total_pending=Sum('amount', filter=Q(status='pending')),
+            total_paid=Sum('amount', filter=Q(status='paid')),
+            total_overdue=Sum('amount', filter=Q(status='overdue')),
+            total_fees=Count('id'),
         )
         
         return Response({
-            'total_pending': total_pending,
-            'total_paid': total_paid,
-            'total_overdue': total_overdue,
-            'total_fees': fees.count(),
+            'total_pending': float(totals['total_pending'] or 0),
+            'total_paid': float(totals['total_paid'] or 0),
+            'total_overdue': float(totals['total_overdue'] or 0),
+            'total_fees': totals['total_fees'],
         })
 
 
@@ -131,16 +246,51 @@ class CommunicationViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
-        """Mark communication as read"""
-        communication = self.get_object()
-        if communication.recipient == request.user:
-            communication.is_read = True
-            communication.save()
+        """Mark communication as read (one UPDATE)"""
+        if Communication.objects.filter(pk=pk, recipient=request.user).update(is_read=True):
             return Response({'message': 'Communication marked as read'})
+        self.get_object()  # 404 unless the user sent it
         return Response(
             {'error': 'You can only mark your received messages as read'},
             status=status.HTTP_403_FORBIDDEN
         )
+    
+    @action(detail=False, methods=['post'])
+    def mark_conversation_read(self, request):
+        """
+        Mark the messages received from a user read, up to a time, in one UPDATE.
+        POST /api/student-parent/communications/mark_conversation_read/
+        {"user_id": "...", "up_to": "2024-01-01T10:00:00Z"}  (up_to optional, default: now)
+        The other user's chat sockets get a 'read' event.
+        """
+        serializer = ConversationReadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = serializer.validated_data
+        
+        conversation = Conversation.get_between(request.user.pk, data['user_id'], create=False)
+        if conversation is None:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Conversation not found',
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        count = conversation.mark_read(request.user.pk, data.get('up_to'))
+        return Response({
+            'success': True,
+            'message': f'{count} message(s) marked as read',
+            'data': {'marked_read': count},
+        })
 
 
 class StudentDashboardViewSet(viewsets.ViewSet):
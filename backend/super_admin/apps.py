@@ -6,3 +6,6 @@ class SuperAdminConfig(AppConfig):
     name = 'super_admin'
     verbose_name = 'Super Admin'
 
+    def ready(self):
+        """Import signals to register them"""
+        import super_admin.signals  # noqa
@@ -0,0 +1 @@
+# Management package for super_admin app
@@ -0,0 +1,25 @@
+"""
+Management command to reconcile SchoolStats with the students, teachers,
+buses and fees tables.
+SchoolStats is maintained incrementally by signals and rebuilt every
+SCHOOL_STATS_REBUILD_INTERVAL seconds by the web processes (super_admin.stats);
+run this to pick up bulk changes that bypass the signals right away.
+"""
+from django.core.management.base import BaseCommand
+from super_admin.models import SchoolStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute school statistics from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            action='append',
+            dest='schools',
+            help='School ID to refresh (can be repeated; default: all schools)'
+        )
+
+    def handle(self, *args, **options):
+        count = SchoolStats.rebuild(school_ids=options['schools'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed statistics for {count} school(s).'))
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:17
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_school_stats(apps, schema_editor):
+    """Build the stats rows from the source tables (previously computed on every request)"""
+    School = apps.get_model('super_admin', 'School')
+    SchoolStats = apps.get_model('super_admin', 'SchoolStats')
+    Student = apps.get_model('management_admin', 'Student')
+    Teacher = apps.get_model('management_admin', 'Teacher')
+    Bus = apps.get_model('management_admin', 'Bus')
+    Fee = apps.get_model('management_admin', 'Fee')
+
+    def grouped(model, aggregate):
+        rows = model.objects.order_by().values('school_id').annotate(value=aggregate)
+        return {row['school_id']: row['value'] for row in rows}
+
+    students = grouped(Student, Count('pk'))
+    teachers = grouped(Teacher, Count('pk'))
+    buses = grouped(Bus, Count('pk'))
+    revenue = grouped(Fee, Sum('paid_amount'))
+
+    for school_id in School.objects.values_list('pk', flat=True):
+        SchoolStats.objects.update_or_create(
+            school_id=school_id,
+            defaults={
+                'total_students': students.get(school_id, 0),
+                'total_teachers': teachers.get(school_id, 0),
+                'total_buses': buses.get(school_id, 0),
+                'total_revenue': revenue.get(school_id) or 0,
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('super_admin', '0010_alter_school_school_id'),
+        ('management_admin', '0042_student_fee_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schoolstats',
+            name='total_buses',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='schoolstats',
+            name='total_revenue',
+            field=models.DecimalField(decimal_places=2, default=0.0, help_text="Sum of amounts paid on the school's fees", max_digits=12),
+        ),
+        migrations.RunPython(populate_school_stats, migrations.RunPython.noop),
+    ]
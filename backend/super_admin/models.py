@@ -82,15 +82,106 @@ class School(models.Model):
 
 
 class SchoolStats(models.Model):
-    """School statistics"""
+    """
+    School statistics rollup.
+    Kept up to date incrementally by super_admin.signals on Student, Teacher,
+    Bus and Fee writes, and reconciled with the source tables every
+    SCHOOL_STATS_REBUILD_INTERVAL seconds (super_admin.stats) or on demand
+    with `python manage.py refresh_school_stats`.
+    """
     school = models.OneToOneField(School, on_delete=models.CASCADE, related_name='stats')
     # Note: Django automatically creates 'school_id' field for ForeignKey/OneToOneField
     # Since School's primary key is 'school_id', this will contain the school's school_id value
     total_students = models.IntegerField(default=0)
     total_teachers = models.IntegerField(default=0)
-    total_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_buses = models.IntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='Sum of amounts paid on the school\'s fees')
     updated_at = models.DateTimeField(auto_now=True)
     
+    @classmethod
+    def apply_delta(cls, school_id, students=0, teachers=0, buses=0, revenue=0):
+        """
+        Add changes to a school's stats in a single UPDATE.
+        If the school has no stats row yet it is built from the source tables.
+        """
+        if not school_id:
+            return
+        from django.db.models import F
+        from django.utils import timezone
+        updated = cls.objects.filter(school_id=school_id).update(
+            total_students=F('total_students') + students,
+            total_teachers=F('total_teachers') + teachers,
+            total_buses=F('total_buses') + buses,
+            total_revenue=F('total_revenue') + revenue,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            cls.rebuild(school_ids=[school_id])
+    
+    @classmethod
+    def rebuild(cls, school_ids=None):
+        """
+        Recompute stats from the students, teachers, buses and fees tables.
+        The rows are locked while they are rebuilt so concurrent apply_delta()
+        increments are not lost.
+        
+        Args:
+            school_ids: schools to rebuild (all schools if None)
+        
+        Returns:
+            int: number of stats rows written
+        """
+        from django.db import transaction
+        from django.db.models import Count, Sum
+        from django.utils import timezone
+        from management_admin.models import Student, Teacher, Bus, Fee
+        
+        schools = School.objects.order_by()
+        if school_ids is not None:
+            schools = schools.filter(pk__in=school_ids)
+        
+        def grouped(queryset, aggregate):
+            """{school_id: aggregate} for the selected schools"""
+            if school_ids is not None:
+                queryset = queryset.filter(school_id__in=school_ids)
+            rows = queryset.order_by().values('school_id').annotate(value=aggregate)
+            return {row['school_id']: row['value'] for row in rows}
+        
+        with transaction.atomic():
+            # Lock the existing rows first: apply_delta() calls made meanwhile wait
+            # and add to the rebuilt values instead of being overwritten by them.
+            # Deltas committed before the lock are already in the counts below.
+            locked = cls.objects.order_by('pk').select_for_update()
+            if school_ids is not None:
+                locked = locked.filter(school_id__in=school_ids)
+            list(locked.values_list('pk', flat=True))
+            
+            students = grouped(Student.objects.all(), Count('pk'))
+            teachers = grouped(Teacher.objects.all(), Count('pk'))
+            buses = grouped(Bus.objects.all(), Count('pk'))
+            revenue = grouped(Fee.objects.all(), Sum('paid_amount'))
+            
+            now = timezone.now()
+            stats = [
+                cls(
+                    school_id=school_id,
+                    total_students=students.get(school_id, 0),
+                    total_teachers=teachers.get(school_id, 0),
+                    total_buses=buses.get(school_id, 0),
+                    total_revenue=revenue.get(school_id) or 0,
+                    updated_at=now,
+                )
+                for school_id in schools.values_list('pk', flat=True)
+            ]
+            cls.objects.bulk_create(
+                stats,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['school'],
+                update_fields=['total_students', 'total_teachers', 'total_buses', 'total_revenue', 'updated_at'],
+            )
+        return len(stats)
+    
     class Meta:
         db_table = 'school_stats'
         verbose_name = 'School Statistics'
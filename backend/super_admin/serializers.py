@@ -7,43 +7,11 @@ from main_login.serializers import UserSerializer
 
 
 class SchoolStatsSerializer(serializers.ModelSerializer):
-    """Serializer for School Statistics"""
-    # Real-time counts calculated from database
-    total_students = serializers.SerializerMethodField()
-    total_teachers = serializers.SerializerMethodField()
-    total_buses = serializers.SerializerMethodField()
+    """Serializer for School Statistics (maintained rollup, see SchoolStats)"""
     
     class Meta:
         model = SchoolStats
         fields = ['total_students', 'total_teachers', 'total_buses', 'total_revenue', 'updated_at']
-    
-    def get_total_students(self, obj):
-        """Get real-time student count from database"""
-        try:
-            if obj and hasattr(obj, 'school') and obj.school:
-                return obj.school.students.count()
-        except Exception:
-            pass
-        return 0
-    
-    def get_total_teachers(self, obj):
-        """Get real-time teacher count from database"""
-        try:
-            if obj and hasattr(obj, 'school') and obj.school:
-                from management_admin.models import Teacher
-                return Teacher.objects.filter(school_id=obj.school.school_id).count()
-        except Exception:
-            pass
-        return 0
-    
-    def get_total_buses(self, obj):
-        """Get real-time bus count from database"""
-        try:
-            if obj and hasattr(obj, 'school') and obj.school:
-                return obj.school.buses.count()
-        except Exception:
-            pass
-        return 0
 
 
 class SchoolSerializer(serializers.ModelSerializer):
@@ -64,12 +32,11 @@ class SchoolSerializer(serializers.ModelSerializer):
         read_only_fields = ['school_id', 'user', 'user_id', 'username', 'created_at', 'updated_at']
     
     def get_stats(self, obj):
-        """Get or create SchoolStats and serialize it"""
+        """Serialize the school's SchoolStats (loaded with select_related('stats') in SchoolViewSet)"""
         try:
-            stats, created = SchoolStats.objects.get_or_create(school=obj)
-            return SchoolStatsSerializer(stats).data
-        except Exception:
-            # Return default stats if there's an error
+            return SchoolStatsSerializer(obj.stats).data
+        except SchoolStats.DoesNotExist:
+            # Not built yet (run refresh_school_stats)
             return {
                 'total_students': 0,
                 'total_teachers': 0,
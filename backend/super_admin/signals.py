@@ -0,0 +1,111 @@
+"""
+Signals to keep SchoolStats up to date incrementally.
+
+Each Student/Teacher/Bus/Fee instance remembers the school (and, for fees, the
+paid amount) it was loaded with, so a save only applies the difference to the
+affected schools' stats rows. Bulk operations that bypass signals
+(QuerySet.update, bulk_create) are picked up by the refresh_school_stats command.
+"""
+from decimal import Decimal
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from super_admin.models import SchoolStats
+
+
+# Counted model -> SchoolStats.apply_delta keyword
+COUNTED_MODELS = {
+    'management_admin.Student': 'students',
+    'management_admin.Teacher': 'teachers',
+    'management_admin.Bus': 'buses',
+}
+
+
+# Marks a value that was deferred when the instance was loaded
+NOT_LOADED = object()
+
+
+def _paid(value):
+    """Paid amount as Decimal (it may still be a float/str before the row is reloaded)"""
+    return Decimal(str(value or 0))
+
+
+# -------------------------
+# SCHOOL STATS ROW
+# -------------------------
+
+@receiver(post_save, sender='super_admin.School')
+def create_school_stats(sender, instance, created, **kwargs):
+    """Every new school starts with an empty stats row"""
+    if created:
+        SchoolStats.objects.get_or_create(school=instance)
+
+
+# -------------------------
+# STUDENT / TEACHER / BUS COUNTS
+# -------------------------
+
+def remember_school(sender, instance, **kwargs):
+    """Remember the school an instance was created/loaded with (without loading deferred fields)"""
+    instance._stats_school_id = instance.__dict__.get('school_id', NOT_LOADED)
+
+
+def update_counts_on_save(sender, instance, created, **kwargs):
+    """Count a new instance, or move it between schools if its school changed"""
+    field = COUNTED_MODELS[sender._meta.label]
+    old_school_id = None if created else getattr(instance, '_stats_school_id', NOT_LOADED)
+    new_school_id = instance.school_id
+    if old_school_id is NOT_LOADED:
+        # Previous school unknown - recompute this school's stats
+        SchoolStats.rebuild(school_ids=[new_school_id])
+    elif old_school_id != new_school_id:
+        SchoolStats.apply_delta(old_school_id, **{field: -1})
+        SchoolStats.apply_delta(new_school_id, **{field: 1})
+    instance._stats_school_id = new_school_id
+
+
+def update_counts_on_delete(sender, instance, **kwargs):
+    """Uncount a deleted instance"""
+    field = COUNTED_MODELS[sender._meta.label]
+    SchoolStats.apply_delta(instance.school_id, **{field: -1})
+
+
+for model_label in COUNTED_MODELS:
+    post_init.connect(remember_school, sender=model_label)
+    post_save.connect(update_counts_on_save, sender=model_label)
+    post_delete.connect(update_counts_on_delete, sender=model_label)
+
+
+# -------------------------
+# FEE REVENUE
+# -------------------------
+
+@receiver(post_init, sender='management_admin.Fee')
+def remember_fee_revenue(sender, instance, **kwargs):
+    """Remember the school and paid amount a fee was created/loaded with"""
+    instance._stats_revenue = (
+        instance.__dict__.get('school_id', NOT_LOADED),
+        instance.__dict__.get('paid_amount', NOT_LOADED),
+    )
+
+
+@receiver(post_save, sender='management_admin.Fee')
+def update_revenue_on_save(sender, instance, created, **kwargs):
+    """Apply the change in paid amount (e.g. a recorded payment) to the school's revenue"""
+    old_school_id, old_paid = (None, 0) if created else getattr(instance, '_stats_revenue', (NOT_LOADED, NOT_LOADED))
+    new_school_id, new_paid = instance.school_id, instance.paid_amount
+    if old_school_id is NOT_LOADED or old_paid is NOT_LOADED:
+        # Previous amount unknown - recompute this school's stats
+        SchoolStats.rebuild(school_ids=[new_school_id])
+    elif old_school_id == new_school_id:
+        if _paid(new_paid) != _paid(old_paid):
+            SchoolStats.apply_delta(new_school_id, revenue=_paid(new_paid) - _paid(old_paid))
+    else:
+        SchoolStats.apply_delta(old_school_id, revenue=-_paid(old_paid))
+        SchoolStats.apply_delta(new_school_id, revenue=_paid(new_paid))
+    instance._stats_revenue = (new_school_id, new_paid)
+
+
+@receiver(post_delete, sender='management_admin.Fee')
+def update_revenue_on_delete(sender, instance, **kwargs):
+    """Remove a deleted fee's payments from the school's revenue"""
+    SchoolStats.apply_delta(instance.school_id, revenue=-_paid(instance.paid_amount))
@@ -0,0 +1,29 @@
+"""
+Scheduled SchoolStats reconciliation.
+
+SchoolStats is kept up to date incrementally by super_admin.signals, but
+writes that skip the signals (queryset.update(), bulk_create, raw SQL)
+leave it drifting. rebuild_school_stats()
+recomputes every school's row from the source tables with one grouped query
+per table. It runs every SCHOOL_STATS_REBUILD_INTERVAL seconds through
+main_login.scheduler (see start_school_stats_rebuilder), or on demand with
+`python manage.py refresh_school_stats`.
+"""
+from django.conf import settings
+from django.utils import timezone
+from .models import SchoolStats
+
+
+def rebuild_school_stats():
+    """Rebuild all schools' stats and record the outcome as a BackgroundJob"""
+    from main_login.jobs import record_job
+    started_at = timezone.now()
+    result = {'schools': SchoolStats.rebuild()}
+    record_job('school-stats-rebuild', result, started_at)
+    return result
+
+
+def start_school_stats_rebuilder():
+    """Run rebuild_school_stats() every SCHOOL_STATS_REBUILD_INTERVAL seconds in this process"""
+    from main_login.scheduler import start_periodic
+    return start_periodic('school-stats-rebuild', rebuild_school_stats, settings.SCHOOL_STATS_REBUILD_INTERVAL)
@@ -7,16 +7,18 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Count, Q, Sum
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import School, SchoolStats, Activity
 from .serializers import SchoolSerializer, ActivitySerializer
 from main_login.permissions import IsSuperAdmin
 from main_login.models import User, Role
+from main_login.identifiers import next_username
 
 
 class SchoolViewSet(viewsets.ModelViewSet):
     """ViewSet for School management"""
-    queryset = School.objects.all()
+    queryset = School.objects.select_related('user', 'stats')
     serializer_class = SchoolSerializer
     permission_classes = [IsAuthenticated, IsSuperAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -73,14 +75,8 @@ class SchoolViewSet(viewsets.ModelViewSet):
                 defaults={'description': 'Management Admin role'}
             )
             
-            # Create username from email (part before @)
-            username = email.split('@')[0] if email else f'school_{random.randint(1000, 9999)}'
-            # Ensure username is unique
-            base_username = username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f'{base_username}{counter}'
-                counter += 1
+            # Create a unique username from email (part before @)
+            username = next_username(email.split('@')[0] if email else f'school_{random.randint(1000, 9999)}')
             
             # Split school name into first_name and last_name
             name_parts = school_name.strip().split(maxsplit=1)
@@ -148,25 +144,23 @@ class SchoolViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
-        """Get dashboard data"""
-        total_schools = School.objects.count()
-        active_schools = School.objects.filter(status='active').count()
-        total_students = sum(
-            stats.total_students for stats in SchoolStats.objects.all()
+        """Get dashboard data (aggregated in SQL from the SchoolStats rollup)"""
+        schools = School.objects.aggregate(
+            total_schools=Count('pk'),
+            active_schools=Count('pk', filter=Q(status='active')),
         )
-        total_teachers = sum(
-            stats.total_teachers for stats in SchoolStats.objects.all()
-        )
-        total_revenue = sum(
-            float(stats.total_revenue) for stats in SchoolStats.objects.all()
+        totals = SchoolStats.objects.aggregate(
+            total_students=Sum('total_students'),
+            total_teachers=Sum('total_teachers'),
+            total_revenue=Sum('total_revenue'),
         )
         
         return Response({
-            'total_schools': total_schools,
-            'active_schools': active_schools,
-            'total_students': total_students,
-            'total_teachers': total_teachers,
-            'total_revenue': total_revenue,
+            'total_schools': schools['total_schools'],
+            'active_schools': schools['active_schools'],
+            'total_students': totals['total_students'] or 0,
+            'total_teachers': totals['total_teachers'] or 0,
+            'total_revenue': float(totals['total_revenue'] or 0),
         })
 
 
@@ -0,0 +1,220 @@
+"""
+Write-behind persistence for chat messages.
+
+Chat consumers broadcast a message first and then hand it to chat_buffer,
+which stores the buffered messages as Communication rows with one
+bulk_create every CHAT_WRITE_BUFFER_MAX_MESSAGES messages or every
+CHAT_WRITE_BUFFER_INTERVAL_MS milliseconds, whichever comes first. The
+sender's school_id is resolved once when the socket connects and recipients
+and their conversations are looked up with a few queries per batch, so
+Communication.save() and its per-message lookups are not used.
+
+Batches are written one at a time, in the order the messages arrived
+(created_at is the time of the write, at most one interval later). The
+buffer is flushed when a socket disconnects and, for anything still
+buffered, when the process exits. When the database rejects a batch, its
+messages are written one at a time so a single bad row does not hold back
+the rest; a message that keeps failing is dropped (and logged in full) after
+MAX_WRITE_ATTEMPTS tries. While the database is unreachable the batch is
+kept for the next interval without counting an attempt.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Messages kept for a retry when the database is unavailable
+MAX_PENDING_MESSAGES = 10000
+# Writes of a single message before it is dropped
+MAX_WRITE_ATTEMPTS = 3
+# Errors that mean the database is unreachable rather than the rows are bad
+CONNECTION_ERRORS = (OperationalError, InterfaceError)
+
+
+def write_messages(messages):
+    """
+    Store buffered chat messages as Communication rows (one bulk_create).
+    Messages whose recipient username does not exist are dropped.
+
+    Returns:
+        int: number of messages stored
+    """
+    from main_login.models import User
+    from student_parent.models import Communication, Conversation
+
+    recipients = {
+        username: (user_id, school_id)
+        for username, user_id, school_id in User.objects.filter(
+            username__in={message['recipient'] for message in messages}
+        ).values_list('username', 'user_id', 'school_id')
+    }
+    messages = [message for message in messages if message['recipient'] in recipients]
+    if not messages:
+        return 0
+    conversations = Conversation.get_many_between(
+        (message['sender_id'], recipients[message['recipient']][0]) for message in messages
+    )
+
+    # Two long usernames can overflow the subject column
+    subject_length = Communication._meta.get_field('subject').max_length
+    communications = []
+    for message in messages:
+        recipient_id, recipient_school_id = recipients[message['recipient']]
+        communications.append(Communication(
+            sender_id=message['sender_id'],
+            recipient_id=recipient_id,
+            conversation=conversations[Conversation.ordered_pair(message['sender_id'], recipient_id)],
+            # Sender's school, else the recipient's (as Communication.save() does)
+            school_id=message['school_id'] or recipient_school_id,
+            subject=f"Chat: {message['sender']} to {message['recipient']}"[:subject_length],
+            message=message['message'],
+            is_read=False,
+        ))
+
+    with transaction.atomic():
+        Communication.objects.bulk_create(communications)
+        # Point every conversation at its newest message (one UPDATE)
+        latest = {communication.conversation_id: communication for communication in communications}
+        updated = []
+        for communication in latest.values():
+            conversation = communication.conversation
+            conversation.last_message = communication
+            conversation.last_message_at = communication.created_at
+            conversation.school_id = conversation.school_id or communication.school_id
+            updated.append(conversation)
+        Conversation.objects.bulk_update(updated, ['last_message', 'last_message_at', 'school_id'])
+    return len(communications)
+
+
+def write_batch(batch):
+    """
+    Store a batch with write_messages(), one message at a time if the batch
+    as a whole is rejected.
+
+    Returns:
+        list: messages to retry later (the database was unreachable, or a
+        message has failed fewer than MAX_WRITE_ATTEMPTS times)
+    """
+    try:
+        write_messages(batch)
+        return []
+    except CONNECTION_ERRORS:
+        logger.exception('Could not store %s chat message(s), will retry', len(batch))
+        return batch
+    except Exception:
+        logger.warning('Chat batch of %s message(s) rejected, storing them one at a time', len(batch), exc_info=True)
+
+    retry = []
+    for index, message in enumerate(batch):
+        try:
+            write_messages([message])
+        except CONNECTION_ERRORS:
+            logger.exception('Could not store %s chat message(s), will retry', len(batch) - index)
+            return retry + batch[index:]
+        except Exception:
+            message['attempts'] = message.get('attempts', 0) + 1
+            if message['attempts'] >= MAX_WRITE_ATTEMPTS:
+                logger.exception(
+                    'Dropping chat message after %s failed writes: %r', message['attempts'], message
+                )
+            else:
+                retry.append(message)
+    return retry
+
+
+class ChatWriteBuffer:
+    """Buffer of chat messages waiting to be written (one per process)"""
+
+    def __init__(self):
+        self.pending = []
+        self.timer = None
+        self.flush_lock = None
+        self.loop = None
+        # Guards pending against the exit handler (another thread)
+        self.pending_lock = threading.Lock()
+
+    def add(self, sender, recipient, message, school_id):
+        """Queue a message; call from the event loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.timer = None
+            self.flush_lock = asyncio.Lock()
+        with self.pending_lock:
+            self.pending.append({
+                'sender_id': sender.pk,
+                'sender': sender.username,
+                'recipient': recipient,
+                'message': message,
+                'school_id': school_id,
+            })
+            count = len(self.pending)
+        if count >= settings.CHAT_WRITE_BUFFER_MAX_MESSAGES:
+            self.schedule_flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(settings.CHAT_WRITE_BUFFER_INTERVAL_MS / 1000, self.schedule_flush)
+
+    def schedule_flush(self):
+        """Start a flush in the background"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.loop.create_task(self.flush())
+
+    def take(self):
+        with self.pending_lock:
+            batch, self.pending = self.pending, []
+        return batch
+
+    def give_back(self, batch):
+        """Put a batch that could not be written back in front of the queue"""
+        with self.pending_lock:
+            self.pending[:0] = batch
+            if len(self.pending) > MAX_PENDING_MESSAGES:
+                dropped = len(self.pending) - MAX_PENDING_MESSAGES
+                del self.pending[:dropped]
+                logger.error('Chat write buffer full, %s message(s) dropped', dropped)
+
+    async def flush(self):
+        """Write everything buffered so far"""
+        if self.flush_lock is None:
+            return
+        async with self.flush_lock:
+            batch = self.take()
+            if not batch:
+                return
+            try:
+                retry = await database_sync_to_async(write_batch)(batch)
+            except Exception:
+                logger.exception('Could not store %s chat message(s), will retry', len(batch))
+                retry = batch
+            if retry:
+                self.give_back(retry)
+                if self.timer is None:
+                    self.timer = self.loop.call_later(
+                        settings.CHAT_WRITE_BUFFER_INTERVAL_MS / 1000, self.schedule_flush
+                    )
+
+    def flush_sync(self):
+        """Write everything still buffered, outside the event loop (process exit)"""
+        batch = self.take()
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            retry = write_batch(batch)
+        except Exception:
+            logger.exception('Could not store %s chat message(s) at shutdown', len(batch))
+            return
+        if retry:
+            logger.error('Could not store %s chat message(s) at shutdown: %r', len(retry), retry)
+
+
+chat_buffer = ChatWriteBuffer()
+atexit.register(chat_buffer.flush_sync)
@@ -1,10 +1,10 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
-from student_parent.models import Communication
+from main_login.utils import get_user_school_id
+from .chat_buffer import chat_buffer
+from .read_receipts import chat_user_group
 
-User = get_user_model()
 
 class TeacherStudentChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -29,7 +29,13 @@ class TeacherStudentChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
+        # School of the stored messages, resolved once per connection
+        self.school_id = await database_sync_to_async(get_user_school_id)(self.user)
+        
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        # Read receipts for this user's messages (see read_receipts)
+        self.user_group_name = chat_user_group(self.user.pk)
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
         await self.accept()
         
         # Send connection confirmation
@@ -40,7 +46,12 @@ class TeacherStudentChatConsumer(AsyncWebsocketConsumer):
         }))
 
     async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+        # Store this socket's messages now rather than after the next interval
+        await chat_buffer.flush()
 
     async def receive(self, text_data=None, bytes_data=None):
         if not self.user or not self.user.is_authenticated:
@@ -54,13 +65,6 @@ class TeacherStudentChatConsumer(AsyncWebsocketConsumer):
             if not message_text:
                 return
             
-            # If recipient is provided, save to database
-            if recipient_username:
-                recipient = await self.get_user_by_username(recipient_username)
-                if recipient:
-                    # Save message to database
-                    await self.save_message(self.user, recipient, message_text)
-            
             # Broadcast to group
             await self.channel_layer.group_send(
                 self.group_name,
@@ -73,6 +77,10 @@ class TeacherStudentChatConsumer(AsyncWebsocketConsumer):
                     'timestamp': data.get('timestamp', ''),
                 },
             )
+            
+            # If recipient is provided, save to database (write-behind, see chat_buffer)
+            if recipient_username:
+                chat_buffer.add(self.user, recipient_username, message_text, self.school_id)
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'type': 'error',
@@ -95,21 +103,12 @@ class TeacherStudentChatConsumer(AsyncWebsocketConsumer):
             'timestamp': event.get('timestamp'),
         }))
 
-    @database_sync_to_async
-    def get_user_by_username(self, username):
-        """Get user by username"""
-        try:
-            return User.objects.get(username=username)
-        except User.DoesNotExist:
-            return None
-
-    @database_sync_to_async
-    def save_message(self, sender, recipient, message):
-        """Save message to Communication model"""
-        Communication.objects.create(
-            sender=sender,
-            recipient=recipient,
-            subject=f'Chat: {sender.username} to {recipient.username}',
-            message=message,
-            is_read=False
-        )
\ No newline at end of file
+    async def chat_read(self, event):
+        """Send a read receipt (the other participant read this user's messages) to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'read',
+            'conversation_id': event['conversation_id'],
+            'reader_id': event['reader_id'],
+            'up_to': event['up_to'],
+            'count': event['count'],
+        }))
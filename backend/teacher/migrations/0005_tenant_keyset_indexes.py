@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teacher', '0004_assignment_school_name_attendance_school_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['school_id', 'created_at', 'id'], name='assignments_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['school_id', 'date', 'id'], name='attendances_school_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['school_id', 'created_at', 'id'], name='classes_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['school_id', 'exam_date', 'id'], name='exams_school_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['school_id', 'created_at', 'id'], name='grades_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studymaterial',
+            index=models.Index(fields=['school_id', 'created_at', 'id'], name='study_mat_school_created_idx'),
+        ),
+    ]
@@ -49,6 +49,9 @@ class Class(models.Model):
     
     class Meta:
         db_table = 'classes'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'id'], name='classes_school_created_idx'),
+        ]
         verbose_name = 'Class'
         verbose_name_plural = 'Classes'
         unique_together = ['name', 'section', 'academic_year']
@@ -103,6 +106,9 @@ class Attendance(models.Model):
     
     class Meta:
         db_table = 'attendances'
+        indexes = [
+            models.Index(fields=['school_id', 'date', 'id'], name='attendances_school_date_idx'),
+        ]
         verbose_name = 'Attendance'
         verbose_name_plural = 'Attendances'
         unique_together = ['class_obj', 'student', 'date']
@@ -129,6 +135,9 @@ class Assignment(models.Model):
     
     class Meta:
         db_table = 'assignments'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'id'], name='assignments_school_created_idx'),
+        ]
         verbose_name = 'Assignment'
         verbose_name_plural = 'Assignments'
         ordering = ['-created_at']
@@ -156,6 +165,9 @@ class Exam(models.Model):
     
     class Meta:
         db_table = 'exams'
+        indexes = [
+            models.Index(fields=['school_id', 'exam_date', 'id'], name='exams_school_date_idx'),
+        ]
         verbose_name = 'Exam'
         verbose_name_plural = 'Exams'
         ordering = ['-exam_date']
@@ -181,6 +193,9 @@ class Grade(models.Model):
     
     class Meta:
         db_table = 'grades'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'id'], name='grades_school_created_idx'),
+        ]
         verbose_name = 'Grade'
         verbose_name_plural = 'Grades'
         unique_together = ['exam', 'student']
@@ -243,6 +258,9 @@ class StudyMaterial(models.Model):
     
     class Meta:
         db_table = 'study_materials'
+        indexes = [
+            models.Index(fields=['school_id', 'created_at', 'id'], name='study_mat_school_created_idx'),
+        ]
         verbose_name = 'Study Material'
         verbose_name_plural = 'Study Materials'
         ordering = ['-created_at']
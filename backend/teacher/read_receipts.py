@@ -0,0 +1,42 @@
+"""
+Read receipts for chat conversations.
+
+Besides its room group, every chat socket (TeacherStudentChatConsumer) joins
+its user's group, chat_user_<user_id>. When a participant marks a
+conversation read (Conversation.mark_read, one UPDATE), the other
+participant's sockets get a 'read' event with the conversation and the time
+the messages were read up to, so their client can update without
+re-fetching the history.
+"""
+import logging
+from channels.layers import get_channel_layer
+from main_login.channel_sender import send_from_sync
+
+
+logger = logging.getLogger(__name__)
+
+
+def chat_user_group(user_id):
+    """Channel layer group of a user's chat sockets"""
+    return f'chat_user_{user_id}'
+
+
+def push_read_receipt(conversation, reader_id, up_to, count):
+    """Tell the other participant's chat sockets that `reader_id` read their messages up to `up_to`"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        send_from_sync(
+            channel_layer.group_send,
+            chat_user_group(conversation.other_participant_id(reader_id)),
+            {
+                'type': 'chat.read',
+                'conversation_id': conversation.pk,
+                'reader_id': str(reader_id),
+                'up_to': up_to.isoformat(),
+                'count': count,
+            },
+        )
+    except Exception:
+        logger.exception('Could not push read receipt for conversation %s', conversation.pk)
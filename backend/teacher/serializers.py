@@ -49,6 +49,26 @@ class AttendanceSerializer(SchoolIdMixin, serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class BulkAttendanceRecordSerializer(serializers.Serializer):
+    """One student's status in a bulk attendance submission"""
+    student = serializers.CharField(help_text='Student email (Student primary key)')
+    status = serializers.ChoiceField(choices=Attendance._meta.get_field('status').choices)
+
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    """Attendance for a whole class on one date (see AttendanceViewSet.bulk)"""
+    class_obj = serializers.IntegerField(help_text='Class ID')
+    date = serializers.DateField()
+    records = BulkAttendanceRecordSerializer(many=True, allow_empty=False)
+    
+    def validate_records(self, records):
+        """Each student may only appear once"""
+        students = [record['student'] for record in records]
+        if len(set(students)) != len(students):
+            raise serializers.ValidationError('Each student can only appear once.')
+        return records
+
+
 class AssignmentSerializer(SchoolIdMixin, serializers.ModelSerializer):
     """Serializer for Assignment model"""
     class_obj = ClassSerializer(read_only=True)
@@ -91,6 +111,13 @@ class GradeSerializer(SchoolIdMixin, serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class BulkGradeRecordSerializer(serializers.Serializer):
+    """One student's marks in a bulk grade submission (see ExamViewSet.bulk_grades)"""
+    student = serializers.CharField(help_text='Student email (Student primary key)')
+    marks_obtained = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    remarks = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class TimetableSerializer(SchoolIdMixin, serializers.ModelSerializer):
     """Serializer for Timetable model"""
     class_obj = ClassSerializer(read_only=True)
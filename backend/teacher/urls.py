@@ -22,5 +22,7 @@ urlpatterns = [
     path('profile/', views.teacher_profile, name='teacher-profile'),
     path('communications/', views.teacher_communications, name='teacher-communications'),
     path('chat-history/', views.teacher_chat_history, name='teacher-chat-history'),
+    path('conversations/', views.teacher_conversations, name='teacher-conversations'),
+    path('conversations/read/', views.teacher_mark_conversation_read, name='teacher-conversation-read'),
 ]
 
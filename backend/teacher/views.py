@@ -6,6 +6,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 from .models import (
     Class, ClassStudent, Attendance, Assignment,
@@ -14,14 +15,18 @@ from .models import (
 from .serializers import (
     ClassSerializer, ClassStudentSerializer, AttendanceSerializer,
     AssignmentSerializer, ExamSerializer, GradeSerializer,
-    TimetableSerializer, StudyMaterialSerializer
+    TimetableSerializer, StudyMaterialSerializer, BulkAttendanceSerializer,
+    BulkGradeRecordSerializer
 )
 from main_login.permissions import IsTeacher
 from main_login.mixins import SchoolFilterMixin
+from main_login.utils import get_request_role
 from management_admin.models import Teacher
+from super_admin.models import School
 from management_admin.serializers import TeacherSerializer
-from student_parent.models import Communication
-from student_parent.serializers import CommunicationSerializer
+from main_login.pagination import KeysetPagination, BidirectionalKeysetPagination
+from student_parent.models import Communication, Conversation
+from student_parent.serializers import CommunicationSerializer, ConversationSerializer, ConversationReadSerializer
 from django.db.models import Q
 
 
@@ -64,6 +69,100 @@ class AttendanceViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
     filterset_fields = ['class_obj', 'student', 'date', 'status']
     ordering_fields = ['date', 'created_at']
     ordering = ['-date']
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Mark attendance for a whole class on one date, inserting or updating
+        one row per student in a single statement.
+        POST /api/teacher/attendance/bulk/
+        {"class_obj": 1, "date": "2025-01-31", "records": [{"student": "<email>", "status": "present"}, ...]}
+        """
+        serializer = BulkAttendanceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = serializer.validated_data
+        records = data['records']
+        student_ids = [record['student'] for record in records]
+        
+        # Class must belong to the user's school
+        classes = Class.objects.only('id', 'school_id')
+        if get_request_role(request) != 'super_admin':
+            classes = classes.filter(school_id=self.get_school_id())
+        class_obj = classes.filter(pk=data['class_obj']).first()
+        if not class_obj:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Class not found',
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # All students must be enrolled in the class (one query)
+        enrolled = set(
+            ClassStudent.objects.filter(class_obj=class_obj, student_id__in=student_ids)
+            .values_list('student_id', flat=True)
+        )
+        not_enrolled = [student_id for student_id in student_ids if student_id not in enrolled]
+        if not_enrolled:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Some students are not enrolled in this class',
+                    'errors': {'students': not_enrolled},
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Denormalized school fields from a single lookup (class's school, else the students' school)
+        if class_obj.school_id:
+            school = School.objects.filter(pk=class_obj.school_id).values('school_id', 'name').first()
+        else:
+            school = School.objects.filter(students__email=student_ids[0]).values('school_id', 'name').first()
+        school = school or {'school_id': None, 'name': None}
+        
+        marked_by = Teacher.objects.filter(user=request.user).only('pk').first()
+        
+        attendances = [
+            Attendance(
+                class_obj=class_obj,
+                student_id=record['student'],
+                date=data['date'],
+                status=record['status'],
+                marked_by=marked_by,
+                school_id=school['school_id'],
+                school_name=school['name'],
+            )
+            for record in records
+        ]
+        # Upsert on the (class_obj, student, date) unique constraint
+        Attendance.objects.bulk_create(
+            attendances,
+            update_conflicts=True,
+            unique_fields=['class_obj', 'student', 'date'],
+            update_fields=['status', 'marked_by', 'school_id', 'school_name'],
+        )
+        
+        return Response(
+            {
+                'success': True,
+                'message': f'Attendance saved for {len(attendances)} student(s)',
+                'data': {
+                    'class_obj': class_obj.pk,
+                    'date': data['date'],
+                    'count': len(attendances),
+                },
+            },
+            status=status.HTTP_200_OK
+        )
 
 
 class AssignmentViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
@@ -106,6 +205,100 @@ class ExamViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
             return Exam.objects.filter(teacher=teacher)
         except Teacher.DoesNotExist:
             return Exam.objects.none()
+    
+    @action(detail=True, methods=['post'], url_path='bulk-grades')
+    def bulk_grades(self, request, pk=None):
+        """
+        Enter or update the marks of many students for this exam at once.
+        Valid rows are saved in a single upsert; invalid rows are reported
+        per row without aborting the rest of the batch.
+        POST /api/teacher/exams/{id}/bulk-grades/
+        {"grades": [{"student": "<email>", "marks_obtained": "42.50", "remarks": ""}, ...]}
+        """
+        exam = self.get_object()
+        rows = request.data.get('grades') if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'grades must be a non-empty list',
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Field validation per row
+        errors = []
+        valid = []
+        for index, row in enumerate(rows):
+            serializer = BulkGradeRecordSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                student = row.get('student') if isinstance(row, dict) else None
+                errors.append({'index': index, 'student': student, 'errors': serializer.errors})
+        
+        # Class membership for the whole batch in one query
+        enrolled = set(
+            ClassStudent.objects.filter(
+                class_obj_id=exam.class_obj_id,
+                student_id__in=[data['student'] for _, data in valid]
+            ).values_list('student_id', flat=True)
+        )
+        
+        # Marks and membership checks against the exam (no further queries)
+        grades = {}
+        for index, data in valid:
+            row_errors = {}
+            if data['student'] not in enrolled:
+                row_errors['student'] = ["Student is not enrolled in this exam's class."]
+            elif data['student'] in grades:
+                row_errors['student'] = ['Student appears more than once in this request.']
+            if data['marks_obtained'] > exam.total_marks:
+                row_errors['marks_obtained'] = [f'Cannot exceed the exam total of {exam.total_marks}.']
+            if row_errors:
+                errors.append({'index': index, 'student': data['student'], 'errors': row_errors})
+            else:
+                grades[data['student']] = data
+        errors.sort(key=lambda error: error['index'])
+        
+        if grades:
+            # Denormalized school fields from the exam (one lookup if the exam has none)
+            school = {'school_id': exam.school_id, 'name': exam.school_name}
+            if not exam.school_id:
+                school = School.objects.filter(
+                    students__email=next(iter(grades))
+                ).values('school_id', 'name').first() or school
+            
+            # Upsert on the (exam, student) unique constraint
+            Grade.objects.bulk_create(
+                [
+                    Grade(
+                        exam=exam,
+                        student_id=student_id,
+                        marks_obtained=data['marks_obtained'],
+                        remarks=data['remarks'],
+                        school_id=school['school_id'],
+                        school_name=school['name'],
+                    )
+                    for student_id, data in grades.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['exam', 'student'],
+                update_fields=['marks_obtained', 'remarks', 'school_id', 'school_name', 'updated_at'],
+            )
+        
+        return Response(
+            {
+                'success': not errors,
+                'message': f'Saved grades for {len(grades)} student(s), {len(errors)} row(s) rejected',
+                'data': {
+                    'exam': exam.pk,
+                    'saved': len(grades),
+                    'errors': errors,
+                },
+            },
+            status=status.HTTP_200_OK if grades else status.HTTP_400_BAD_REQUEST
+        )
 
 
 class GradeViewSet(SchoolFilterMixin, viewsets.ModelViewSet):
@@ -192,20 +385,50 @@ def teacher_profile(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsTeacher])
 def teacher_communications(request):
-    """Get all communications for the current teacher"""
+    """
+    Get all communications for the current teacher.
+    With ?pagination=cursor (or ?cursor=) the response is a keyset page:
+    {'next', 'results'}.
+    """
     # Get communications where teacher is sender or recipient
     communications = Communication.objects.filter(
         Q(sender=request.user) | Q(recipient=request.user)
-    ).order_by('-created_at')
+    ).select_related('sender__role', 'recipient__role').order_by('-created_at')
+    
+    if wants_cursor_page(request):
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(communications, request)
+        return paginator.get_paginated_response(CommunicationSerializer(page, many=True).data)
     
     serializer = CommunicationSerializer(communications, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsTeacher])
+def teacher_conversations(request):
+    """
+    Get the current teacher's conversations, most recently active first
+    (keyset pages: ?cursor=&page_size=).
+    """
+    conversations = Conversation.for_user(request.user).filter(
+        last_message_at__isnull=False
+    ).select_related('participant_one__role', 'participant_two__role', 'last_message').order_by('-last_message_at')
+    
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(conversations, request)
+    serializer = ConversationSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsTeacher])
 def teacher_chat_history(request):
-    """Get chat history with a specific user"""
+    """
+    Get chat history with a specific user.
+    With ?pagination=cursor (or ?cursor=) the response is a page of the latest
+    messages, newest first: {'next' (older), 'previous' (newer), 'results'}.
+    """
     user_id = request.query_params.get('user_id')
     if not user_id:
         return Response(
@@ -213,21 +436,62 @@ def teacher_chat_history(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    from main_login.models import User
     try:
-        from main_login.models import User
         other_user = User.objects.get(user_id=user_id)
+    except (ValueError, DjangoValidationError):
+        return Response(
+            {'error': 'user_id must be a valid UUID'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except User.DoesNotExist:
         return Response(
             {'error': 'User not found'},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get messages where current user is sender or recipient
-    messages = Communication.objects.filter(
-        (Q(sender=request.user) & Q(recipient=other_user)) |
-        (Q(sender=other_user) & Q(recipient=request.user))
-    ).order_by('created_at')
+    # Messages of the conversation between the two users ((conversation, created_at) index)
+    conversation = Conversation.get_between(request.user.pk, other_user.pk, create=False)
+    if conversation is None:
+        messages = Communication.objects.none()
+    else:
+        messages = conversation.messages.select_related('sender__role', 'recipient__role')
+    
+    if wants_cursor_page(request):
+        # Newest first; 'next' loads older messages, 'previous' newer ones
+        paginator = BidirectionalKeysetPagination()
+        page = paginator.paginate_queryset(messages.order_by('-created_at'), request)
+        return paginator.get_paginated_response(CommunicationSerializer(page, many=True).data)
     
-    serializer = CommunicationSerializer(messages, many=True)
+    serializer = CommunicationSerializer(messages.order_by('created_at'), many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsTeacher])
+def teacher_mark_conversation_read(request):
+    """
+    Mark the messages received from a user read, up to a time, in one UPDATE.
+    POST {"user_id": "...", "up_to": "2024-01-01T10:00:00Z"}  (up_to defaults to now)
+    The other user's chat sockets get a 'read' event.
+    """
+    serializer = ConversationReadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    
+    conversation = Conversation.get_between(request.user.pk, data['user_id'], create=False)
+    if conversation is None:
+        return Response(
+            {'error': 'Conversation not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    count = conversation.mark_read(request.user.pk, data.get('up_to'))
+    return Response({'marked_read': count}, status=status.HTTP_200_OK)
+
+
+def wants_cursor_page(request):
+    """Whether a list endpoint that used to return everything was asked for a keyset page"""
+    return request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params
+